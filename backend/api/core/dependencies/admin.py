@@ -0,0 +1,37 @@
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from api.utils.settings import settings
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(default=None)):
+    """Dependency guarding the admin diagnostics endpoints.
+
+    They are hidden (404) unless `ADMIN_TOKEN` is configured.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    if x_admin_token is None or not hmac.compare_digest(
+        x_admin_token.encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def require_metrics_token(authorization: Optional[str] = Header(default=None)):
+    """Dependency guarding the Prometheus metrics endpoint, scraped with
+    `Authorization: Bearer <METRICS_TOKEN>`.
+
+    It is hidden (404) unless metrics are enabled and `METRICS_TOKEN` is
+    configured.
+    """
+    if not (settings.METRICS_ENABLED and settings.METRICS_TOKEN):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), settings.METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
@@ -0,0 +1,156 @@
+""" Async, cached email domain deliverability checks
+
+A domain is deliverable when it publishes an MX record that is not a null
+MX (RFC 7505). Lookups use dnspython's async resolver, so they never block
+the event loop, and results are cached: deliverable domains for
+`EMAIL_DNS_POSITIVE_TTL` seconds, undeliverable ones for the (shorter)
+`EMAIL_DNS_NEGATIVE_TTL`. Concurrent checks of the same domain share one
+lookup, and well known mailbox providers skip DNS entirely.
+
+Resolver failures (timeouts, no reachable nameserver) are not the
+domain's fault: the address is accepted and nothing is cached.
+"""
+import asyncio
+from typing import Dict, Optional
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+from cachetools import TTLCache
+from fastapi import HTTPException, status
+
+from api.utils.logger import logger
+from api.utils.settings import settings
+
+
+# High volume mailbox providers, always deliverable
+ALLOWED_DOMAINS = frozenset({
+    "gmail.com",
+    "googlemail.com",
+    "outlook.com",
+    "hotmail.com",
+    "live.com",
+    "msn.com",
+    "yahoo.com",
+    "ymail.com",
+    "icloud.com",
+    "me.com",
+    "mac.com",
+    "aol.com",
+    "protonmail.com",
+    "proton.me",
+    "zoho.com",
+    "gmx.com",
+    "mail.com",
+    "yandex.com",
+})
+
+
+class DeliverabilityChecker:
+    """Checks whether email domains can receive mail"""
+
+    def __init__(
+        self,
+        allowed_domains=ALLOWED_DOMAINS,
+        timeout: float = 2.0,
+        positive_ttl: float = 3600,
+        negative_ttl: float = 300,
+        cache_size: int = 10_000,
+    ):
+        self.allowed_domains = frozenset(domain.lower() for domain in allowed_domains)
+        self.timeout = timeout
+        self._deliverable = TTLCache(maxsize=cache_size, ttl=positive_ttl)
+        self._undeliverable = TTLCache(maxsize=cache_size, ttl=negative_ttl)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._resolver: Optional[dns.asyncresolver.Resolver] = None
+        self.lookups = 0
+        self.cache_hits = 0
+
+    @property
+    def resolver(self) -> dns.asyncresolver.Resolver:
+        # Created lazily so importing this module never reads resolv.conf
+        if self._resolver is None:
+            self._resolver = dns.asyncresolver.Resolver()
+            self._resolver.lifetime = self.timeout
+        return self._resolver
+
+    def cached(self, domain: str) -> Optional[bool]:
+        """The known deliverability of `domain`, without any DNS lookup.
+
+        Returns:
+            `True`/`False` when allow-listed or cached, `None` when unknown.
+        """
+        domain = domain.lower()
+        if domain in self.allowed_domains or domain in self._deliverable:
+            return True
+        if domain in self._undeliverable:
+            return False
+        return None
+
+    async def _lookup(self, domain: str) -> Optional[bool]:
+        self.lookups += 1
+        try:
+            answer = await self.resolver.resolve(domain, "MX")
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            return False
+        except (dns.exception.Timeout, dns.resolver.NoNameservers) as exc:
+            logger.warning(f"MX lookup for {domain} failed; {exc}")
+            return None
+        except dns.exception.DNSException as exc:
+            logger.warning(f"MX lookup for {domain} failed; {exc}")
+            return None
+
+        # A single "." exchange is a null MX: the domain accepts no mail
+        return any(str(record.exchange) != "." for record in answer)
+
+    async def _resolve(self, domain: str) -> Optional[bool]:
+        try:
+            result = await self._lookup(domain)
+        finally:
+            self._in_flight.pop(domain, None)
+
+        if result is True:
+            self._deliverable[domain] = True
+        elif result is False:
+            self._undeliverable[domain] = True
+
+        return result
+
+    async def is_deliverable(self, domain: str) -> bool:
+        """Whether `domain` can receive mail. Fails open if DNS is unavailable."""
+
+        domain = domain.lower()
+        known = self.cached(domain)
+        if known is not None:
+            self.cache_hits += 1
+            return known
+
+        future = self._in_flight.get(domain)
+        if future is None:
+            future = asyncio.ensure_future(self._resolve(domain))
+            self._in_flight[domain] = future
+
+        # Shielded so a cancelled caller does not cancel the shared lookup
+        result = await asyncio.shield(future)
+
+        return result is not False
+
+    async def ensure_deliverable(self, email: str):
+        """Raise a 400 if the domain of `email` cannot receive mail"""
+
+        domain = email.rpartition("@")[2]
+        if not await self.is_deliverable(domain):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email is invalid",
+            )
+
+
+deliverability_checker = DeliverabilityChecker(
+    allowed_domains=ALLOWED_DOMAINS | {
+        domain.strip() for domain in settings.EMAIL_DOMAIN_ALLOWLIST.split(",") if domain.strip()
+    },
+    timeout=settings.EMAIL_DNS_TIMEOUT,
+    positive_ttl=settings.EMAIL_DNS_POSITIVE_TTL,
+    negative_ttl=settings.EMAIL_DNS_NEGATIVE_TTL,
+)
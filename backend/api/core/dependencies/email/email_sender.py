@@ -1,9 +1,22 @@
+from email.message import EmailMessage
+from email.utils import formataddr
 from typing import Optional
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
+from api.core.dependencies.email.smtp_pool import smtp_pool
+from api.core.dependencies.email.template_registry import email_template_registry
 from api.utils.settings import settings
-from premailer import transform
 
 
+def build_message(recipient: str, subject: str, html: str) -> EmailMessage:
+    """Build an HTML email message from the configured sender"""
+
+    message = EmailMessage()
+    message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(html, subtype="html")
+
+    return message
+
 
 async def send_email(
     recipient: str, 
@@ -11,32 +24,8 @@ async def send_email(
     subject: str, 
     context: Optional[dict] = None
 ):
-    from main import email_templates
+    # Render the precompiled, CSS-inlined template with context
+    html = await email_template_registry.render(template_name, context)
 
-    conf = ConnectionConfig(
-        MAIL_USERNAME=settings.MAIL_USERNAME,
-        MAIL_PASSWORD=settings.MAIL_PASSWORD,
-        MAIL_FROM=settings.MAIL_FROM,
-        MAIL_PORT=settings.MAIL_PORT,
-        MAIL_SERVER=settings.MAIL_SERVER,
-        USE_CREDENTIALS=True,
-        VALIDATE_CERTS=True,
-        MAIL_STARTTLS = False,
-        MAIL_SSL_TLS = True,
-        MAIL_FROM_NAME='HNG Boilerplate',
-        # SUPPRESS_SEND=True  # suppress sending of email in testing environment
-    )
-    
-    message = MessageSchema(
-        subject=subject,
-        recipients=[recipient],
-        subtype=MessageType.html
-    )
-    
-    # Render the template with context
-    html = email_templates.get_template(template_name).render(context)
-    message.body = transform(html)
-    
-    fm = FastMail(conf)
-    await fm.send_message(message)
-    
\ No newline at end of file
+    # Send over a pooled, already authenticated SMTP session
+    await smtp_pool.send_message(build_message(recipient, subject, html))
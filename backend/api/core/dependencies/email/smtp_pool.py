@@ -0,0 +1,180 @@
+""" Pooled, persistent SMTP connections
+
+Keeps authenticated SMTP sessions open between messages so a burst of
+emails reuses a handful of TCP/TLS sessions instead of opening one per
+message. The pool caps concurrent sessions, recycles connections that sat
+idle too long or sent too many messages, and transparently reconnects
+when the server drops a session.
+"""
+import asyncio
+import time
+from collections import deque
+from email.message import EmailMessage
+from typing import Deque, Optional
+
+import aiosmtplib
+
+from api.utils.logger import logger
+from api.utils.settings import settings
+
+
+class _PooledConnection:
+    __slots__ = ("smtp", "last_used", "messages_sent")
+
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages_sent = 0
+
+
+class SMTPConnectionPool:
+    """A bounded pool of long-lived `aiosmtplib` connections"""
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        start_tls: bool = False,
+        validate_certs: bool = True,
+        max_size: int = 4,
+        idle_timeout: float = 60,
+        max_messages_per_connection: int = 100,
+        timeout: float = 30,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+
+        self._idle: Deque[_PooledConnection] = deque()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.in_use = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the pool binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_size)
+        return self._semaphore
+
+    async def _connect(self) -> _PooledConnection:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        if self.username:
+            await smtp.login(self.username, self.password)
+
+        self.connections_opened += 1
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    async def _close(conn: _PooledConnection):
+        try:
+            if conn.smtp.is_connected:
+                await conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+
+    def _is_reusable(self, conn: _PooledConnection) -> bool:
+        return (
+            conn.smtp.is_connected
+            and time.monotonic() - conn.last_used < self.idle_timeout
+            and conn.messages_sent < self.max_messages_per_connection
+        )
+
+    async def _acquire(self) -> _PooledConnection:
+        while self._idle:
+            conn = self._idle.pop()
+            if self._is_reusable(conn):
+                return conn
+            await self._close(conn)
+
+        return await self._connect()
+
+    def _release(self, conn: _PooledConnection):
+        conn.last_used = time.monotonic()
+        self._idle.append(conn)
+
+    async def send_message(self, message: EmailMessage):
+        """Send `message` over a pooled connection, reconnecting once if the
+        server has dropped the session"""
+
+        async with self.semaphore:
+            self.in_use += 1
+            try:
+                conn = await self._acquire()
+                try:
+                    try:
+                        await conn.smtp.send_message(message)
+                    except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                        logger.warning("SMTP session dropped, reconnecting")
+                        await self._close(conn)
+                        conn = await self._connect()
+                        await conn.smtp.send_message(message)
+                except Exception:
+                    await self._close(conn)
+                    raise
+
+                conn.messages_sent += 1
+                self.messages_sent += 1
+                self._release(conn)
+            finally:
+                self.in_use -= 1
+
+    async def prune_idle(self):
+        """Close idle connections past their idle timeout"""
+
+        keep = deque()
+        while self._idle:
+            conn = self._idle.popleft()
+            if self._is_reusable(conn):
+                keep.append(conn)
+            else:
+                await self._close(conn)
+        self._idle = keep
+
+    async def run_reaper(self, interval: Optional[float] = None):
+        """Prune idle connections periodically until cancelled"""
+
+        interval = interval or max(self.idle_timeout / 2, 1)
+        while True:
+            await asyncio.sleep(interval)
+            await self.prune_idle()
+
+    async def close(self):
+        """Close every idle connection"""
+
+        while self._idle:
+            await self._close(self._idle.pop())
+
+
+smtp_pool = SMTPConnectionPool(
+    hostname=settings.MAIL_SERVER,
+    port=settings.MAIL_PORT,
+    username=settings.MAIL_USERNAME if settings.MAIL_USE_CREDENTIALS else None,
+    password=settings.MAIL_PASSWORD if settings.MAIL_USE_CREDENTIALS else None,
+    use_tls=settings.MAIL_SSL_TLS,
+    start_tls=settings.MAIL_STARTTLS,
+    validate_certs=True,
+    max_size=settings.SMTP_POOL_SIZE,
+    idle_timeout=settings.SMTP_IDLE_TIMEOUT,
+    max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+)
@@ -0,0 +1,145 @@
+""" Precompiled email template registry
+
+Templates are loaded once at startup with their CSS already inlined by
+premailer, then compiled by a Jinja environment backed by a bytecode
+cache. Sending an email is then just a Jinja render, with no HTML
+re-parsing or CSS inlining per message.
+
+Jinja tags are swapped for inert placeholders while premailer runs so
+lxml cannot escape or move them. If the placeholders do not come back
+intact and in order (eg: `{% for %}` blocks between table rows that the
+HTML parser relocates), or the template extends/includes another one,
+that template falls back to render-then-inline, which runs in a worker
+thread so the event loop is never blocked.
+"""
+import logging
+import re
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set
+
+from anyio import to_thread
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    select_autoescape,
+)
+from premailer import Premailer
+
+from api.utils.logger import logger
+
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+
+_JINJA_TAG = re.compile(r"{{.*?}}|{%.*?%}|{#.*?#}", re.DOTALL)
+_PLACEHOLDER = "JINJAPLACEHOLDER{:06d}X"
+_PLACEHOLDER_PATTERN = re.compile(r"JINJAPLACEHOLDER(\d{6})X")
+_COMPOSITE_TAG = re.compile(r"{%-?\s*(extends|include|import|from)\b")
+
+
+def inline_css(html: str) -> str:
+    """Inline the CSS of an HTML document"""
+    return Premailer(
+        html,
+        disable_validation=True,
+        allow_network=False,
+        cssutils_logging_level=logging.CRITICAL,
+    ).transform()
+
+
+def preinline_template_source(source: str) -> Optional[str]:
+    """Inline the CSS of a Jinja template source ahead of rendering.
+
+    Returns:
+        The inlined source, or `None` if the template cannot safely be
+        inlined before rendering.
+    """
+    if _COMPOSITE_TAG.search(source):
+        return None
+
+    tags = []
+
+    def protect(match):
+        tags.append(match.group(0))
+        return _PLACEHOLDER.format(len(tags) - 1)
+
+    inlined = inline_css(_JINJA_TAG.sub(protect, source))
+
+    order = [int(index) for index in _PLACEHOLDER_PATTERN.findall(inlined)]
+    if order != list(range(len(tags))):
+        return None
+
+    return _PLACEHOLDER_PATTERN.sub(lambda match: tags[int(match.group(1))], inlined)
+
+
+class _PreinlinedLoader(FileSystemLoader):
+    """File system loader serving template sources with CSS pre-inlined"""
+
+    def __init__(self, searchpath, on_fallback: Callable[[str], None]):
+        super().__init__(searchpath)
+        self._on_fallback = on_fallback
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+
+        inlined = preinline_template_source(source)
+        if inlined is None:
+            self._on_fallback(template)
+            return source, filename, uptodate
+
+        return inlined, filename, uptodate
+
+
+class EmailTemplateRegistry:
+    """Compiled, CSS-inlined email templates"""
+
+    def __init__(self, directory: Path = TEMPLATES_DIR, bytecode_cache_dir: Optional[str] = None):
+        self.directory = Path(directory)
+        self._render_time_inlining: Set[str] = set()
+        self.env = Environment(
+            loader=_PreinlinedLoader(str(self.directory), self._render_time_inlining.add),
+            autoescape=select_autoescape(["html", "xml"]),
+            bytecode_cache=FileSystemBytecodeCache(bytecode_cache_dir),
+            auto_reload=False,
+            cache_size=-1,
+        )
+        self.loaded = False
+
+    def load(self) -> Dict[str, bool]:
+        """Compile every template up front.
+
+        Returns:
+            A dict of template name to whether it was pre-inlined.
+        """
+        report = {}
+        if self.directory.is_dir():
+            for name in self.env.list_templates(extensions=["html"]):
+                self.env.get_template(name)
+                report[name] = name not in self._render_time_inlining
+        else:
+            logger.warning(f"Email templates directory {self.directory} does not exist")
+
+        self.loaded = True
+        return report
+
+    def _render(self, template_name: str, context: Optional[dict]) -> str:
+        html = self.env.get_template(template_name).render(context or {})
+        if template_name in self._render_time_inlining:
+            html = inline_css(html)
+        return html
+
+    async def render(self, template_name: str, context: Optional[dict] = None) -> str:
+        """Render a template to its final, CSS-inlined HTML"""
+
+        if not self.loaded:
+            await to_thread.run_sync(self.load)
+
+        template = self.env.get_template(template_name)
+        if template_name in self._render_time_inlining:
+            # Still needs premailer/lxml: keep it off the event loop
+            return await to_thread.run_sync(self._render, template_name, context)
+
+        return template.render(context or {})
+
+
+email_template_registry = EmailTemplateRegistry()
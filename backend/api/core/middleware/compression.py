@@ -0,0 +1,322 @@
+""" Response compression middleware
+
+Compresses responses with brotli or gzip, negotiated from the request's
+`Accept-Encoding` header. Bodies under `minimum_size` are sent as is,
+streaming responses are compressed chunk by chunk, and bodies that carry
+a strong `ETag` and a `public` Cache-Control (eg: the plan catalog) are
+compressed once per ETag and then served from an in-memory cache.
+Bodies and chunks of `threadpool_min_size` bytes or more are compressed
+in the threadpool rather than on the event loop.
+
+Every compressible response (and every 304) varies on `Accept-Encoding`,
+whether or not this particular one was compressed. A strong ETag computed
+for the identity body is weakened when the body is compressed, since the
+compressed bytes are a different representation; `If-None-Match` uses weak
+comparison, so revalidation keeps working.
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+
+GZIP = "gzip"
+BROTLI = "br"
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/",
+    "image/svg+xml",
+)
+
+
+class CompressionStats:
+    """Running totals of compression work, per encoding"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = {GZIP: 0, BROTLI: 0}
+        self.bytes_in = {GZIP: 0, BROTLI: 0}
+        self.bytes_out = {GZIP: 0, BROTLI: 0}
+        self.cpu_seconds = {GZIP: 0.0, BROTLI: 0.0}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float):
+        with self._lock:
+            self.bytes_in[encoding] += bytes_in
+            self.bytes_out[encoding] += bytes_out
+            self.cpu_seconds[encoding] += cpu_seconds
+
+    def record_response(self, encoding: str):
+        with self._lock:
+            self.responses[encoding] += 1
+
+    def record_cache(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+
+compression_stats = CompressionStats()
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported encoding from an `Accept-Encoding` header"""
+
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    wildcard = weights.get("*", 0.0)
+    candidates = [BROTLI, GZIP] if brotli is not None else [GZIP]
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+
+    return best
+
+
+class _Compressor:
+    """Incremental compressor that accounts its CPU time"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == BROTLI:
+            self._impl = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._impl = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def _timed(self, func, data: bytes = None) -> bytes:
+        started = time.thread_time()
+        out = func(data) if data is not None else func()
+        compression_stats.record(
+            self.encoding, len(data or b""), len(out), time.thread_time() - started
+        )
+        return out
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == BROTLI:
+            return self._timed(self._impl.process, data) + self._timed(self._impl.flush)
+        return self._timed(self._impl.compress, data) + self._timed(
+            lambda: self._impl.flush(zlib.Z_SYNC_FLUSH)
+        )
+
+    def finish(self) -> bytes:
+        if self.encoding == BROTLI:
+            return self._timed(self._impl.finish)
+        return self._timed(self._impl.flush)
+
+    def compress_all(self, data: bytes) -> bytes:
+        if self.encoding == BROTLI:
+            return self._timed(self._impl.process, data) + self._timed(self._impl.finish)
+        return self._timed(self._impl.compress, data) + self._timed(self._impl.flush)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with brotli or gzip"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        cache_size: int = 128,
+        threadpool_min_size: int = 64 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.threadpool_min_size = threadpool_min_size
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Responses are still wrapped without an encoding, to add `Vary`
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def new_compressor(self, encoding: str) -> _Compressor:
+        return _Compressor(encoding, self.gzip_level, self.brotli_quality)
+
+    async def run(self, func, data: bytes) -> bytes:
+        """Run a compression step, off the event loop for large inputs"""
+
+        if len(data) >= self.threadpool_min_size:
+            return await run_in_threadpool(func, data)
+        return func(data)
+
+    def cached(self, key: tuple) -> Optional[bytes]:
+        with self._cache_lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+        return body
+
+    def store(self, key: tuple, body: bytes):
+        with self._cache_lock:
+            self._cache[key] = body
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+class _CompressionResponder:
+    """Per-response state of `CompressionMiddleware`"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+        self.started = False
+
+    def _is_compressible(self, headers: Headers) -> bool:
+        status = self.start_message["status"]
+        if status < 200 or status in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def _weaken_etag(headers: MutableHeaders):
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+    def _cache_key(self, headers: Headers) -> Optional[tuple]:
+        etag = headers.get("etag")
+        if not etag or etag.startswith("W/"):
+            return None
+        if "public" not in headers.get("cache-control", ""):
+            return None
+        return (etag, self.encoding)
+
+    def _set_encoding_headers(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.encoding
+        self._weaken_etag(headers)
+
+    async def send(self, message: Message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+
+        if message_type != "http.response.body":
+            await self._send(message)
+            return
+
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.start_message["headers"])
+
+            if self.start_message["status"] == 304:
+                # Carry the validators and `Vary` a full response would have
+                headers.add_vary_header("Accept-Encoding")
+                if self.encoding is not None:
+                    self._weaken_etag(headers)
+                compressible = False
+            else:
+                compressible = self._is_compressible(headers)
+                if compressible:
+                    headers.add_vary_header("Accept-Encoding")
+
+            if (
+                not compressible
+                or self.encoding is None
+                or (not more_body and len(body) < self.middleware.minimum_size)
+            ):
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            if not more_body:
+                await self._send_whole(headers, body)
+                return
+
+            # Streaming response: compress each chunk as it arrives
+            self.compressor = self.middleware.new_compressor(self.encoding)
+            self._set_encoding_headers(headers)
+            del headers["Content-Length"]
+            compression_stats.record_response(self.encoding)
+            await self._send(self.start_message)
+
+        if more_body:
+            chunk = await self.middleware.run(self.compressor.compress, body) if body else b""
+            if chunk:
+                await self._send({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            if body:
+                tail = await self.middleware.run(self.compressor.compress_all, body)
+            else:
+                tail = self.compressor.finish()
+            await self._send({"type": "http.response.body", "body": tail, "more_body": False})
+
+    async def _send_whole(self, headers: MutableHeaders, body: bytes):
+        key = self._cache_key(headers)
+        compressed = self.middleware.cached(key) if key else None
+
+        if key:
+            compression_stats.record_cache(hit=compressed is not None)
+
+        if compressed is None:
+            compressor = self.middleware.new_compressor(self.encoding)
+            compressed = await self.middleware.run(compressor.compress_all, body)
+            if key:
+                self.middleware.store(key, compressed)
+
+        compression_stats.record_response(self.encoding)
+        self._set_encoding_headers(headers)
+        headers["Content-Length"] = str(len(compressed))
+
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
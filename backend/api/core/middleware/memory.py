@@ -0,0 +1,68 @@
+""" Memory diagnostics middleware
+
+While `tracemalloc` is tracing, records how much traced memory each request
+leaves behind, per route template. Requests to a route armed through
+`/api/v1/admin/memory/arm` are additionally wrapped in two snapshots whose
+diff gives the route's top allocation sites.
+
+When tracing is off a request costs one `tracemalloc.is_tracing()` call.
+"""
+import tracemalloc
+
+from anyio import to_thread
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from api.utils.memory import MemoryTracer
+
+
+class MemoryMiddleware:
+    """ASGI middleware attributing traced allocations to routes"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        tracer: MemoryTracer,
+        top_sites: int = 10,
+        exclude_prefix: str = "/api/v1/admin",
+    ):
+        self.app = app
+        self.tracer = tracer
+        self.top_sites = top_sites
+        # Diagnostics requests (snapshots especially) would dominate the report
+        self.exclude_prefix = exclude_prefix
+
+    @staticmethod
+    def _route_path(scope: Scope):
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not tracemalloc.is_tracing():
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route_path = self._route_path(scope)
+        if route_path is None or route_path.startswith(self.exclude_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        before = None
+        if self.tracer.armed and self.tracer.take(method, route_path):
+            before = await to_thread.run_sync(self.tracer.take_snapshot)
+
+        traced_before, _peak = tracemalloc.get_traced_memory()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if tracemalloc.is_tracing():
+                traced_after, _peak = tracemalloc.get_traced_memory()
+                top_sites = None
+                if before is not None:
+                    after = await to_thread.run_sync(self.tracer.take_snapshot)
+                    top_sites = self.tracer.diff(before, after, limit=self.top_sites)
+                self.tracer.record(method, route_path, traced_after - traced_before, top_sites)
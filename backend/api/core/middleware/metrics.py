@@ -0,0 +1,55 @@
+""" Request metrics middleware
+
+Counts requests and observes their latency per route template (eg:
+`/api/v1/users/{user_id}`), not per raw path, so label cardinality stays
+bounded. Requests that match no route are grouped under `unmatched`, and
+methods outside the standard HTTP verbs (clients can send any token) under
+`other`.
+"""
+import time
+from typing import Dict, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.utils.metrics import RouteMetrics
+
+
+UNMATCHED = "unmatched"
+OTHER_METHOD = "other"
+STANDARD_METHODS = frozenset({
+    "GET", "HEAD", "POST", "PUT", "DELETE", "CONNECT", "OPTIONS", "TRACE", "PATCH",
+})
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording Prometheus request metrics"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            method = scope["method"] if scope["method"] in STANDARD_METHODS else OTHER_METHOD
+            # FastAPI stores the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", UNMATCHED)
+
+            metrics = self._routes.get((method, route))
+            if metrics is None:
+                metrics = self._routes[(method, route)] = RouteMetrics(method, route)
+            metrics.observe(method, route, status_code, started)
@@ -0,0 +1,66 @@
+""" Request profiling middleware
+
+Profiles a request with `SamplingProfiler` when it carries
+`X-Profile: 1` together with a valid `X-Admin-Token`, or when its route
+was armed through `/api/v1/admin/profiling/arm`. The profile id is
+returned in the `X-Profile-Id` response header.
+
+The middleware is only installed when profiling is enabled, so it costs
+nothing otherwise.
+"""
+import hmac
+import threading
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.utils.profiler import Profile, ProfileStore, SamplingProfiler
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests on demand"""
+
+    def __init__(self, app: ASGIApp, admin_token: str, store: ProfileStore, interval: float = 0.005):
+        self.app = app
+        self.admin_token = admin_token.encode()
+        self.store = store
+        self.interval = interval
+
+    def _requested(self, scope: Scope) -> bool:
+        headers = Headers(scope=scope)
+        if headers.get("x-profile") != "1":
+            return False
+        token = headers.get("x-admin-token", "").encode()
+        return bool(self.admin_token) and hmac.compare_digest(token, self.admin_token)
+
+    def _armed(self, scope: Scope) -> bool:
+        if not self.store.armed:
+            return False
+
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return self.store.take(scope["method"], route.path)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not (self._requested(scope) or self._armed(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(method=scope["method"], path=scope["path"], interval=self.interval)
+        profiler = SamplingProfiler(profile, loop_thread_id=threading.get_ident())
+
+        async def send_with_profile_id(message: Message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile.id
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            self.store.add(profile)
@@ -0,0 +1,46 @@
+""" Request id middleware
+
+Takes the request id from the `X-Request-ID` header (or generates one),
+makes it available to log records through `request_id_var` and echoes it
+back on the response.
+"""
+import re
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.utils.logger import request_id_var
+
+
+HEADER = "X-Request-ID"
+# Accept client supplied ids only if they are short and log safe
+_VALID_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestIdMiddleware:
+    """ASGI middleware tagging each request with an id"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get(HEADER)
+        if not request_id or not _VALID_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[HEADER] = request_id
+            await send(message)
+
+        await self.app(scope, receive, send_with_id)
+        # Left set when the app raises, so the error handlers that run
+        # outside the middleware stack still log the request id
+        request_id_var.reset(token)
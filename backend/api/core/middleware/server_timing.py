@@ -0,0 +1,93 @@
+""" Server-Timing middleware
+
+Collects the timing spans recorded with `api.utils.timing.span` (db
+checkout, SQL, service calls, bcrypt, JWT, rendering) for a request and
+adds them as a `Server-Timing` response header, and/or logs one structured
+line for a `sample_rate` fraction of requests.
+
+Span timings leak what the server did: on `/auth/login` the presence of a
+`bcrypt` span tells whether an account exists. The header is therefore
+only added for requests carrying a valid `X-Admin-Token`, never on routes
+under `excluded_prefixes` (the auth routes) and never on error responses.
+
+Other requests pay for one random draw, or nothing when logging is off.
+"""
+import hmac
+import logging
+import random
+from typing import Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.utils.timing import RequestTimings, current_timings
+
+
+timing_logger = logging.getLogger("api.timing")
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware emitting per-request timing breakdowns"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        admin_token: str = "",
+        sample_rate: float = 0.0,
+        log: bool = False,
+        excluded_prefixes: Sequence[str] = ("/api/v1/auth",),
+    ):
+        self.app = app
+        self.admin_token = admin_token.encode()
+        self.sample_rate = sample_rate
+        self.log = log
+        self.excluded_prefixes = tuple(excluded_prefixes)
+        if log:
+            timing_logger.setLevel(logging.INFO)
+
+    def _header_allowed(self, scope: Scope) -> bool:
+        if not self.admin_token or scope["path"].startswith(self.excluded_prefixes):
+            return False
+        token = Headers(scope=scope).get("x-admin-token", "").encode()
+        return hmac.compare_digest(token, self.admin_token)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        emit_header = self._header_allowed(scope)
+        log = self.log and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+        if not (emit_header or log):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status_code = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if emit_header and status_code < 400:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timings.header_value())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
+            if log:
+                self._log(scope, status_code, timings)
+
+    @staticmethod
+    def _log(scope: Scope, status_code: int, timings: RequestTimings):
+        timing_logger.info("request timing", extra={"fields": {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "total_ms": round(timings.elapsed * 1000, 3),
+            "spans": timings.as_dict(),
+        }})
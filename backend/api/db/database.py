@@ -3,6 +3,7 @@
 from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
 from sqlalchemy import create_engine
 from api.utils.settings import settings, BASE_DIR
+from api.utils.timing import current_timings, instrument_engine, span
 
 
 DB_HOST = settings.DB_HOST
@@ -35,6 +36,7 @@ def get_db_engine(test_mode: bool = False):
 
 
 engine = get_db_engine()
+instrument_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -48,7 +50,14 @@ def create_database():
 
 
 def get_db():
-    db = db_session()
+    # A session of its own per request: the thread-local `db_session` would
+    # be shared by concurrent requests whose dependency ran on the same
+    # worker thread
+    db = SessionLocal()
+    if current_timings.get() is not None:
+        # Check a connection out up front so pool waits show up as a span
+        with span("db_checkout"):
+            db.connection()
     try:
         yield db
     finally:
@@ -0,0 +1,11 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def get_dialect_insert(db: Session):
+    """Return the dialect specific `insert` construct for the session's
+    database, which supports `ON CONFLICT ... DO UPDATE` upserts"""
+
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
@@ -0,0 +1,56 @@
+from hashlib import blake2b
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the values that identify a representation,
+    eg: a row id and its `updated_at`. The body is never needed."""
+
+    digest = blake2b(digest_size=16)
+    for part in parts:
+        value = part.isoformat() if hasattr(part, "isoformat") else str(part)
+        digest.update(value.encode())
+        digest.update(b"\x1f")
+
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's `If-None-Match` header against `etag`.
+    Uses the weak comparison RFC 9110 prescribes for `If-None-Match`."""
+
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+
+    return False
+
+
+def not_modified(etag: str, cache_control: Optional[str] = None) -> Response:
+    """Return an empty 304 response carrying the validators"""
+
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+
+    return Response(status_code=304, headers=headers)
+
+
+def set_cache_headers(response: Response, etag: str, cache_control: str) -> Response:
+    """Attach the ETag and Cache-Control headers to `response`"""
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
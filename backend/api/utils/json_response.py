@@ -1,13 +1,116 @@
-""" This module contains the Json response class """
+""" This module contains the Json response classes """
+from decimal import Decimal
 from enum import Enum
+from http import HTTPStatus
 from json import dumps
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import orjson
 from fastapi import status
-from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from typing import Any, Dict, Optional
 
-class JsonResponseDict(JSONResponse):
+from api.utils.timing import span
+
+
+def _default(obj: Any) -> Any:
+    """Serialize the types orjson does not handle natively, the same way
+    `jsonable_encoder` would"""
+
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    # ORM objects and anything else fall back to the slow path
+    return jsonable_encoder(obj)
+
+
+def dump_json(content: Any) -> bytes:
+    """Serialize `content` to JSON bytes. Datetimes, dates, UUIDs and
+    dataclasses are handled natively by orjson"""
+
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson backed JSON response, used as the app's default response class.
+
+    Content is serialized in a single pass; `jsonable_encoder` is only
+    reached for values orjson cannot serialize itself.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span("render"):
+            return dump_json(content)
+
+
+class PreSerializedJSONResponse(Response):
+    """Response for bodies that are already JSON encoded bytes"""
+
+    media_type = "application/json"
+
+
+# Error messages whose bodies are cached: the standard reason phrases and
+# the app's most frequent fixed details. A fixed set, so dynamic details
+# never churn or grow the cache.
+CACHED_ERROR_MESSAGES = frozenset({
+    *(http_status.phrase for http_status in HTTPStatus),
+    "Could not validate credentials",
+    "Invalid user credentials",
+    "Invalid or expired token",
+    "User not found",
+    "You do not have permission to access this resource",
+    "Invalid admin token",
+})
+
+_error_bodies: Dict[Tuple[int, str], bytes] = {}
+
+
+def error_body(status_code: int, message: str) -> bytes:
+    """Return the encoded body of an error response. Bodies of messages in
+    `CACHED_ERROR_MESSAGES` are cached, so frequent fixed errors (401, 403,
+    404, ...) are serialized only once"""
+
+    key = (status_code, message)
+    body = _error_bodies.get(key)
+    if body is None:
+        body = dump_json({
+            "status": False,
+            "status_code": status_code,
+            "message": message,
+        })
+        if message in CACHED_ERROR_MESSAGES:
+            _error_bodies[key] = body
+    return body
+
+
+def error_response(
+    status_code: int,
+    message: Any,
+    headers: Optional[Mapping[str, str]] = None,
+    cache: bool = True,
+) -> Response:
+    """Return an error response in the app's standard error shape.
+    Pass `cache=False` for messages that embed per-request details."""
+
+    if cache and isinstance(message, str):
+        content = error_body(status_code, message)
+    else:
+        content = dump_json({
+            "status": False,
+            "status_code": status_code,
+            "message": message,
+        })
+
+    return PreSerializedJSONResponse(content=content, status_code=status_code, headers=headers)
+
+
+class JsonResponseDict(FastJSONResponse):
 
     def __init__(
         self, message: str, data: Optional[Dict[str, Any]] = None, error: str = "", status_code: int = 200
@@ -18,7 +121,7 @@ class JsonResponseDict(JSONResponse):
         self.error = error
         self.status_code = status_code
         super().__init__(
-            content=jsonable_encoder(self.response()), status_code=status_code
+            content=self.response(), status_code=status_code
         )
 
     def __repr__(self):
@@ -63,4 +166,4 @@ return JsonResponseDict(
             data={"job": new_job.to_dict()},
             status_code=status.HTTP_201_CREATED
         )
-"""
\ No newline at end of file
+"""
@@ -1,10 +1,243 @@
+""" Application logging
+
+Records are handed to a `QueueHandler` and written by a `QueueListener` on
+a background thread, so request threads and the event loop never wait on
+disk or stdout. Formatting also happens on that thread, except for
+tracebacks: they are rendered to text before queueing so queued records do
+not keep the frames (and every local in them) alive. Output is one JSON
+object per line carrying the request id of the request that logged it; the
+log file rotates by size and rotated files are gzip compressed.
+
+Rotation is not safe across processes, so each worker of a multi-worker
+server (a `multiprocessing` child, as uvicorn's workers are) writes its own
+`<name>.<pid><ext>` file. Put `{pid}` in `LOG_FILE` to get the same under a
+server that forks its workers.
+
+Repeats of the same exception (same type, raised from the same line) are
+logged once per `LOG_EXCEPTION_RATE_WINDOW` seconds, the next record that
+gets through says how many were suppressed. Records below `LOG_LEVEL` are
+dropped by the logger before a record is even created.
+"""
+import atexit
+import gzip
 import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+import orjson
+
+from api.utils.settings import settings
+
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single line JSON objects"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed_repeats"] = suppressed
+        if record.exc_info:
+            entry["exc_type"] = record.exc_info[0].__name__
+            entry["traceback"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            exc_type = getattr(record, "exc_type", None)
+            if exc_type:
+                entry["exc_type"] = exc_type
+            entry["traceback"] = record.exc_text
+
+        return orjson.dumps(entry).decode()
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the current request id"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class ExceptionRateLimitFilter(logging.Filter):
+    """Lets the same exception through at most once per `window` seconds"""
+
+    def __init__(self, window: float):
+        super().__init__()
+        self.window = window
+        self._lock = threading.Lock()
+        # key -> (window started at, repeats suppressed in the window)
+        self._seen: Dict[Tuple, Tuple[float, int]] = {}
+
+    @staticmethod
+    def _key(record: logging.LogRecord) -> Optional[Tuple]:
+        if not record.exc_info or record.exc_info[1] is None:
+            return None
+        exc_type, _exc, tb = record.exc_info
+        origin = None
+        if tb is not None:
+            # Innermost frame: where the exception was raised
+            while tb.tb_next is not None:
+                tb = tb.tb_next
+            origin = (tb.tb_frame.f_code.co_filename, tb.tb_lineno)
+        return (record.name, exc_type, origin)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.window <= 0:
+            return True
+        key = self._key(record)
+        if key is None:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            started, suppressed = self._seen.get(key, (None, 0))
+            if started is not None and now - started < self.window:
+                self._seen[key] = (started, suppressed + 1)
+                return False
+
+            self._seen[key] = (now, 0)
+            if len(self._seen) > 10_000:
+                self._seen.clear()
+
+        record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that never blocks and defers formatting.
+
+    The stock handler formats the whole record in the calling thread; here
+    only the message and the traceback are resolved and the rest is left to
+    the listener thread. The traceback is rendered now and `exc_info`
+    dropped, so a queued record holds no frames. When the queue is full the
+    record is dropped and counted instead of blocking the caller.
+    """
+
+    _traceback_formatter = logging.Formatter()
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if record.exc_info[0] is not None:
+                record.exc_type = record.exc_info[0].__name__
+                record.exc_text = self._traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _process_log_file(path: str) -> str:
+    """The log file of this process: `{pid}` in `path` is replaced, and
+    workers spawned by a multi-worker server get a file of their own"""
+
+    pid = os.getpid()
+    if "{pid}" in path:
+        return path.replace("{pid}", str(pid))
+    if multiprocessing.parent_process() is not None:
+        root, ext = os.path.splitext(path)
+        return f"{root}.{pid}{ext}"
+    return path
+
+
+def _file_handler(path: str, max_bytes: int, backup_count: int) -> logging.Handler:
+    handler = RotatingFileHandler(
+        _process_log_file(path), maxBytes=max_bytes, backupCount=backup_count,
+        encoding="utf-8", delay=True,
+    )
+    handler.namer = lambda name: f"{name}.gz"
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+_listener: Optional[QueueListener] = None
+queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def configure_logging(
+    level: str = settings.LOG_LEVEL,
+    log_file: Optional[str] = settings.LOG_FILE,
+    max_bytes: int = settings.LOG_MAX_BYTES,
+    backup_count: int = settings.LOG_BACKUP_COUNT,
+    queue_size: int = settings.LOG_QUEUE_SIZE,
+    exception_window: float = settings.LOG_EXCEPTION_RATE_WINDOW,
+):
+    """Route the root logger through a background queue listener"""
+
+    global _listener, queue_handler
+
+    stop_logging()
+
+    formatter = JsonFormatter()
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(_file_handler(log_file, max_bytes, backup_count))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.addFilter(ExceptionRateLimitFilter(exception_window))
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
 
-# Configure the logging
-logging.basicConfig(
-    level=logging.ERROR,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("error.log"), logging.StreamHandler()],
-)
+configure_logging()
+atexit.register(stop_logging)
 
-logger = logging.getLogger(__name__)
\ No newline at end of file
+logger = logging.getLogger(__name__)
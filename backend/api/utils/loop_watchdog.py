@@ -0,0 +1,195 @@
+""" Event loop blocking detector
+
+`LoopWatchdog.run()` is a heartbeat task on the event loop: it sleeps for
+`interval` seconds and records how late it woke up as the loop lag
+(`event_loop_lag_seconds`). A companion thread checks the heartbeat; when
+it is more than `threshold` seconds overdue, something is holding the loop
+and the thread grabs the loop thread's current stack with
+`sys._current_frames()`.
+
+Stalls are aggregated by call site, the innermost frame of our own code on
+the stack (the library frame actually blocking is kept alongside), with
+their count, total and worst duration and one sample stack. The report is
+served at `/api/v1/admin/loop/blocking`.
+
+Cost when the loop is healthy: one short timer per `interval` on the loop
+and one sleeping thread; stacks are only walked during a stall.
+"""
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from api.utils.logger import logger
+from api.utils.metrics import event_loop_blocked, event_loop_lag
+from api.utils.settings import settings
+
+
+PROJECT_ROOT = str(Path(__file__).resolve().parents[2])
+
+# The watchdog's own frames are never the call site
+_SKIP_FILES = (__file__,)
+
+
+def _in_project(filename: str) -> bool:
+    return filename.startswith(PROJECT_ROOT) and "site-packages" not in filename
+
+
+class BlockingSite:
+    """Stalls attributed to one call site"""
+
+    __slots__ = ("site", "leaf", "count", "total", "max", "last_seen", "stack")
+
+    def __init__(self, site: str, leaf: str, stack: List[str]):
+        self.site = site
+        self.leaf = leaf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_seen = 0.0
+        self.stack = stack
+
+    def as_dict(self) -> dict:
+        return {
+            "site": self.site,
+            "blocking_frame": self.leaf,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0,
+            "last_seen": self.last_seen,
+            "stack": self.stack,
+        }
+
+
+class LoopWatchdog:
+    """Measures event loop lag and captures the stacks of long stalls"""
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1, max_sites: int = 200):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_sites = max_sites
+        self.sites: Dict[str, BlockingSite] = {}
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        # Site captured for the stall in progress, if any
+        self._pending: Optional[BlockingSite] = None
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _describe(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+
+    def _capture(self) -> Optional[BlockingSite]:
+        """The loop thread's current call site, not yet counted in `sites`"""
+
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+
+        frames = []
+        while frame is not None:
+            if frame.f_code.co_filename not in _SKIP_FILES:
+                frames.append(frame)
+            frame = frame.f_back
+        if not frames:
+            return None
+
+        leaf = self._describe(frames[0])
+        site = next((self._describe(f) for f in frames if _in_project(f.f_code.co_filename)), leaf)
+        stack = [self._describe(f) for f in reversed(frames)]
+
+        return BlockingSite(site, leaf, stack)
+
+    def _watch(self):
+        """Watchdog thread: capture the loop's stack once per stall"""
+
+        # The heartbeat is due `interval` after the last one; later than
+        # that by more than `threshold` means the loop is held
+        overdue = self.interval + self.threshold
+        captured_beat = None
+        while not self._stop_event.wait(self.threshold / 2):
+            beat = self._last_beat
+            if time.monotonic() - beat > overdue and beat != captured_beat:
+                captured_beat = beat
+                site = self._capture()
+                # Drop the capture if the loop came back while we walked it
+                if self._last_beat == beat:
+                    self._pending = site
+
+    def _record(self, lag: float):
+        event_loop_lag.observe(lag)
+        self.max_lag = max(self.max_lag, lag)
+
+        site, self._pending = self._pending, None
+        if lag < self.threshold:
+            return
+
+        self.stalls += 1
+        event_loop_blocked.inc()
+        if site is None:
+            return
+        # Only a capture accepted here enters the report
+        with self._lock:
+            entry = self.sites.get(site.site)
+            if entry is None and len(self.sites) < self.max_sites:
+                entry = self.sites[site.site] = site
+            if entry is not None:
+                entry.leaf, entry.stack = site.leaf, site.stack
+                entry.count += 1
+                entry.total += lag
+                entry.max = max(entry.max, lag)
+                entry.last_seen = time.time()
+        logger.warning(
+            "Event loop blocked for %.0f ms at %s", lag * 1000, site.site,
+            extra={"fields": {"blocked_ms": round(lag * 1000, 3), "site": site.site, "blocking_frame": site.leaf}},
+        )
+
+    def report(self, limit: int = 50) -> dict:
+        with self._lock:
+            sites = sorted(self.sites.values(), key=lambda site: site.total, reverse=True)
+            return {
+                "interval_ms": self.interval * 1000,
+                "threshold_ms": self.threshold * 1000,
+                "stalls": self.stalls,
+                "max_lag_ms": round(self.max_lag * 1000, 3),
+                "sites": [site.as_dict() for site in sites[:limit]],
+            }
+
+    def reset(self):
+        with self._lock:
+            self.sites.clear()
+            self.stalls = 0
+            self.max_lag = 0.0
+
+    async def run(self):
+        """Heartbeat until cancelled; starts and stops the watchdog thread"""
+
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        watcher = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        watcher.start()
+
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                self._last_beat = now
+                self._record(max(now - expected, 0.0))
+        finally:
+            self._stop_event.set()
+            watcher.join()
+
+
+loop_watchdog = LoopWatchdog(
+    interval=settings.LOOP_WATCHDOG_INTERVAL,
+    threshold=settings.LOOP_WATCHDOG_THRESHOLD,
+)
@@ -0,0 +1,256 @@
+""" Memory diagnostics
+
+Helpers behind the `/api/v1/admin/memory` endpoints, for finding slow leaks
+in long running workers without restarting them:
+
+* `rss_bytes()` reads the resident set size cheaply; `MetricsSampler`
+  exports it as `process_rss_bytes` alongside the traced heap size.
+* `MemoryTracer` starts and stops `tracemalloc`, keeps named snapshots and
+  diffs them by allocation site. While tracing it also records, per route,
+  how much traced memory requests leave behind (see `MemoryMiddleware`) and
+  takes snapshot diffs around armed requests, which gives the top
+  allocation sites of one route.
+* `live_objects()` counts live ORM instances by model, and live sessions
+  with the size of their identity maps.
+
+Tracing slows allocation heavy code down noticeably (more so with deep
+tracebacks), so it is off until started and should be stopped after use.
+Like request profiles, per route numbers include whatever ran concurrently.
+"""
+import gc
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # No procfs: fall back to the peak RSS (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _stat_entry(stat) -> dict:
+    frame = stat.traceback[0]
+    return {
+        "site": f"{frame.filename}:{frame.lineno}",
+        "size_bytes": stat.size,
+        "count": stat.count,
+        "traceback": [f"{f.filename}:{f.lineno}" for f in stat.traceback],
+    }
+
+
+def _diff_entry(stat) -> dict:
+    frame = stat.traceback[0]
+    return {
+        "site": f"{frame.filename}:{frame.lineno}",
+        "size_diff_bytes": stat.size_diff,
+        "count_diff": stat.count_diff,
+        "size_bytes": stat.size,
+        "traceback": [f"{f.filename}:{f.lineno}" for f in stat.traceback],
+    }
+
+
+def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    # Leave out tracemalloc's own bookkeeping
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+
+class RouteAllocations:
+    """Traced memory requests to one route left behind"""
+
+    __slots__ = ("requests", "retained_bytes", "max_retained_bytes", "top_sites")
+
+    def __init__(self):
+        self.requests = 0
+        self.retained_bytes = 0
+        self.max_retained_bytes = 0
+        # Allocation sites from the latest armed snapshot diff
+        self.top_sites: List[dict] = []
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retained_bytes": self.retained_bytes,
+            "avg_retained_bytes": round(self.retained_bytes / self.requests) if self.requests else 0,
+            "max_retained_bytes": self.max_retained_bytes,
+            "top_sites": self.top_sites,
+        }
+
+
+class MemoryTracer:
+    """Controls tracemalloc and keeps snapshots and per route stats"""
+
+    def __init__(self, max_snapshots: int = 10):
+        self.max_snapshots = max_snapshots
+        self.snapshots: "OrderedDict[str, Tuple[float, tracemalloc.Snapshot]]" = OrderedDict()
+        self.routes: Dict[Tuple[str, str], RouteAllocations] = {}
+        # (method, route path) -> requests left to snapshot
+        self.armed: Dict[Tuple[str, str], int] = {}
+        self.started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        tracemalloc.start(frames)
+        self.started_at = time.time()
+        with self._lock:
+            self.routes.clear()
+
+    def stop(self):
+        tracemalloc.stop()
+        self.started_at = None
+        with self._lock:
+            self.snapshots.clear()
+            self.armed.clear()
+
+    def status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory() if self.tracing else (0, 0)
+        return {
+            "tracing": self.tracing,
+            "started_at": self.started_at,
+            "frames": tracemalloc.get_traceback_limit() if self.tracing else None,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory() if self.tracing else 0,
+            "rss_bytes": rss_bytes(),
+            "snapshots": [
+                {"name": name, "taken_at": taken_at}
+                for name, (taken_at, _snapshot) in self.snapshots.items()
+            ],
+        }
+
+    def take_snapshot(self, name: Optional[str] = None) -> tracemalloc.Snapshot:
+        """Take a snapshot, kept under `name` when given (slow: walks every
+        traced block)"""
+
+        snapshot = _filtered(tracemalloc.take_snapshot())
+        if name is None:
+            return snapshot
+        with self._lock:
+            self.snapshots.pop(name, None)
+            self.snapshots[name] = (time.time(), snapshot)
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+        return snapshot
+
+    def get_snapshot(self, name: str) -> Optional[tracemalloc.Snapshot]:
+        entry = self.snapshots.get(name)
+        return entry[1] if entry else None
+
+    @staticmethod
+    def top(snapshot: tracemalloc.Snapshot, key_type: str = "lineno", limit: int = 25) -> List[dict]:
+        return [_stat_entry(stat) for stat in snapshot.statistics(key_type)[:limit]]
+
+    @staticmethod
+    def diff(
+        old: tracemalloc.Snapshot,
+        new: tracemalloc.Snapshot,
+        key_type: str = "lineno",
+        limit: int = 25,
+    ) -> List[dict]:
+        """Allocation sites by growth from `old` to `new`"""
+
+        return [
+            _diff_entry(stat)
+            for stat in new.compare_to(old, key_type)[:limit]
+            if stat.size_diff or stat.count_diff
+        ]
+
+    def arm(self, method: str, path: str, count: int):
+        with self._lock:
+            self.armed[(method.upper(), path)] = count
+
+    def take(self, method: str, path: str) -> bool:
+        """Consume one armed snapshot trigger for the route, if any"""
+
+        with self._lock:
+            key = (method, path)
+            left = self.armed.get(key)
+            if not left:
+                return False
+            if left == 1:
+                del self.armed[key]
+            else:
+                self.armed[key] = left - 1
+            return True
+
+    def record(self, method: str, path: str, retained: int, top_sites: Optional[List[dict]] = None):
+        with self._lock:
+            stats = self.routes.get((method, path))
+            if stats is None:
+                stats = self.routes[(method, path)] = RouteAllocations()
+            stats.requests += 1
+            stats.retained_bytes += retained
+            stats.max_retained_bytes = max(stats.max_retained_bytes, retained)
+            if top_sites is not None:
+                stats.top_sites = top_sites
+
+    def route_report(self) -> List[dict]:
+        with self._lock:
+            items = [
+                {"method": method, "path": path, **stats.as_dict()}
+                for (method, path), stats in self.routes.items()
+            ]
+        return sorted(items, key=lambda item: item["retained_bytes"], reverse=True)
+
+
+def live_objects(limit: int = 25) -> dict:
+    """Live ORM instances by model, and live sessions.
+
+    Walks every object tracked by the garbage collector, which takes a
+    while on a big heap; call it from a worker thread.
+    """
+    from api.db.database import Base
+
+    models = {mapper.class_ for mapper in Base.registry.mappers}
+    instances = Counter()
+    sessions = 0
+    sessions_holding_objects = 0
+    identity_map_objects = 0
+
+    for obj in gc.get_objects():
+        cls = type(obj)
+        if cls in models:
+            instances[cls.__name__] += 1
+        elif isinstance(obj, Session):
+            sessions += 1
+            held = len(obj.identity_map)
+            identity_map_objects += held
+            if held:
+                sessions_holding_objects += 1
+
+    return {
+        "orm_instances": sum(instances.values()),
+        "orm_instances_by_model": dict(instances.most_common(limit)),
+        "sessions": sessions,
+        "sessions_holding_objects": sessions_holding_objects,
+        "identity_map_objects": identity_map_objects,
+        "gc_counts": gc.get_count(),
+    }
+
+
+memory_tracer = MemoryTracer()
@@ -0,0 +1,254 @@
+""" Prometheus metrics
+
+Request metrics (counts, latency histograms, errors by status) are recorded
+by `MetricsMiddleware`. Saturation gauges, RSS and cache counters are sampled
+from the app's own state by `metrics_sampler` every
+`METRICS_SAMPLE_INTERVAL` seconds and again on each scrape.
+
+Multiple uvicorn workers: set the `PROMETHEUS_MULTIPROC_DIR` environment
+variable to an empty, writable directory shared by the workers (wipe it on
+deploy). Every worker then writes its metrics to memory mapped files in it
+and `/metrics` aggregates them, whichever worker serves the scrape.
+Gauges are summed (or maxed) across the live workers.
+"""
+import asyncio
+import os
+import time
+import tracemalloc
+from typing import Callable, Dict, Optional, Tuple
+
+from anyio import to_thread
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+from api.utils.logger import logger
+from api.utils.memory import rss_bytes
+
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+http_requests = Counter(
+    "http_requests_total",
+    "HTTP requests by route and status",
+    ["method", "route", "status"],
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+http_errors = Counter(
+    "http_errors_total",
+    "HTTP responses with a 4xx or 5xx status",
+    ["status"],
+)
+
+db_pool_checked_out = Gauge(
+    "db_pool_checked_out", "DB connections checked out of the pool", multiprocess_mode="livesum"
+)
+db_pool_size = Gauge(
+    "db_pool_size", "DB pool size, excluding overflow", multiprocess_mode="livesum"
+)
+db_pool_overflow = Gauge(
+    "db_pool_overflow", "DB connections open beyond the pool size", multiprocess_mode="livesum"
+)
+db_pool_waiters = Gauge(
+    "db_pool_waiters", "Threads waiting for a DB connection", multiprocess_mode="livesum"
+)
+threadpool_busy = Gauge(
+    "threadpool_busy_threads", "AnyIO worker threads in use", multiprocess_mode="livesum"
+)
+threadpool_size = Gauge(
+    "threadpool_max_threads", "AnyIO worker thread limit", multiprocess_mode="livesum"
+)
+smtp_connections_in_use = Gauge(
+    "smtp_connections_in_use", "Pooled SMTP connections sending", multiprocess_mode="livesum"
+)
+email_outbox_pending = Gauge(
+    "email_outbox_pending", "Emails waiting in the outbox", multiprocess_mode="livemax"
+)
+activity_events_buffered = Gauge(
+    "activity_events_buffered", "Tool activity events not flushed yet", multiprocess_mode="livesum"
+)
+activity_events_dropped = Counter(
+    "activity_events_dropped_total",
+    "Tool activity events dropped on a full buffer or rejected by the database",
+)
+cache_requests = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit ratio = hit / total)",
+    ["cache", "result"],
+)
+process_rss = Gauge(
+    "process_rss_bytes", "Resident set size per worker", multiprocess_mode="liveall"
+)
+tracemalloc_traced = Gauge(
+    "tracemalloc_traced_bytes",
+    "Heap traced by tracemalloc (0 unless memory tracing is running)",
+    multiprocess_mode="liveall",
+)
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a periodic heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+event_loop_blocked = Counter(
+    "event_loop_blocked_total", "Event loop stalls longer than LOOP_WATCHDOG_THRESHOLD"
+)
+emails_sent = Counter("smtp_messages_sent_total", "Messages sent over pooled SMTP connections")
+
+
+class MetricsSampler:
+    """Copies gauges and cumulative counters from the app's state into
+    Prometheus metrics"""
+
+    def __init__(self):
+        # Counter sources: (metric child, read current cumulative value)
+        self._counters: Dict[Tuple, Tuple[object, Callable[[], int]]] = {}
+        self._last: Dict[Tuple, int] = {}
+        self._configured = False
+
+    def _configure(self):
+        from api.core.dependencies.email.deliverability import deliverability_checker
+        from api.core.dependencies.email.smtp_pool import smtp_pool
+        from api.core.middleware.compression import compression_stats
+        from api.v1.services.email_outbox import email_outbox_service
+        from api.v1.services.tool_activity import tool_activity_service
+        from api.v1.services.usage_metering import usage_metering_service
+
+        def cache(name, hits, misses):
+            self._counters[(name, "hit")] = (cache_requests.labels(name, "hit"), hits)
+            self._counters[(name, "miss")] = (cache_requests.labels(name, "miss"), misses)
+
+        cache("compression", lambda: compression_stats.cache_hits, lambda: compression_stats.cache_misses)
+        cache("email_dns", lambda: deliverability_checker.cache_hits, lambda: deliverability_checker.lookups)
+        cache(
+            "usage_limit",
+            lambda: usage_metering_service.limit_cache_hits,
+            lambda: usage_metering_service.limit_cache_misses,
+        )
+        # Deduplicated emails are "hits": a send that reused an earlier message
+        self._counters[("email_dedupe", "hit")] = (
+            cache_requests.labels("email_dedupe", "hit"), lambda: email_outbox_service.deduplicated
+        )
+        self._counters[("smtp_sent",)] = (emails_sent, lambda: smtp_pool.messages_sent)
+        self._counters[("activity_dropped",)] = (
+            activity_events_dropped, lambda: tool_activity_service.dropped_events
+        )
+        self._configured = True
+
+    def _sample_counters(self):
+        for key, (metric, read) in self._counters.items():
+            value = read()
+            delta = value - self._last.get(key, 0)
+            if delta > 0:
+                metric.inc(delta)
+            self._last[key] = value
+
+    def sample(self):
+        """Sample in-process state. Call from the event loop thread."""
+
+        from api.core.dependencies.email.smtp_pool import smtp_pool
+        from api.db.database import engine
+        from api.v1.services.tool_activity import tool_activity_service
+
+        if not self._configured:
+            self._configure()
+
+        pool = engine.pool
+        if hasattr(pool, "checkedout"):
+            db_pool_checked_out.set(pool.checkedout())
+            db_pool_size.set(pool.size())
+            db_pool_overflow.set(max(pool.overflow(), 0))
+            # QueuePool has no public waiter count; read it off the
+            # queue's condition when available
+            waiters = getattr(getattr(getattr(pool, "_pool", None), "not_empty", None), "_waiters", None)
+            if waiters is not None:
+                db_pool_waiters.set(len(waiters))
+
+        limiter = to_thread.current_default_thread_limiter()
+        threadpool_busy.set(limiter.borrowed_tokens)
+        threadpool_size.set(limiter.total_tokens)
+
+        process_rss.set(rss_bytes())
+        tracemalloc_traced.set(tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0)
+
+        smtp_connections_in_use.set(smtp_pool.in_use)
+        activity_events_buffered.set(tool_activity_service.buffered_events)
+        self._sample_counters()
+
+    def sample_outbox(self):
+        """Sample the email outbox depth (runs a query; call off the loop)"""
+
+        from api.db.database import db_session
+        from api.v1.services.email_outbox import email_outbox_service
+
+        db = db_session()
+        try:
+            email_outbox_pending.set(email_outbox_service.pending_count(db))
+        except Exception as exc:
+            logger.warning(f"Failed to sample the email outbox; {exc}")
+        finally:
+            db.close()
+
+    async def run(self, interval: float):
+        """Sample periodically until cancelled"""
+
+        while True:
+            self.sample()
+            await to_thread.run_sync(self.sample_outbox)
+            await asyncio.sleep(interval)
+
+
+metrics_sampler = MetricsSampler()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render all metrics in the Prometheus text format"""
+
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: Optional[int] = None):
+    """Drop this worker's live gauges from the multiprocess aggregation"""
+
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+class RouteMetrics:
+    """Cached metric children for one (method, route) pair"""
+
+    __slots__ = ("duration", "by_status")
+
+    def __init__(self, method: str, route: str):
+        self.duration = http_request_duration.labels(method, route)
+        self.by_status: Dict[int, object] = {}
+
+    def observe(self, method: str, route: str, status_code: int, started: float):
+        self.duration.observe(time.perf_counter() - started)
+
+        counter = self.by_status.get(status_code)
+        if counter is None:
+            counter = self.by_status[status_code] = http_requests.labels(method, route, str(status_code))
+        counter.inc()
+
+        if status_code >= 400:
+            http_errors.labels(str(status_code)).inc()
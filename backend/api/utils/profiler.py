@@ -0,0 +1,349 @@
+""" On-demand sampling profiler
+
+A `SamplingProfiler` runs a background thread that snapshots the Python
+stacks of the event loop thread and the busy AnyIO worker threads every
+`interval` seconds while a profiled request is in flight. Idle stacks (the
+loop waiting in `select`, workers waiting for work) are dropped, the rest
+are counted per unique stack. The result can be exported as collapsed
+stacks (`frame;frame;frame count` lines), the input format of
+flamegraph.pl, speedscope and most flame graph viewers.
+
+Sampling sees whatever those threads are running, so requests served
+concurrently with a profiled one show up in its profile too; profile on a
+quiet instance or compare several profiles when that matters.
+
+Multiple uvicorn workers: profiles and armed triggers live in the worker's
+memory unless `PROFILER_DIR` points at a directory shared by the workers.
+Then every worker writes its profiles there and takes armed triggers from
+there, so any worker can serve a profile and arming a route arms them all.
+"""
+import fcntl
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from api.utils.settings import settings
+
+
+PROJECT_ROOT = str(Path(__file__).resolve().parents[2])
+
+# (function, file) of leaf frames where a thread sits idle
+_IDLE_LEAVES = {
+    ("select", "selectors.py"),
+    ("poll", "selectors.py"),
+    ("wait", "threading.py"),
+    ("get", "queue.py"),
+}
+
+Frame = Tuple[str, str, int]
+
+
+def _frame_label(frame: Frame) -> str:
+    name, filename, lineno = frame
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+@dataclass
+class Profile:
+    """Samples collected for one request"""
+
+    method: str
+    path: str
+    interval: float
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    created_at: float = field(default_factory=time.time)
+    duration: float = 0.0
+    status_code: Optional[int] = None
+    samples: Counter = field(default_factory=Counter)
+
+    @property
+    def total_samples(self) -> int:
+        return sum(self.samples.values())
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, root first, one unique stack per line"""
+
+        return "\n".join(
+            f"{';'.join(_frame_label(frame) for frame in stack)} {count}"
+            for stack, count in self.samples.most_common()
+        ) + "\n"
+
+    def top_functions(self, limit: int = 25) -> List[dict]:
+        """Functions by self and total (inclusive) samples"""
+
+        own = Counter()
+        total = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            for frame in set(stack):
+                total[frame] += count
+
+        samples = self.total_samples or 1
+        return [
+            {
+                "function": _frame_label(frame),
+                "self_samples": own[frame],
+                "total_samples": count,
+                "total_percent": round(100 * count / samples, 1),
+            }
+            for frame, count in total.most_common(limit)
+        ]
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "created_at": self.created_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.total_samples,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "interval": self.interval,
+            "created_at": self.created_at,
+            "duration": self.duration,
+            "status_code": self.status_code,
+            "samples": [[stack, count] for stack, count in self.samples.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Profile":
+        samples = Counter({
+            tuple(tuple(frame) for frame in stack): count for stack, count in data.pop("samples")
+        })
+        return cls(**data, samples=samples)
+
+
+class SamplingProfiler(threading.Thread):
+    """Samples the loop and worker thread stacks into a `Profile`"""
+
+    def __init__(self, profile: Profile, loop_thread_id: int):
+        super().__init__(name="request-profiler", daemon=True)
+        self.profile = profile
+        self.loop_thread_id = loop_thread_id
+        self._stop_event = threading.Event()
+        self._started_at = 0.0
+
+    def _target_threads(self) -> Set[int]:
+        targets = {self.loop_thread_id}
+        for thread in threading.enumerate():
+            if thread.name.startswith("AnyIO worker thread"):
+                targets.add(thread.ident)
+        return targets
+
+    @staticmethod
+    def _stack(frame) -> Optional[Tuple[Frame, ...]]:
+        stack = []
+        in_project = False
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            if code.co_filename.startswith(PROJECT_ROOT) and "site-packages" not in code.co_filename:
+                in_project = True
+            frame = frame.f_back
+
+        leaf_name, leaf_file, _ = stack[0]
+        if not in_project and (leaf_name, os.path.basename(leaf_file)) in _IDLE_LEAVES:
+            return None
+
+        stack.reverse()
+        return tuple(stack)
+
+    def run(self):
+        interval = self.profile.interval
+        samples = self.profile.samples
+        own_id = threading.get_ident()
+
+        while not self._stop_event.wait(interval):
+            targets = self._target_threads()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or thread_id not in targets:
+                    continue
+                stack = self._stack(frame)
+                if stack:
+                    samples[stack] += 1
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        super().start()
+
+    def stop(self) -> Profile:
+        self._stop_event.set()
+        self.join()
+        self.profile.duration = time.perf_counter() - self._started_at
+        return self.profile
+
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{12}$")
+
+
+class ProfileStore:
+    """Recent profiles and armed route triggers, in this worker's memory or,
+    given a `directory`, in files shared by every worker"""
+
+    def __init__(self, max_profiles: int = 20, directory: Optional[str] = None):
+        self.max_profiles = max_profiles
+        self.directory = Path(directory) if directory else None
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        # (method, route path) -> requests left to profile
+        self._armed: Dict[Tuple[str, str], int] = {}
+        self._armed_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+        if self.directory is not None:
+            (self.directory / "profiles").mkdir(parents=True, exist_ok=True)
+
+    # Shared directory
+
+    def _profile_path(self, profile_id: str) -> Path:
+        return self.directory / "profiles" / f"{profile_id}.json"
+
+    @property
+    def _armed_path(self) -> Path:
+        return self.directory / "armed.json"
+
+    @contextmanager
+    def _locked(self):
+        """Hold the store lock, across workers when the store is shared"""
+
+        with self._lock:
+            if self.directory is None:
+                yield
+                return
+            with open(self.directory / ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_json(self, path: Path, data):
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, path)
+
+    def _load_armed(self):
+        """Reload the shared triggers if another worker changed them"""
+
+        try:
+            mtime = self._armed_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._armed, self._armed_mtime = {}, None
+            return
+        if mtime != self._armed_mtime:
+            entries = json.loads(self._armed_path.read_text())
+            self._armed = {(method, path): left for method, path, left in entries}
+            self._armed_mtime = mtime
+
+    def _save_armed(self):
+        self._write_json(self._armed_path, [[*key, left] for key, left in self._armed.items()])
+        self._armed_mtime = self._armed_path.stat().st_mtime_ns
+
+    # Profiles
+
+    def add(self, profile: Profile):
+        if self.directory is None:
+            with self._lock:
+                self._profiles[profile.id] = profile
+                while len(self._profiles) > self.max_profiles:
+                    self._profiles.popitem(last=False)
+            return
+
+        self._write_json(self._profile_path(profile.id), profile.to_dict())
+        with self._locked():
+            for path in self._profile_paths()[self.max_profiles:]:
+                path.unlink(missing_ok=True)
+
+    def _profile_paths(self) -> List[Path]:
+        """Shared profile files, newest first"""
+
+        paths = []
+        for path in (self.directory / "profiles").glob("*.json"):
+            try:
+                paths.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        return [path for _, path in sorted(paths, reverse=True)]
+
+    @staticmethod
+    def _read_profile(path: Path) -> Optional[Profile]:
+        try:
+            return Profile.from_dict(json.loads(path.read_text()))
+        except FileNotFoundError:
+            return None
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        if self.directory is None:
+            return self._profiles.get(profile_id)
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        return self._read_profile(self._profile_path(profile_id))
+
+    def list(self) -> List[Profile]:
+        if self.directory is None:
+            return list(reversed(self._profiles.values()))
+        return [
+            profile for profile in map(self._read_profile, self._profile_paths())
+            if profile is not None
+        ]
+
+    # Armed triggers
+
+    @property
+    def armed(self) -> Dict[Tuple[str, str], int]:
+        """(method, route path) -> requests left to profile"""
+
+        if self.directory is not None:
+            with self._lock:
+                self._load_armed()
+        return self._armed
+
+    def arm(self, method: str, path: str, count: int):
+        with self._locked():
+            if self.directory is not None:
+                self._load_armed()
+            self._armed = {**self._armed, (method.upper(), path): count}
+            if self.directory is not None:
+                self._save_armed()
+
+    def take(self, method: str, path: str) -> bool:
+        """Consume one armed trigger for the route, if any"""
+
+        with self._locked():
+            if self.directory is not None:
+                self._load_armed()
+            key = (method, path)
+            left = self._armed.get(key)
+            if not left:
+                return False
+            armed = dict(self._armed)
+            if left == 1:
+                del armed[key]
+            else:
+                armed[key] = left - 1
+            self._armed = armed
+            if self.directory is not None:
+                self._save_armed()
+            return True
+
+
+profile_store = ProfileStore(
+    max_profiles=settings.PROFILER_MAX_PROFILES,
+    directory=settings.PROFILER_DIR or None,
+)
@@ -28,6 +28,45 @@ class Settings(BaseSettings):
     MAIL_FROM: str = config("MAIL_FROM")
     MAIL_PORT: int = config("MAIL_PORT")
     MAIL_SERVER: str = config("MAIL_SERVER")
+    MAIL_FROM_NAME: str = config("MAIL_FROM_NAME", default="HNG Boilerplate")
+    MAIL_SSL_TLS: bool = config("MAIL_SSL_TLS", default=True, cast=bool)
+    MAIL_STARTTLS: bool = config("MAIL_STARTTLS", default=False, cast=bool)
+    MAIL_USE_CREDENTIALS: bool = config("MAIL_USE_CREDENTIALS", default=True, cast=bool)
+
+    # SMTP connection pool
+    SMTP_POOL_SIZE: int = config("SMTP_POOL_SIZE", default=4, cast=int)
+    SMTP_IDLE_TIMEOUT: float = config("SMTP_IDLE_TIMEOUT", default=60, cast=float)
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = config(
+        "SMTP_MAX_MESSAGES_PER_CONNECTION", default=100, cast=int
+    )
+
+    # Transactional email outbox
+    EMAIL_OUTBOX_BATCH_SIZE: int = config("EMAIL_OUTBOX_BATCH_SIZE", default=50, cast=int)
+    EMAIL_OUTBOX_POLL_INTERVAL: float = config("EMAIL_OUTBOX_POLL_INTERVAL", default=2, cast=float)
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = config("EMAIL_OUTBOX_MAX_ATTEMPTS", default=8, cast=int)
+    EMAIL_OUTBOX_BACKOFF_BASE: float = config("EMAIL_OUTBOX_BACKOFF_BASE", default=30, cast=float)
+    EMAIL_OUTBOX_BACKOFF_MAX: float = config("EMAIL_OUTBOX_BACKOFF_MAX", default=3600, cast=float)
+    EMAIL_OUTBOX_LEASE: int = config("EMAIL_OUTBOX_LEASE", default=300, cast=int)
+    EMAIL_OUTBOX_RETENTION_DAYS: int = config("EMAIL_OUTBOX_RETENTION_DAYS", default=30, cast=int)
+    EMAIL_OUTBOX_PRUNE_INTERVAL: int = config("EMAIL_OUTBOX_PRUNE_INTERVAL", default=3600, cast=int)
+    # Repeat sends of the same template to the same recipient inside the
+    # window reuse the earlier message: "template:seconds,template:seconds"
+    EMAIL_DEDUPE_WINDOWS: str = config(
+        "EMAIL_DEDUPE_WINDOWS",
+        default="magic-link.html:60,reset-password.html:60",
+    )
+
+    # Email domain deliverability (MX) checks
+    EMAIL_DNS_TIMEOUT: float = config("EMAIL_DNS_TIMEOUT", default=2, cast=float)
+    EMAIL_DNS_POSITIVE_TTL: float = config("EMAIL_DNS_POSITIVE_TTL", default=3600, cast=float)
+    EMAIL_DNS_NEGATIVE_TTL: float = config("EMAIL_DNS_NEGATIVE_TTL", default=300, cast=float)
+    # Extra comma separated domains that skip DNS checks
+    EMAIL_DOMAIN_ALLOWLIST: str = config("EMAIL_DOMAIN_ALLOWLIST", default="")
+
+    # Bulk email campaigns
+    CAMPAIGN_RATE_PER_SECOND: float = config("CAMPAIGN_RATE_PER_SECOND", default=20, cast=float)
+    CAMPAIGN_CONCURRENCY: int = config("CAMPAIGN_CONCURRENCY", default=4, cast=int)
+    CAMPAIGN_CHUNK_SIZE: int = config("CAMPAIGN_CHUNK_SIZE", default=500, cast=int)
 
     FLUTTERWAVE_SECRET: str = config("FLUTTERWAVE_SECRET")
 
@@ -37,5 +76,84 @@ class Settings(BaseSettings):
 
     FRONTEND_MAGICLINK_URL: str = config("FRONTEND_MAGICLINK_URL")
 
+    # Logging; LOG_FILE may contain {pid}, and each uvicorn worker writes a
+    # file of its own anyway
+    LOG_LEVEL: str = config("LOG_LEVEL", default="ERROR")
+    LOG_FILE: str = config("LOG_FILE", default="error.log")
+    LOG_MAX_BYTES: int = config("LOG_MAX_BYTES", default=10 * 1024 * 1024, cast=int)
+    LOG_BACKUP_COUNT: int = config("LOG_BACKUP_COUNT", default=5, cast=int)
+    LOG_QUEUE_SIZE: int = config("LOG_QUEUE_SIZE", default=10000, cast=int)
+    LOG_EXCEPTION_RATE_WINDOW: float = config("LOG_EXCEPTION_RATE_WINDOW", default=60, cast=float)
+
+    # Subscription expiry sweeper
+    SUBSCRIPTION_SWEEP_INTERVAL: int = config(
+        "SUBSCRIPTION_SWEEP_INTERVAL", default=300, cast=int
+    )
+    SUBSCRIPTION_SWEEP_BATCH_SIZE: int = config(
+        "SUBSCRIPTION_SWEEP_BATCH_SIZE", default=500, cast=int
+    )
+
+    # Usage metering
+    USAGE_FLUSH_INTERVAL: int = config("USAGE_FLUSH_INTERVAL", default=10, cast=int)
+    USAGE_LIMIT_CACHE_TTL: int = config("USAGE_LIMIT_CACHE_TTL", default=60, cast=int)
+    USAGE_RESERVATION_SIZE: int = config("USAGE_RESERVATION_SIZE", default=5, cast=int)
+
+    # User statistics
+    USER_STATS_RECONCILE_INTERVAL: int = config(
+        "USER_STATS_RECONCILE_INTERVAL", default=600, cast=int
+    )
+
+    # Tool activity ingestion; events beyond ACTIVITY_BUFFER_SIZE are
+    # dropped until the next flush
+    ACTIVITY_FLUSH_INTERVAL: float = config("ACTIVITY_FLUSH_INTERVAL", default=5, cast=float)
+    ACTIVITY_BUFFER_SIZE: int = config("ACTIVITY_BUFFER_SIZE", default=10000, cast=int)
+
+    # Soft-deleted user retention
+    USER_RETENTION_DAYS: int = config("USER_RETENTION_DAYS", default=30, cast=int)
+    USER_RETENTION_BATCH_SIZE: int = config("USER_RETENTION_BATCH_SIZE", default=500, cast=int)
+    USER_RETENTION_BATCH_PAUSE: float = config(
+        "USER_RETENTION_BATCH_PAUSE", default=0.5, cast=float
+    )
+
+    # Response compression
+    COMPRESSION_MINIMUM_SIZE: int = config("COMPRESSION_MINIMUM_SIZE", default=1024, cast=int)
+    COMPRESSION_GZIP_LEVEL: int = config("COMPRESSION_GZIP_LEVEL", default=6, cast=int)
+    COMPRESSION_BROTLI_QUALITY: int = config("COMPRESSION_BROTLI_QUALITY", default=4, cast=int)
+    COMPRESSION_THREADPOOL_MIN_SIZE: int = config(
+        "COMPRESSION_THREADPOOL_MIN_SIZE", default=64 * 1024, cast=int
+    )
+
+    # Server-Timing instrumentation: the header is only sent to requests
+    # with a valid ADMIN_TOKEN; SERVER_TIMING_SAMPLE_RATE is the fraction of
+    # requests whose timings are logged when SERVER_TIMING_LOG is on
+    SERVER_TIMING_ENABLED: bool = config("SERVER_TIMING_ENABLED", default=False, cast=bool)
+    SERVER_TIMING_SAMPLE_RATE: float = config("SERVER_TIMING_SAMPLE_RATE", default=0.0, cast=float)
+    SERVER_TIMING_LOG: bool = config("SERVER_TIMING_LOG", default=False, cast=bool)
+
+    # Prometheus metrics (set PROMETHEUS_MULTIPROC_DIR when running several
+    # workers), scraped with METRICS_TOKEN as a bearer token. Left off
+    # unless both are set.
+    METRICS_ENABLED: bool = config("METRICS_ENABLED", default=False, cast=bool)
+    METRICS_TOKEN: str = config("METRICS_TOKEN", default="")
+    METRICS_SAMPLE_INTERVAL: float = config("METRICS_SAMPLE_INTERVAL", default=15, cast=float)
+
+    # Event loop watchdog: heartbeat interval and the stall length (seconds)
+    # after which the loop thread's stack is captured
+    LOOP_WATCHDOG_ENABLED: bool = config("LOOP_WATCHDOG_ENABLED", default=True, cast=bool)
+    LOOP_WATCHDOG_INTERVAL: float = config("LOOP_WATCHDOG_INTERVAL", default=0.1, cast=float)
+    LOOP_WATCHDOG_THRESHOLD: float = config("LOOP_WATCHDOG_THRESHOLD", default=0.1, cast=float)
+
+    # Admin diagnostics, guarded by the X-Admin-Token header. Leave the token
+    # empty to disable them entirely.
+    ADMIN_TOKEN: str = config("ADMIN_TOKEN", default="")
+    PROFILER_ENABLED: bool = config("PROFILER_ENABLED", default=False, cast=bool)
+    PROFILER_INTERVAL: float = config("PROFILER_INTERVAL", default=0.005, cast=float)
+    PROFILER_MAX_PROFILES: int = config("PROFILER_MAX_PROFILES", default=20, cast=int)
+    # Directory shared by the workers for profiles and armed triggers; in
+    # each worker's memory when empty
+    PROFILER_DIR: str = config("PROFILER_DIR", default="")
+    MEMORY_DIAGNOSTICS_ENABLED: bool = config("MEMORY_DIAGNOSTICS_ENABLED", default=False, cast=bool)
+    MEMORY_TRACE_FRAMES: int = config("MEMORY_TRACE_FRAMES", default=10, cast=int)
+
 
 settings = Settings()
\ No newline at end of file
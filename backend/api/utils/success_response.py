@@ -1,6 +1,5 @@
 from typing import Optional, Dict, Any
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
+from api.utils.json_response import FastJSONResponse
 
 
 def success_response(status_code: int, message: str, data: Optional[dict] = None):
@@ -15,7 +14,7 @@ def success_response(status_code: int, message: str, data: Optional[dict] = None
     if data is not None:
         response_data["data"] = data
 
-    return JSONResponse(status_code=status_code, content=jsonable_encoder(response_data))
+    return FastJSONResponse(status_code=status_code, content=response_data)
 
 
 def auth_response(status_code: int, message: str, access_token: str, data: Optional[dict] = None):
@@ -30,7 +29,7 @@ def auth_response(status_code: int, message: str, access_token: str, data: Optio
     if data is not None:
         response_data["data"] = data
 
-    return JSONResponse(status_code=status_code, content=jsonable_encoder(response_data))
+    return FastJSONResponse(status_code=status_code, content=response_data)
 
 
 def fail_response(status_code: int, message: str, data: Optional[dict] = None):
@@ -45,4 +44,4 @@ def fail_response(status_code: int, message: str, data: Optional[dict] = None):
     if data is not None:
         response_data["data"] = data
 
-    return JSONResponse(status_code=status_code, content=jsonable_encoder(response_data))
\ No newline at end of file
+    return FastJSONResponse(status_code=status_code, content=response_data)
\ No newline at end of file
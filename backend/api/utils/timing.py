@@ -0,0 +1,124 @@
+""" Lightweight per-request timing spans
+
+`ServerTimingMiddleware` starts a `RequestTimings` for sampled requests and
+stores it in a context variable; code on the request path wraps interesting
+work in `span("name")` (or decorates it with `@timed("name")`) and the
+elapsed time is added to that request's totals. Context variables follow
+the request into threadpool workers, so sync dependencies and endpoints are
+covered too.
+
+When a request is not sampled the context variable is unset and a span
+costs one context variable lookup.
+
+usage:
+
+    with span("bcrypt"):
+        pwd_context.verify(...)
+
+    @timed("service")
+    def authenticate_user(...):
+        ...
+"""
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestTimings:
+    """Accumulated span durations of one request"""
+
+    __slots__ = ("started", "spans")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # name -> [total seconds, count]
+        self.spans: Dict[str, List[float]] = {}
+
+    def add(self, name: str, seconds: float):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header_value(self, total: Optional[float] = None) -> str:
+        """Render as a `Server-Timing` header value (durations in ms)"""
+
+        metrics = [
+            f"{name};dur={seconds * 1000:.2f}"
+            for name, (seconds, _count) in self.spans.items()
+        ]
+        metrics.append(f"total;dur={(self.elapsed if total is None else total) * 1000:.2f}")
+        return ", ".join(metrics)
+
+    def as_dict(self) -> Dict[str, dict]:
+        return {
+            name: {"ms": round(seconds * 1000, 3), "count": int(count)}
+            for name, (seconds, count) in self.spans.items()
+        }
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block as `name` on the current request, if sampled"""
+
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def timed(name: str):
+    """Decorator timing every call of a function (sync or async) as `name`"""
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def instrument_engine(engine: Engine):
+    """Record time spent executing SQL as the `db` span"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if current_timings.get() is not None:
+            conn.info.setdefault("_timing_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        timings = current_timings.get()
+        stack = conn.info.get("_timing_started")
+        if timings is not None and stack:
+            timings.add("db", time.perf_counter() - stack.pop())
@@ -2,4 +2,9 @@ from api.v1.models.user import User
 from api.v1.models.token_login import TokenLogin
 from api.v1.models.billing_plan import BillingPlan
 from api.v1.models.contact_us import ContactUs
-from api.v1.models.user_subscription import UserSubscription
\ No newline at end of file
+from api.v1.models.user_subscription import UserSubscription
+from api.v1.models.usage_counter import UsageCounter
+from api.v1.models.tool_activity import ToolActivityEvent, UserToolUsage, UserActivitySummary
+from api.v1.models.archived_user import ArchivedUser
+from api.v1.models.email_outbox import EmailOutbox
+from api.v1.models.email_campaign import EmailCampaign
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, DateTime, JSON, func
+from api.db.database import Base
+
+
+class ArchivedUser(Base):
+    """Users moved out of the `users` table by the retention job after
+    being soft deleted for longer than the retention period"""
+    __tablename__ = "archived_users"
+
+    id = Column(String, primary_key=True)
+    email = Column(String, nullable=False, index=True)
+    first_name = Column(String, nullable=True)
+    last_name = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    subscriptions = Column(JSON, nullable=True)
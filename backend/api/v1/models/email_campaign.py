@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey
+from api.v1.models.base_model import BaseTableModel
+
+
+class EmailCampaign(BaseTableModel):
+    """A bulk email sent to a segment of users, with the progress needed
+    to resume it after a crash"""
+    __tablename__ = "email_campaigns"
+
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+    name = Column(String, nullable=False)
+    template_name = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    context = Column(JSON, nullable=True)
+    # Segment: every active user, or only those currently on this plan
+    billing_plan_id = Column(
+        String, ForeignKey("billing_plans.id", ondelete="SET NULL"), nullable=True
+    )
+    status = Column(String, nullable=False, default=RUNNING, server_default=RUNNING)
+    # Checkpoint: recipients are sent in user id order, every user up to
+    # and including this id has been handled
+    last_user_id = Column(String, nullable=True)
+    sent_count = Column(Integer, nullable=False, default=0, server_default="0")
+    failed_count = Column(Integer, nullable=False, default=0, server_default="0")
+    completed_at = Column(DateTime(timezone=True), nullable=True)
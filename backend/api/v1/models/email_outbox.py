@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Index, func
+from api.v1.models.base_model import BaseTableModel
+
+
+class EmailOutbox(BaseTableModel):
+    """Outgoing email, written in the same transaction as the change that
+    triggers it and delivered later by the email outbox workers"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # Drives batch claiming: due messages in the order they fall due
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+        # Finds a recent copy of the same email when deduplicating
+        Index("ix_email_outbox_recipient_template", "recipient", "template_name", "created_at"),
+    )
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+
+    recipient = Column(String, nullable=False)
+    template_name = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    context = Column(JSON, nullable=True)
+    status = Column(String, nullable=False, default=PENDING, server_default=PENDING)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # When a pending message is next due, or when a claimed message's
+    # lease runs out and it may be claimed again
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(String, nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,121 @@
+""" Lightweight read models
+
+Immutable, slotted snapshots of `User`, `BillingPlan` and `UserSubscription`
+rows. They are built straight from column tuples, carry no SQLAlchemy
+instance state and are not bound to a session, so they are safe to cache
+and share across threads and requests.
+
+usage:
+
+    plan = BillingPlanRecord.fetch(db, "free")
+    plans = BillingPlanRecord.fetch_all(db)
+"""
+from dataclasses import dataclass, fields
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from api.v1.models.billing_plan import BillingPlan
+from api.v1.models.user import User
+from api.v1.models.user_subscription import UserSubscription, utcnow
+
+
+class _ReadModel:
+    """Helpers shared by all read models. Subclasses set `__model__` to the
+    ORM class they mirror; field names must match its column names."""
+
+    __slots__ = ()
+    __model__: Any = None
+
+    @classmethod
+    def columns(cls) -> Tuple:
+        return tuple(getattr(cls.__model__, f.name) for f in fields(cls))
+
+    @classmethod
+    def from_row(cls, row) -> "_ReadModel":
+        """Build a record from a row selected with `columns()`"""
+        return cls(*row)
+
+    @classmethod
+    def from_orm(cls, obj) -> "_ReadModel":
+        """Snapshot an already loaded ORM instance"""
+        return cls(*(getattr(obj, f.name) for f in fields(cls)))
+
+    @classmethod
+    def select(cls):
+        return select(*cls.columns())
+
+    @classmethod
+    def fetch(cls, db: Session, id: str) -> Optional["_ReadModel"]:
+        """Fetch a single record by id, without building an ORM instance"""
+        row = db.execute(cls.select().where(cls.__model__.id == id)).first()
+        return cls.from_row(row) if row else None
+
+    @classmethod
+    def fetch_all(cls, db: Session, *criteria) -> List["_ReadModel"]:
+        rows = db.execute(cls.select().where(*criteria)).all()
+        return [cls.from_row(row) for row in rows]
+
+    def to_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+@dataclass(frozen=True, slots=True)
+class UserRecord(_ReadModel):
+    __model__ = User
+
+    id: str
+    email: str
+    first_name: Optional[str]
+    last_name: Optional[str]
+    avatar_url: Optional[str]
+    is_active: Optional[bool]
+    is_deleted: Optional[bool]
+    is_verified: Optional[bool]
+    is_superadmin: Optional[bool]
+    current_subscription_id: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+
+@dataclass(frozen=True, slots=True)
+class BillingPlanRecord(_ReadModel):
+    __model__ = BillingPlan
+
+    id: str
+    plan_name: str
+    price: Decimal
+    plan_interval: str
+    currency: str
+    features: Tuple[str, ...]
+    access_limit: Optional[int]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    def __post_init__(self):
+        # Keep the record hashable and immutable all the way down
+        if not isinstance(self.features, tuple):
+            object.__setattr__(self, "features", tuple(self.features or ()))
+
+
+@dataclass(frozen=True, slots=True)
+class UserSubscriptionRecord(_ReadModel):
+    __model__ = UserSubscription
+
+    id: str
+    user_id: str
+    billing_plan_id: str
+    start_date: datetime
+    end_date: Optional[datetime]
+    is_expired: bool
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    def is_active(self, now: Optional[datetime] = None) -> bool:
+        if self.is_expired:
+            return False
+        now = now or utcnow()
+        return self.start_date <= now and (self.end_date is None or self.end_date > now)
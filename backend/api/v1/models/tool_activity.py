@@ -0,0 +1,63 @@
+from uuid_extensions import uuid7
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    DateTime,
+    ForeignKey,
+    Index,
+    UniqueConstraint,
+    func,
+)
+from api.db.database import Base
+from api.v1.models.base_model import BaseTableModel
+
+
+class ToolActivityEvent(Base):
+    """Append-only log of tool job status changes.
+
+    On PostgreSQL the table is range partitioned by month on `created_at`
+    (see `ToolActivityService.ensure_partitions`), so the partition key is
+    part of the primary key. Rows are never updated.
+    """
+    __tablename__ = "tool_activity_events"
+    __table_args__ = (
+        Index("ix_tool_activity_events_user_id_created_at", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid7()))
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    user_id = Column(String, nullable=False)
+    job_id = Column(String, nullable=False)
+    tool = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    previous_status = Column(String, nullable=True)
+
+
+class UserToolUsage(BaseTableModel):
+    """Number of jobs a user has created with each tool"""
+    __tablename__ = "user_tool_usage"
+    __table_args__ = (
+        UniqueConstraint("user_id", "tool", name="uq_user_tool_usage_user_tool"),
+    )
+
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    tool = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class UserActivitySummary(BaseTableModel):
+    """Per-user rollup of tool jobs by status, plus the most used tool"""
+    __tablename__ = "user_activity_summaries"
+
+    user_id = Column(
+        String, ForeignKey("users.id", ondelete="CASCADE"), unique=True, nullable=False
+    )
+    jobs_created = Column(Integer, nullable=False, default=0)
+    jobs_pending = Column(Integer, nullable=False, default=0)
+    jobs_in_progress = Column(Integer, nullable=False, default=0)
+    jobs_completed = Column(Integer, nullable=False, default=0)
+    jobs_failed = Column(Integer, nullable=False, default=0)
+    most_used_tool = Column(String, nullable=True)
+    most_used_tool_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, UniqueConstraint
+from api.v1.models.base_model import BaseTableModel
+
+
+class UsageCounter(BaseTableModel):
+    """Tool usage per user and billing period.
+
+    Workers reserve quota on limited plans by incrementing `count` with a
+    conditional upsert, and periodically add their deltas to it in a batch,
+    net of the quota they reserved but did not use.
+    """
+    __tablename__ = "usage_counters"
+    __table_args__ = (
+        UniqueConstraint("user_id", "period", name="uq_usage_counters_user_period"),
+    )
+
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    period = Column(String(7), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
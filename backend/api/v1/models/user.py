@@ -1,13 +1,24 @@
 """ User data model
 """
 
-from sqlalchemy import Column, String, text, Boolean
+from sqlalchemy import Column, String, text, Boolean, ForeignKey, Index, DateTime
 from sqlalchemy.orm import relationship
 from api.v1.models.base_model import BaseTableModel
 
 
 class User(BaseTableModel):
     __tablename__ = "users"
+    __table_args__ = (
+        # Used by the user stats reconciliation to find last-hour changes
+        Index("ix_users_created_at", "created_at"),
+        Index("ix_users_updated_at", "updated_at"),
+        # Used by the retention job to find users due for purging
+        Index(
+            "ix_users_deleted_at",
+            "deleted_at",
+            postgresql_where=text("is_deleted"),
+        ),
+    )
 
     email = Column(String, unique=True, nullable=False)
     password = Column(String, nullable=True)
@@ -17,6 +28,34 @@ class User(BaseTableModel):
     is_active = Column(Boolean, server_default=text("true"))
     is_deleted = Column(Boolean, server_default=text("false"))
     is_verified = Column(Boolean, server_default=text("false"))
+    is_superadmin = Column(Boolean, server_default=text("false"))
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Denormalized pointer to the subscription currently in force, kept in
+    # step by `UserSubscriptionService` when a subscription is created (it
+    # supersedes the current one) and by the expiry sweeper, so entitlement
+    # checks never scan subscription history. Existing users are pointed at
+    # their subscription by `scripts/backfill_current_subscriptions.py`.
+    current_subscription_id = Column(
+        String,
+        ForeignKey(
+            "user_subscriptions.id",
+            ondelete="SET NULL",
+            use_alter=True,
+            name="fk_users_current_subscription_id",
+        ),
+        nullable=True,
+        index=True,
+    )
 
     token_login = relationship("TokenLogin", back_populates="user")
-    subscription = relationship("UserSubscription", back_populates="user")
\ No newline at end of file
+    subscription = relationship(
+        "UserSubscription",
+        back_populates="user",
+        foreign_keys="UserSubscription.user_id",
+    )
+    current_subscription = relationship(
+        "UserSubscription",
+        foreign_keys=[current_subscription_id],
+        post_update=True,
+    )
\ No newline at end of file
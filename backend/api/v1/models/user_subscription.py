@@ -1,19 +1,33 @@
-from datetime import datetime
-from sqlalchemy import Column, String, ForeignKey, DateTime
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, ForeignKey, DateTime, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from api.v1.models.base_model import BaseTableModel
 
+
+def utcnow() -> datetime:
+    """Current UTC wall time, the way `start_date` and `end_date` are stored"""
+    return datetime.now(tz=timezone.utc).replace(tzinfo=None)
+
+
 class UserSubscription(BaseTableModel):
     __tablename__ = 'user_subscriptions'
+    __table_args__ = (
+        # Drives the expiry sweeper: only live rows are ever scanned
+        Index('ix_user_subscriptions_is_expired_end_date', 'is_expired', 'end_date'),
+    )
 
     billing_plan_id = Column(String, ForeignKey('billing_plans.id', ondelete='CASCADE'), nullable=False)
-    user_id = Column(String, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    user_id = Column(String, ForeignKey('users.id', ondelete="CASCADE"), nullable=False, index=True)
     start_date = Column(DateTime, nullable=False)
     end_date = Column(DateTime, nullable=True)
+    is_expired = Column(Boolean, nullable=False, default=False, server_default=text("false"))
 
     billing_plan = relationship('BillingPlan', back_populates='subscriptions')
-    user = relationship('User', back_populates='subscription')
+    user = relationship('User', back_populates='subscription', foreign_keys=[user_id])
 
-    def is_active(self):
-        return self.start_date <= datetime.now() and (self.end_date is None or self.end_date > datetime.now())
-    
\ No newline at end of file
+    def is_active(self, now: datetime = None):
+        if self.is_expired:
+            return False
+        now = now or utcnow()
+        return self.start_date <= now and (self.end_date is None or self.end_date > now)
+    
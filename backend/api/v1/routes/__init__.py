@@ -1,8 +1,14 @@
 from fastapi import APIRouter
 from api.v1.routes.user import user_router
 from api.v1.routes.auth import auth
+from api.v1.routes.billing_plan import billing_plan_router
+from api.v1.routes.tool import tool_router
+from api.v1.routes.admin import admin_router
 
 api_version_one = APIRouter(prefix="/api/v1")
 
 api_version_one.include_router(user_router)
-api_version_one.include_router(auth)
\ No newline at end of file
+api_version_one.include_router(auth)
+api_version_one.include_router(billing_plan_router)
+api_version_one.include_router(tool_router)
+api_version_one.include_router(admin_router)
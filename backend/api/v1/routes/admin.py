@@ -0,0 +1,337 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from api.core.dependencies.admin import require_admin_token
+from api.utils.loop_watchdog import loop_watchdog
+from api.utils.memory import live_objects, memory_tracer
+from api.utils.profiler import profile_store
+from api.utils.settings import settings
+from api.utils.success_response import success_response
+from api.v1.schemas.admin import (
+    ArmRouteRequest,
+    SnapshotKeyType,
+    SnapshotRequest,
+    StartTracingRequest,
+)
+
+
+admin_router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin_token)],
+    include_in_schema=False,
+)
+
+
+def _require_profiler():
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+
+
+def _require_loop_watchdog():
+    if not settings.LOOP_WATCHDOG_ENABLED:
+        raise HTTPException(status_code=404, detail="Loop watchdog is disabled")
+
+
+def _require_memory_diagnostics():
+    if not settings.MEMORY_DIAGNOSTICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Memory diagnostics are disabled")
+
+
+def _require_tracing():
+    if not memory_tracer.tracing:
+        raise HTTPException(status_code=409, detail="Memory tracing is not running")
+
+
+def _ensure_route(request: Request, method: str, path: str):
+    if not any(
+        getattr(route, "path", None) == path and method in getattr(route, "methods", ())
+        for route in request.app.router.routes
+    ):
+        raise HTTPException(status_code=404, detail="Route not found")
+
+
+def _get_snapshot(name: str):
+    snapshot = memory_tracer.get_snapshot(name)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return snapshot
+
+
+def _get_profile(profile_id: str):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@admin_router.post(
+    "/profiling/arm",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_profiler)],
+)
+def arm_profiler(request: Request, schema: ArmRouteRequest):
+    """Profile the next N requests to a route"""
+
+    method = schema.method.upper()
+    _ensure_route(request, method, schema.path)
+
+    profile_store.arm(method, schema.path, schema.count)
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Profiler armed",
+        data={"method": method, "path": schema.path, "count": schema.count},
+    )
+
+
+@admin_router.get(
+    "/profiling/profiles",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_profiler)],
+)
+def list_profiles():
+    """List recent request profiles"""
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Profiles retrieved successfully",
+        data={
+            "profiles": [profile.summary() for profile in profile_store.list()],
+            "armed": [
+                {"method": method, "path": path, "remaining": remaining}
+                for (method, path), remaining in profile_store.armed.items()
+            ],
+        },
+    )
+
+
+@admin_router.get(
+    "/profiling/profiles/{profile_id}",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_profiler)],
+)
+def get_profile(profile_id: str):
+    """A profile's summary and hottest functions"""
+
+    profile = _get_profile(profile_id)
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Profile retrieved successfully",
+        data={**profile.summary(), "top_functions": profile.top_functions()},
+    )
+
+
+@admin_router.get(
+    "/profiling/profiles/{profile_id}/flamegraph",
+    dependencies=[Depends(_require_profiler)],
+)
+def get_profile_flamegraph(profile_id: str):
+    """A profile as collapsed stacks (flamegraph.pl / speedscope input)"""
+
+    profile = _get_profile(profile_id)
+
+    return PlainTextResponse(
+        profile.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"'},
+    )
+
+
+@admin_router.get(
+    "/memory",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_memory_diagnostics)],
+)
+def memory_status():
+    """RSS, traced heap size and kept snapshots"""
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Memory status retrieved successfully",
+        data=memory_tracer.status(),
+    )
+
+
+@admin_router.post(
+    "/memory/tracing/start",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_memory_diagnostics)],
+)
+def start_tracing(schema: StartTracingRequest):
+    """Start (or restart) tracemalloc"""
+
+    memory_tracer.start(schema.frames or settings.MEMORY_TRACE_FRAMES)
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Memory tracing started",
+        data=memory_tracer.status(),
+    )
+
+
+@admin_router.post(
+    "/memory/tracing/stop",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_memory_diagnostics)],
+)
+def stop_tracing():
+    """Stop tracemalloc and drop its snapshots"""
+
+    memory_tracer.stop()
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Memory tracing stopped",
+        data=memory_tracer.status(),
+    )
+
+
+@admin_router.post(
+    "/memory/snapshots",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(_require_memory_diagnostics), Depends(_require_tracing)],
+)
+def take_snapshot(schema: SnapshotRequest, limit: int = 25):
+    """Take a named snapshot and return its top allocation sites"""
+
+    snapshot = memory_tracer.take_snapshot(schema.name)
+
+    return success_response(
+        status_code=status.HTTP_201_CREATED,
+        message="Snapshot taken",
+        data={"name": schema.name, "top": memory_tracer.top(snapshot, limit=limit)},
+    )
+
+
+@admin_router.get(
+    "/memory/snapshots/{name}",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_memory_diagnostics), Depends(_require_tracing)],
+)
+def get_snapshot(name: str, key_type: SnapshotKeyType = "lineno", limit: int = 25):
+    """Top allocation sites of a kept snapshot"""
+
+    snapshot = _get_snapshot(name)
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Snapshot retrieved successfully",
+        data={"name": name, "top": memory_tracer.top(snapshot, key_type, limit)},
+    )
+
+
+@admin_router.get(
+    "/memory/diff",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_memory_diagnostics), Depends(_require_tracing)],
+)
+def diff_snapshots(
+    old: str,
+    new: Optional[str] = None,
+    key_type: SnapshotKeyType = "lineno",
+    limit: int = 25,
+):
+    """Allocation sites by growth between two snapshots (`new` defaults to now)"""
+
+    old_snapshot = _get_snapshot(old)
+    new_snapshot = _get_snapshot(new) if new else memory_tracer.take_snapshot()
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Snapshot diff retrieved successfully",
+        data={
+            "old": old,
+            "new": new,
+            "sites": memory_tracer.diff(old_snapshot, new_snapshot, key_type, limit),
+        },
+    )
+
+
+@admin_router.post(
+    "/memory/arm",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_memory_diagnostics), Depends(_require_tracing)],
+)
+def arm_memory_snapshots(request: Request, schema: ArmRouteRequest):
+    """Snapshot around the next N requests to a route"""
+
+    method = schema.method.upper()
+    _ensure_route(request, method, schema.path)
+
+    memory_tracer.arm(method, schema.path, schema.count)
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Memory snapshots armed",
+        data={"method": method, "path": schema.path, "count": schema.count},
+    )
+
+
+@admin_router.get(
+    "/memory/routes",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_memory_diagnostics)],
+)
+def memory_by_route():
+    """Traced memory left behind per route since tracing started"""
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Route allocations retrieved successfully",
+        data={
+            "routes": memory_tracer.route_report(),
+            "armed": [
+                {"method": method, "path": path, "remaining": remaining}
+                for (method, path), remaining in memory_tracer.armed.items()
+            ],
+        },
+    )
+
+
+@admin_router.get(
+    "/memory/objects",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_memory_diagnostics)],
+)
+def memory_objects(limit: int = 25):
+    """Live ORM instances by model and live sessions"""
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Live objects retrieved successfully",
+        data=live_objects(limit),
+    )
+
+
+@admin_router.get(
+    "/loop/blocking",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_loop_watchdog)],
+)
+async def loop_blocking(limit: int = 50):
+    """Event loop stalls aggregated by call site"""
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Loop blocking report retrieved successfully",
+        data=loop_watchdog.report(limit),
+    )
+
+
+@admin_router.delete(
+    "/loop/blocking",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(_require_loop_watchdog)],
+)
+async def reset_loop_blocking():
+    """Clear the loop blocking report"""
+
+    loop_watchdog.reset()
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Loop blocking report cleared",
+    )
@@ -1,6 +1,5 @@
 from datetime import timedelta
 from fastapi import (
-    BackgroundTasks,
     Depends,
     status,
     APIRouter,
@@ -8,22 +7,28 @@ from fastapi import (
     Request,
     Query,
 )
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from api.utils.json_response import FastJSONResponse
+from api.utils.serializers import serialize_response
 from api.utils.success_response import success_response
 from api.v1.models import User
 from api.v1.schemas.user import (
     LoginRequest,
     UserCreate,
     RegisterUserResponse,
+    LoginResponse,
+    register_user_response_adapter,
+    login_response_adapter,
     RefreshAccessTokenResponse,
     LogoutResponse,
     MagicLinkResponse
 )
 from api.db.database import get_db
+from api.core.dependencies.email.deliverability import deliverability_checker
 from api.v1.services.user import user_service
+from api.v1.services.user_stats import user_stats_service
 from api.v1.schemas.request_password_reset import RequestEmail
 from api.v1.services.request_pwd import reset_service as magic_link_service
 from api.v1.services.billing_plan import billing_plan_service
@@ -32,13 +37,24 @@ from api.v1.services.email_sending import email_sending_service
 
 auth = APIRouter(prefix="/auth", tags=["Authentication"])
 
+
+async def check_register_email(user_schema: UserCreate):
+    """Reject registrations with an email domain that cannot receive mail"""
+    await deliverability_checker.ensure_deliverable(user_schema.email)
+
+
+async def check_magic_link_email(magic_link_request_schema: RequestEmail):
+    """Reject magic link requests for an email domain that cannot receive mail"""
+    await deliverability_checker.ensure_deliverable(magic_link_request_schema.user_email)
+
+
 @auth.post(
     "/register",
     status_code=status.HTTP_201_CREATED,
     response_model=RegisterUserResponse,
+    dependencies=[Depends(check_register_email)],
 )
 def register(
-    background_tasks: BackgroundTasks,
     request: Request,
     response: Response,
     user_schema: UserCreate,
@@ -46,36 +62,32 @@ def register(
 ):
     """Endpoint for a user to register their account"""
 
-    # Create user account
-    user = user_service.create(db=db, schema=user_schema)
+    # The user, their welcome email and free plan subscription are
+    # committed together, or not at all
+    user = user_service.create(db=db, schema=user_schema, commit=False)
+    email_sending_service.send_welcome_email(db, user, commit=False)
+    user_subscription = billing_plan_service.subscribe_user_to_free_plan(db=db, user=user, commit=False)
+    db.commit()
 
-    user_subscription = billing_plan_service.subscribe_user_to_free_plan(db=db, user=user)
+    user_stats_service.on_created(user)
 
     # Create access and refresh tokens
     access_token = user_service.create_access_token(user_id=user.id)
     refresh_token = user_service.create_refresh_token(user_id=user.id)
 
-    # Send email in the background
-    email_sending_service.send_welcome_email(request, background_tasks, user)
-
-    response = JSONResponse(
-        status_code=201,
-        content={
+    response = serialize_response(
+        register_user_response_adapter,
+        {
             "status_code": 201,
             "message": "User created successfully",
             "access_token": access_token,
             "refresh_token": refresh_token,
             "data": {
-                "user": jsonable_encoder(
-                    user, 
-                    exclude=["password", "is_deleted", "updated_at"]
-                ),
-                "user_subscription" : jsonable_encoder(
-                    user_subscription , 
-                    exclude=["user_id"]
-                )
+                "user": user,
+                "user_subscription": user_subscription,
             },
         },
+        status_code=201,
     )
 
     # Add refresh token to cookies
@@ -92,7 +104,7 @@ def register(
 
 
 @auth.post(
-    "/login", status_code=status.HTTP_200_OK, response_model=RegisterUserResponse
+    "/login", status_code=status.HTTP_200_OK, response_model=LoginResponse
 )
 def login(login_request: LoginRequest, request: Request, db: Session = Depends(get_db)):
     """Endpoint to log in a user"""
@@ -106,19 +118,14 @@ def login(login_request: LoginRequest, request: Request, db: Session = Depends(g
     access_token = user_service.create_access_token(user_id=user.id)
     refresh_token = user_service.create_refresh_token(user_id=user.id)
 
-    response = JSONResponse(
-        status_code=200,
-        content={
+    response = serialize_response(
+        login_response_adapter,
+        {
             "status_code": 200,
             "message": "Login successful",
             "access_token": access_token,
             "refresh_token": refresh_token,
-            "data": {
-                "user": jsonable_encoder(
-                    user, 
-                    exclude=["password", "is_deleted", "updated_at"]
-                )
-            },
+            "data": {"user": user},
         },
     )
 
@@ -172,7 +179,7 @@ def refresh_access_token(
         current_refresh_token=current_refresh_token
     )
 
-    response = response = JSONResponse(
+    response = response = FastJSONResponse(
         status_code=200,
         content={
             "status_code": 200,
@@ -195,24 +202,29 @@ def refresh_access_token(
     return response
 
 
-@auth.post("/magic-link", status_code=status.HTTP_200_OK, response_model=MagicLinkResponse)
+@auth.post(
+    "/magic-link",
+    status_code=status.HTTP_200_OK,
+    response_model=MagicLinkResponse,
+    dependencies=[Depends(check_magic_link_email)],
+)
 async def request_magic_link(
     magic_link_request_schema: RequestEmail,
     request: Request,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
-    
+
     user, link = await magic_link_service.create(
         magic_link_request_schema,
         db,
         url='/magic-link/verify',
     )
 
-    # Send email
-    email_sending_service.send_magic_link_email(
-        request=request,
-        background_tasks=background_tasks,
+    # Queue the email off the event loop: the dedupe lookup, insert and
+    # commit are blocking database calls
+    await run_in_threadpool(
+        email_sending_service.send_magic_link_email,
+        db=db,
         user=user,
         magic_link_url=link
     )
@@ -227,7 +239,7 @@ async def request_magic_link(
 @auth.get(
     "/magic-link/verify",
     status_code=status.HTTP_200_OK,
-    response_model=RegisterUserResponse,
+    response_model=LoginResponse,
 )
 def verify_magic_link(token: str = Query(...), db: Session = Depends(get_db)):
     """Endpoint to verify a magic link"""
@@ -239,19 +251,14 @@ def verify_magic_link(token: str = Query(...), db: Session = Depends(get_db)):
     access_token = user_service.create_access_token(user_id=user.id)
     refresh_token = user_service.create_refresh_token(user_id=user.id)
 
-    response = JSONResponse(
-        status_code=200,
-        content={
+    response = serialize_response(
+        login_response_adapter,
+        {
             "status_code": 200,
             "message": "Login successful",
             "access_token": access_token,
             "refresh_token": refresh_token,
-            "data": {
-                "user": jsonable_encoder(
-                    user, 
-                    exclude=["password", "is_deleted", "updated_at"]
-                )
-            },
+            "data": {"user": user},
         },
     )
 
@@ -0,0 +1,54 @@
+from typing import Optional
+
+from fastapi import Depends, APIRouter, Request, status
+from sqlalchemy.orm import Session
+
+from api.db.database import get_db
+from api.utils.etag import etag_matches, not_modified, set_cache_headers
+from api.utils.json_response import PreSerializedJSONResponse
+from api.utils.success_response import success_response
+from api.v1.models.user import User
+from api.v1.services.billing_plan import billing_plan_service
+from api.v1.services.user import user_service
+from api.v1.services.user_subscription import user_subscription_service
+
+
+billing_plan_router = APIRouter(prefix="/billing-plans", tags=["Billing Plans"])
+
+CATALOG_CACHE_CONTROL = "public, max-age=300, must-revalidate"
+
+
+@billing_plan_router.get("", status_code=status.HTTP_200_OK)
+def get_billing_plans(request: Request, db: Session = Depends(get_db)):
+    '''Endpoint to list all billing plans'''
+
+    etag = billing_plan_service.get_catalog_etag(db)
+    if etag_matches(request, etag):
+        return not_modified(etag, CATALOG_CACHE_CONTROL)
+
+    response = PreSerializedJSONResponse(
+        content=billing_plan_service.get_catalog_body(db, etag)
+    )
+
+    return set_cache_headers(response, etag, CATALOG_CACHE_CONTROL)
+
+
+@billing_plan_router.get("/active-subscribers", status_code=status.HTTP_200_OK)
+def count_active_subscribers(
+    billing_plan_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_super_admin),
+):
+    '''Endpoint for a super admin to count users with a live subscription,
+    optionally on a single plan'''
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message="Active subscribers counted successfully",
+        data={
+            "billing_plan_id": billing_plan_id,
+            "active_subscribers": user_subscription_service.count_active_subscribers(
+                db, billing_plan_id=billing_plan_id
+            ),
+        },
+    )
@@ -0,0 +1,41 @@
+from fastapi import Depends, APIRouter, status
+from sqlalchemy.orm import Session
+from uuid_extensions import uuid7
+
+from api.db.database import get_db
+from api.utils.success_response import success_response
+from api.v1.models.user import User
+from api.v1.schemas.tool import CreateToolJobSchema
+from api.v1.services.tool_activity import JOB_PENDING, tool_activity_service
+from api.v1.services.usage_metering import usage_metering_service
+from api.v1.services.user import user_service
+
+
+tool_router = APIRouter(prefix="/tools", tags=["Tools"])
+
+
+@tool_router.post("/jobs", status_code=status.HTTP_201_CREATED)
+def create_tool_job(
+    schema: CreateToolJobSchema,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user),
+):
+    '''Endpoint to start a tool job, charged against the current plan's access limit'''
+
+    remaining = usage_metering_service.consume(db, current_user)
+
+    job_id = str(uuid7())
+    tool_activity_service.record_event(
+        user_id=current_user.id, job_id=job_id, tool=schema.tool, status=JOB_PENDING
+    )
+
+    return success_response(
+        status_code=status.HTTP_201_CREATED,
+        message='Tool job created successfully',
+        data={
+            "job_id": job_id,
+            "tool": schema.tool,
+            "status": JOB_PENDING,
+            "remaining": remaining,
+        }
+    )
@@ -1,15 +1,30 @@
 from typing import Annotated, Optional, Literal
 from fastapi import Depends, APIRouter, Request, status, Query, HTTPException
-from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
+from api.utils.etag import etag_matches, make_etag, not_modified, set_cache_headers
+from api.utils.serializers import serialize_response
 from api.utils.success_response import success_response
 from api.v1.models.user import User
 from api.v1.schemas.user import (
-    AllUsersResponse, UserUpdate
+    AllUsersResponse,
+    UserUpdate,
+    UserStatResponse,
+    UserActivityStatisticsResponse,
+    UserData,
+    UserDetailData,
+    UserDetailResponse,
+    UserProfileResponse,
+    user_profile_response_adapter,
 )
 from api.db.database import get_db
 from api.v1.services.user import user_service
+from api.v1.services.usage_metering import usage_metering_service
+from api.v1.services.user_stats import user_stats_service
+from api.v1.services.tool_activity import tool_activity_service
+
+
+USER_PROFILE_CACHE_CONTROL = "private, no-cache"
 
 
 user_router = APIRouter(prefix="/users", tags=["Users"])
@@ -27,7 +42,7 @@ async def delete_account(request: Request, db: Session = Depends(get_db), curren
         message='User deleted successfully',
     )
 
-@user_router.patch("",status_code=status.HTTP_200_OK)
+@user_router.patch("",status_code=status.HTTP_200_OK, response_model=UserProfileResponse)
 def update_current_user(
     current_user : Annotated[User , Depends(user_service.get_current_user)],
     schema : UserUpdate,
@@ -36,30 +51,110 @@ def update_current_user(
 
     user = user_service.update(db=db, schema= schema, current_user=current_user)
 
+    return serialize_response(
+        user_profile_response_adapter,
+        {
+            "status_code": status.HTTP_200_OK,
+            "message": 'User Updated Successfully',
+            "data": user,
+        }
+    )
+
+
+@user_router.get("/stats", status_code=status.HTTP_200_OK, response_model=UserStatResponse)
+def get_user_stats(
+    current_user: User = Depends(user_service.get_current_super_admin)
+):
+    '''Endpoint for a super admin to get user statistics'''
+
+    return user_stats_service.get_stats()
+
+
+@user_router.get("/me/usage", status_code=status.HTTP_200_OK)
+def get_current_user_usage(
+    db : Session = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    '''Endpoint to get the current user's tool usage and remaining quota'''
+
     return success_response(
         status_code=status.HTTP_200_OK,
-        message='User Updated Successfully',
-        data= jsonable_encoder(
-            user,
-            exclude=['password', 'is_deleted', 'is_verified', 'updated_at', 'created_at', 'is_active']
-        )
+        message='Usage retrieved successfully',
+        data={
+            "period": usage_metering_service.current_period(),
+            "used": usage_metering_service.get_usage(db, current_user.id),
+            "limit": usage_metering_service.get_limit(db, current_user),
+            "remaining": usage_metering_service.remaining(db, current_user),
+        }
     )
 
 
-@user_router.get("/{user_id}", status_code=status.HTTP_200_OK)
+@user_router.get(
+    "/me/activity/statistics",
+    status_code=status.HTTP_200_OK,
+    response_model=UserActivityStatisticsResponse,
+)
+def get_current_user_activity_statistics(
+    db : Session = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    '''Endpoint to get the current user's tool job statistics'''
+
+    return UserActivityStatisticsResponse(
+        status="success",
+        message="User activity statistics retrieved successfully",
+        status_code=status.HTTP_200_OK,
+        **tool_activity_service.get_statistics(db, current_user.id),
+    )
+
+
+@user_router.get("/{user_id}/detail", status_code=status.HTTP_200_OK, response_model=UserDetailResponse)
+def get_user_detail(
+    user_id : str,
+    db : Session = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_super_admin)
+):
+    '''Endpoint for a super admin to get a user's details, with their most used tool'''
+
+    user = user_service.get_user_by_id(db=db, id=user_id)
+
+    return UserDetailResponse(
+        status="success",
+        message="User details retrieved successfully",
+        status_code=status.HTTP_200_OK,
+        data=UserDetailData(
+            **UserData.model_validate(user).model_dump(),
+            most_used_tool=tool_activity_service.most_used_tool(db, user.id),
+        ),
+    )
+
+
+@user_router.get("/{user_id}", status_code=status.HTTP_200_OK, response_model=UserProfileResponse)
 def get_user_by_id(
     user_id : str,
+    request: Request,
     db : Session = Depends(get_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
     
+    updated_at = user_service.get_user_updated_at(db=db, id=user_id)
+    etag = make_etag("user", user_id, updated_at)
+
+    if etag_matches(request, etag):
+        return not_modified(etag, USER_PROFILE_CACHE_CONTROL)
+
     user = user_service.get_user_by_id(db=db, id=user_id)
 
-    return success_response(
-        status_code=status.HTTP_200_OK,
-        message='User retrieved successfully',
-        data = jsonable_encoder(
-            user, 
-            exclude=['password', 'is_deleted', 'is_verified', 'updated_at', 'created_at', 'is_active']
-        )
-    )
\ No newline at end of file
+    response = serialize_response(
+        user_profile_response_adapter,
+        {
+            "status_code": status.HTTP_200_OK,
+            "message": 'User retrieved successfully',
+            "data": user,
+        }
+    )
+
+    # Derive the ETag from the row actually rendered, in case it changed
+    etag = make_etag("user", user.id, user.updated_at)
+
+    return set_cache_headers(response, etag, USER_PROFILE_CACHE_CONTROL)
\ No newline at end of file
@@ -0,0 +1,25 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class ArmRouteRequest(BaseModel):
+    """Apply a diagnostic to the next `count` requests to a route"""
+
+    method: str = "GET"
+    # Route path as declared, eg: /api/v1/users/{user_id}
+    path: str
+    count: int = Field(default=1, ge=1, le=100)
+
+
+class StartTracingRequest(BaseModel):
+    """Start tracemalloc, keeping `frames` frames per allocation traceback"""
+
+    frames: Optional[int] = Field(default=None, ge=1, le=100)
+
+
+class SnapshotRequest(BaseModel):
+    name: str = Field(min_length=1, max_length=64)
+
+
+SnapshotKeyType = Literal["lineno", "filename", "traceback"]
@@ -1,23 +1,7 @@
-import dns.resolver
 from typing import Optional, Annotated
 from pydantic import BaseModel, EmailStr, StringConstraints, model_validator
 from email_validator import validate_email, EmailNotValidError
-
-def validate_mx_record(domain: str):
-    """
-    Validate mx records for email
-    """
-    try:
-        # Try to resolve the MX record for the domain
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        print('mx_records: ', mx_records.response)
-        return True if mx_records else False
-    except dns.resolver.NoAnswer:
-        return False
-    except dns.resolver.NXDOMAIN:
-        return False
-    except Exception:
-        return False
+from api.core.dependencies.email.deliverability import deliverability_checker
 
 
 # Pydantic models for request and response
@@ -46,14 +30,20 @@ class TokenRequest(BaseModel):
     @classmethod
     def validate_email(cls, values: dict):
         """
-        Validate email
+        Validate email.
+
+        Only syntax and already known (cached) deliverability are checked
+        here, so validation never waits on DNS. Routes taking an email
+        check domains that have not been seen yet with an async dependency
+        awaiting `deliverability_checker.ensure_deliverable(email)` (see
+        `check_register_email` in `api/v1/routes/auth.py`).
         """
         email = values.get("email")
         try:
-            email = validate_email(email, check_deliverability=True)
+            email = validate_email(email, check_deliverability=False)
             if email.domain.count(".com") > 1:
                 raise EmailNotValidError("Email address contains multiple '.com' endings.")
-            if not validate_mx_record(email.domain):
+            if deliverability_checker.cached(email.domain) is False:
                 raise ValueError('Email is invalid')
         except EmailNotValidError as exc:
             raise ValueError(exc) from exc
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, field_validator
+
+
+TOOLS = (
+    "Text to Video",
+    "Image to Video",
+    "Talking Avatar Generator",
+    "Youtube Summarizer",
+    "Podcast Summarizer",
+)
+
+
+class CreateToolJobSchema(BaseModel):
+    tool: str
+
+    @field_validator("tool")
+    @classmethod
+    def validate_tool(cls, value):
+        if value not in TOOLS:
+            raise ValueError(f"Tool must be one of: {', '.join(TOOLS)}")
+        return value
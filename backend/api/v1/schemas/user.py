@@ -7,8 +7,11 @@ from pydantic import (
     EmailStr,
     ConfigDict,
     StringConstraints,
+    TypeAdapter,
 )
 
+from api.v1.schemas.user_subscription import UserSubscriptionData
+
 
 class UserBase(BaseModel):
     """Base user schema"""
@@ -48,7 +51,7 @@ class UserData(BaseModel):
     """
 
     id: str
-    email: EmailStr
+    email: str
     first_name: Optional[str]
     last_name: Optional[str]
     is_active: bool
@@ -56,13 +59,13 @@ class UserData(BaseModel):
     is_superadmin: bool
     created_at: datetime
     updated_at: datetime
-    last_login: Union[datetime, None]
+    last_login: Union[datetime, None] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
 class UserDetailData(UserData):
-    most_used_tool: str
+    most_used_tool: Optional[str] = None
 
 
 class UserDetailResponse(BaseModel):
@@ -215,21 +218,59 @@ class RegisterUserData(BaseModel):
     """Registration schema"""
 
     id: str
-    email: EmailStr
+    email: str
     first_name: Optional[str]
     last_name: Optional[str]
+    avatar_url: Optional[str] = None
     is_active: bool
-    is_superadmin: bool
+    is_verified: bool = False
+    is_superadmin: bool = False
     created_at: datetime
-    last_login: Union[datetime, None]
+    last_login: Union[datetime, None] = None
+
+
+class RegisterUserResponseData(BaseModel):
+    user: RegisterUserData
+    user_subscription: UserSubscriptionData
 
 
 class RegisterUserResponse(BaseModel):
-    status: str
+    status: str = "success"
     status_code: int
     message: str
     access_token: str
-    data: RegisterUserData
+    refresh_token: str
+    data: RegisterUserResponseData
+
+
+class LoginResponseData(BaseModel):
+    user: RegisterUserData
+
+
+class LoginResponse(BaseModel):
+    status: str = "success"
+    status_code: int
+    message: str
+    access_token: str
+    refresh_token: str
+    data: LoginResponseData
+
+
+class UserProfileData(BaseModel):
+    """Public profile of a user"""
+
+    id: str
+    email: str
+    first_name: Optional[str]
+    last_name: Optional[str]
+    avatar_url: Optional[str] = None
+
+
+class UserProfileResponse(BaseModel):
+    status_code: int = 200
+    success: bool = True
+    message: str
+    data: UserProfileData
 
 class CurrentUserDetailResponse(BaseModel):
     status: str
@@ -256,4 +297,11 @@ class MagicLinkResponse(BaseModel):
     status: str
     status_code: int
     message: str
-    data: MagicLinkData
\ No newline at end of file
+    data: MagicLinkData
+
+
+# Prebuilt serializers for responses rendered straight from ORM objects
+user_data_list_adapter = TypeAdapter(List[UserData])
+register_user_response_adapter = TypeAdapter(RegisterUserResponse)
+login_response_adapter = TypeAdapter(LoginResponse)
+user_profile_response_adapter = TypeAdapter(UserProfileResponse)
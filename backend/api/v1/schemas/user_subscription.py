@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from api.v1.schemas.base_schema import ResponseBase, PaginationBase
 
@@ -21,6 +21,17 @@ class CreateUserSubResponse(CreateUserSubSchema):
         from_attributes = True
 
 
+class UserSubscriptionData(BaseModel):
+    """A user subscription as returned to its owner"""
+    id: str
+    billing_plan_id: str
+    start_date: datetime
+    end_date: Optional[datetime] = None
+    is_expired: bool = False
+    created_at: datetime
+    updated_at: datetime
+
+
 class ViewUserSubReturnData(CreateUserSubResponse):
     is_active: bool
     user_name: str
@@ -1,4 +1,5 @@
 from fastapi import HTTPException, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from uuid_extensions import uuid7
 from typing import Any, Optional
@@ -6,6 +7,10 @@ import math
 
 from api.v1.services.user_subscription import user_subscription_service as user_sub_service
 from api.utils.db_validators import check_model_existence, get_model_by_params
+from api.utils.etag import make_etag
+from api.utils.json_response import dump_json
+from api.utils.timing import timed
+from api.v1.models.read_models import BillingPlanRecord
 from api.v1.schemas.billing_plan import CreateBillingPlanSchema
 from api.v1.models.billing_plan import BillingPlan
 from api.v1.models.user import User
@@ -17,6 +22,10 @@ class BillingPlanService:
     YEARLY_PAYMENT_DISCOINT_PERCENT = 15
     NUMBER_OF_MONTHS_CHARGED_YEARLY = 10
 
+    def __init__(self):
+        # (etag, rendered body) of the last catalog served
+        self._catalog = (None, None)
+
     def create(self, db: Session, schema: CreateBillingPlanSchema):
         """
         Create and return a new billing plan
@@ -60,6 +69,35 @@ class BillingPlanService:
             
         return all_plans
 
+    def get_catalog_etag(self, db: Session) -> str:
+        """Return the ETag of the plan catalog, derived from the number of
+        plans and their latest `updated_at` without loading any plan"""
+
+        count, last_updated = db.query(
+            func.count(BillingPlan.id), func.max(BillingPlan.updated_at)
+        ).one()
+
+        return make_etag("billing-plans", count, last_updated)
+
+    def get_catalog_body(self, db: Session, etag: str) -> bytes:
+        """Return the rendered plan catalog for `etag`. The body is rendered
+        once per catalog version and then served from memory."""
+
+        cached_etag, body = self._catalog
+        if cached_etag == etag:
+            return body
+
+        plans = BillingPlanRecord.fetch_all(db)
+        body = dump_json({
+            "status_code": 200,
+            "success": True,
+            "message": "Billing plans retrieved successfully",
+            "data": {"billing_plans": plans},
+        })
+        self._catalog = (etag, body)
+
+        return body
+
     def update(self, db: Session, plan_id: str, schema):
         """
         Update a billing plan
@@ -84,7 +122,8 @@ class BillingPlanService:
         db.delete(plan)
         db.commit()
     
-    def subscribe_user_to_free_plan(self, db: Session, user: User):
+    @timed("billing_plan.subscribe_free")
+    def subscribe_user_to_free_plan(self, db: Session, user: User, commit: bool = True):
         """Subscribe a user to free billing plan irrespective 
         of the plan they are currently on"""
 
@@ -96,8 +135,8 @@ class BillingPlanService:
             )
 
         # check if user is already on free subscription
-        user_sub = user.subscription
-        if user_sub == free_plan:
+        user_sub = user_sub_service.fetch_current(db, user)
+        if user_sub is not None and user_sub.billing_plan_id == free_plan.id:
             return user_sub
         
         # create a user subscription plan
@@ -108,14 +147,14 @@ class BillingPlanService:
             "start_date": start_date,
             "billing_plan_id": free_plan.id,
         }
-        user_sub = user_sub_service.create(db, user_subscription_data)
+        user_sub = user_sub_service.create(db, user_subscription_data, commit=commit)
 
         return user_sub
     
     def confirm_user_is_on_plan(self, db: Session, user: User, plan_name: str) -> bool:
         """Confirm that `user` is subscribed to billing plan with `plan_name`"""
 
-        user_sub = user.subscription
+        user_sub = user_sub_service.fetch_current(db, user)
         
         if user_sub is None:
             # If no existing subscription, put user on the free 
@@ -0,0 +1,288 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Optional
+
+from markupsafe import escape
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from api.core.dependencies.email.email_sender import build_message
+from api.core.dependencies.email.smtp_pool import smtp_pool
+from api.core.dependencies.email.template_registry import email_template_registry
+from api.db.database import SessionLocal
+from api.utils.logger import logger
+from api.utils.settings import settings
+from api.v1.models.email_campaign import EmailCampaign
+from api.v1.models.user import User
+from api.v1.models.user_subscription import UserSubscription
+
+
+# Per recipient fields. The template is rendered once per campaign with
+# these markers in place of `user.<field>`, then each message only swaps
+# the markers for the recipient's (escaped) values.
+PERSONAL_FIELDS = ("first_name", "last_name", "email")
+_MARKER = "__CAMPAIGN_{}__"
+
+
+@dataclass
+class CampaignProgress:
+    """Progress of a campaign run"""
+
+    campaign_id: str
+    total: int
+    sent: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    # Recipients already handled before this run (when resuming)
+    resumed_from: int = 0
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def done(self) -> int:
+        return self.resumed_from + self.sent + self.failed
+
+    @property
+    def throughput(self) -> float:
+        """Messages per second during this run"""
+        elapsed = self.elapsed
+        return (self.sent + self.failed) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until the campaign completes"""
+        throughput = self.throughput
+        if not throughput:
+            return None
+        return max(self.total - self.done, 0) / throughput
+
+    def summary(self) -> str:
+        eta = f"{self.eta:.0f}s" if self.eta is not None else "n/a"
+        return (
+            f"campaign {self.campaign_id}: {self.done}/{self.total} "
+            f"(sent={self.sent} failed={self.failed}) "
+            f"{self.throughput:.1f} msg/s, eta {eta} ({self.elapsed:.1f}s)"
+        )
+
+
+class _RateLimiter:
+    """Spaces out calls to at most `rate` per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class EmailCampaignService:
+    """Sends one template to a segment of users.
+
+    Recipients are streamed from the database with a server side cursor in
+    user id order and sent through the pooled SMTP client by a bounded
+    number of concurrent senders, throttled to a fixed rate. Progress is
+    checkpointed on the campaign after every chunk of recipients, so a
+    crashed run resumes from the last checkpoint (re-sending at most one
+    chunk) with `resume`.
+    """
+
+    def create(
+        self,
+        db: Session,
+        name: str,
+        template_name: str,
+        subject: str,
+        billing_plan_id: Optional[str] = None,
+        context: Optional[dict] = None,
+    ) -> EmailCampaign:
+        """Create a campaign to every active user, or to the users currently
+        subscribed to `billing_plan_id`"""
+
+        campaign = EmailCampaign(
+            name=name,
+            template_name=template_name,
+            subject=subject,
+            billing_plan_id=billing_plan_id,
+            context=context or {},
+        )
+        db.add(campaign)
+        db.commit()
+        db.refresh(campaign)
+
+        return campaign
+
+    @staticmethod
+    def _segment(campaign: EmailCampaign, *columns):
+        stmt = select(*columns).where(
+            User.is_active.is_(True),
+            User.is_deleted.is_(False),
+        )
+        if campaign.billing_plan_id:
+            stmt = stmt.join(
+                UserSubscription, User.current_subscription_id == UserSubscription.id
+            ).where(
+                UserSubscription.billing_plan_id == campaign.billing_plan_id,
+                UserSubscription.is_expired.is_(False),
+            )
+        return stmt
+
+    def count_recipients(self, db: Session, campaign: EmailCampaign) -> int:
+        """Total recipients in the campaign's segment"""
+        return db.scalar(self._segment(campaign, func.count(User.id)))
+
+    def stream_recipients(
+        self, db: Session, campaign: EmailCampaign, chunk_size: int
+    ) -> Iterator[List[tuple]]:
+        """Yield chunks of `(id, first_name, last_name, email)` rows after the
+        campaign's checkpoint.
+
+        On PostgreSQL rows come from a single server side cursor. SQLite
+        keeps a long running read from coexisting with the checkpoint
+        writes, so there each chunk is fetched with its own keyset query.
+        """
+        stmt = self._segment(
+            campaign, User.id, User.first_name, User.last_name, User.email
+        ).order_by(User.id)
+
+        if db.get_bind().dialect.name == "postgresql":
+            if campaign.last_user_id:
+                stmt = stmt.where(User.id > campaign.last_user_id)
+            result = db.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+            for partition in result.partitions():
+                yield partition
+            return
+
+        last_user_id = campaign.last_user_id
+        while True:
+            page = stmt.limit(chunk_size)
+            if last_user_id:
+                page = page.where(User.id > last_user_id)
+            rows = db.execute(page).all()
+            db.commit()
+            if not rows:
+                return
+            last_user_id = rows[-1][0]
+            yield rows
+
+    async def render(self, campaign: EmailCampaign) -> str:
+        """Render the campaign template once, with personalisation markers"""
+
+        context = dict(campaign.context or {})
+        context["user"] = {name: _MARKER.format(name.upper()) for name in PERSONAL_FIELDS}
+        return await email_template_registry.render(campaign.template_name, context)
+
+    @staticmethod
+    def personalise(html: str, recipient: tuple) -> str:
+        for name, value in zip(PERSONAL_FIELDS, recipient[1:]):
+            html = html.replace(_MARKER.format(name.upper()), str(escape(value or "")))
+        return html
+
+    def _checkpoint(self, db: Session, campaign: EmailCampaign, last_user_id: str, sent: int, failed: int):
+        campaign.last_user_id = last_user_id
+        campaign.sent_count += sent
+        campaign.failed_count += failed
+        db.commit()
+
+    def _complete(self, db: Session, campaign: EmailCampaign):
+        campaign.status = EmailCampaign.COMPLETED
+        campaign.completed_at = datetime.now(tz=timezone.utc)
+        db.commit()
+
+    async def run(
+        self,
+        campaign_id: str,
+        rate: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        on_progress: Optional[Callable[[CampaignProgress], None]] = None,
+    ) -> CampaignProgress:
+        """Send (or resume sending) a campaign until every recipient is handled.
+
+        Args:
+            rate: Maximum messages per second, `0` for unthrottled.
+            concurrency: Messages in flight at once.
+            chunk_size: Recipients fetched, sent and checkpointed together.
+            on_progress: Called with the progress after every checkpoint.
+        """
+        rate = settings.CAMPAIGN_RATE_PER_SECOND if rate is None else rate
+        concurrency = concurrency or settings.CAMPAIGN_CONCURRENCY
+        chunk_size = chunk_size or settings.CAMPAIGN_CHUNK_SIZE
+
+        loop = asyncio.get_running_loop()
+        # All database work happens on one dedicated thread: the streaming
+        # cursor and its session must not hop between threads, and the
+        # event loop keeps sending while the next chunk is fetched
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="campaign-db")
+        db = SessionLocal()
+        cursor_db = SessionLocal()
+
+        def in_db_thread(func, *args):
+            return loop.run_in_executor(executor, func, *args)
+
+        try:
+            campaign = await in_db_thread(db.get, EmailCampaign, campaign_id)
+            if campaign is None:
+                raise ValueError(f"Campaign {campaign_id} does not exist")
+
+            progress = CampaignProgress(
+                campaign_id=campaign.id,
+                total=await in_db_thread(self.count_recipients, db, campaign),
+                resumed_from=campaign.sent_count + campaign.failed_count,
+            )
+            if campaign.status == EmailCampaign.COMPLETED:
+                return progress
+
+            template = await self.render(campaign)
+            limiter = _RateLimiter(rate)
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def send(recipient: tuple) -> bool:
+                async with semaphore:
+                    await limiter.wait()
+                    try:
+                        await smtp_pool.send_message(build_message(
+                            recipient[3], campaign.subject, self.personalise(template, recipient)
+                        ))
+                        return True
+                    except Exception as exc:
+                        logger.error(f"Campaign {campaign.id} failed to send to {recipient[3]}; {exc}")
+                        return False
+
+            chunks = await in_db_thread(self.stream_recipients, cursor_db, campaign, chunk_size)
+            while True:
+                chunk = await in_db_thread(next, chunks, None)
+                if chunk is None:
+                    break
+
+                results = await asyncio.gather(*(send(recipient) for recipient in chunk))
+                sent = sum(results)
+                failed = len(results) - sent
+
+                await in_db_thread(self._checkpoint, db, campaign, chunk[-1][0], sent, failed)
+                progress.sent += sent
+                progress.failed += failed
+                if on_progress:
+                    on_progress(progress)
+
+            await in_db_thread(self._complete, db, campaign)
+            return progress
+        finally:
+            await in_db_thread(cursor_db.close)
+            await in_db_thread(db.close)
+            executor.shutdown(wait=False)
+
+
+email_campaign_service = EmailCampaignService()
@@ -0,0 +1,306 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from api.core.dependencies.email.email_sender import send_email
+from api.db.database import db_session
+from api.utils.logger import logger
+from api.utils.settings import settings
+from api.v1.models.email_outbox import EmailOutbox
+
+
+class EmailOutboxService:
+    """Transactional email outbox.
+
+    The API only adds an `EmailOutbox` row to the caller's session, so the
+    email is committed (or rolled back) together with the change that
+    triggered it. Delivery workers claim due messages in batches with
+    `SKIP LOCKED`, send them through the pooled SMTP client, retry failures
+    with exponential backoff and move messages that keep failing to the
+    `dead` state. Sent and dead messages are pruned once they are older
+    than `EMAIL_OUTBOX_RETENTION_DAYS`.
+
+    Templates listed in `EMAIL_DEDUPE_WINDOWS` (eg: magic links) are
+    deduplicated: enqueueing the same template for the same recipient again
+    within the window reuses the queued or just sent message instead of
+    rendering and sending another one.
+    """
+
+    def __init__(self, dedupe_windows: Optional[str] = None):
+        self.dedupe_windows = self.parse_windows(
+            settings.EMAIL_DEDUPE_WINDOWS if dedupe_windows is None else dedupe_windows
+        )
+        self.deduplicated = 0
+
+    @staticmethod
+    def parse_windows(value: str) -> Dict[str, float]:
+        """Parse `"template:seconds,template:seconds"` into a dict"""
+
+        windows = {}
+        for item in value.split(","):
+            template_name, _, seconds = item.strip().rpartition(":")
+            if template_name:
+                windows[template_name] = float(seconds)
+        return windows
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(tz=timezone.utc)
+
+    def enqueue(
+        self,
+        db: Session,
+        recipient: str,
+        template_name: str,
+        subject: str,
+        context: Optional[dict] = None,
+        commit: bool = True,
+    ) -> EmailOutbox:
+        """Queue an email. `context` must be JSON serializable.
+
+        Pass `commit=False` to leave committing to the caller, so the email
+        is only sent if the surrounding transaction commits.
+
+        Returns:
+            The queued message, or the earlier copy it was deduplicated into.
+        """
+        duplicate = self.find_duplicate(db, recipient, template_name)
+        if duplicate is not None:
+            self.deduplicated += 1
+            return duplicate
+
+        message = EmailOutbox(
+            recipient=recipient,
+            template_name=template_name,
+            subject=subject,
+            context=context or {},
+            status=EmailOutbox.PENDING,
+            attempts=0,
+            next_attempt_at=self._now(),
+        )
+        db.add(message)
+
+        if commit:
+            db.commit()
+
+        return message
+
+    def find_duplicate(self, db: Session, recipient: str, template_name: str) -> Optional[EmailOutbox]:
+        """The same email queued or sent within the template's dedupe window"""
+
+        window = self.dedupe_windows.get(template_name)
+        if not window:
+            return None
+
+        return db.execute(
+            select(EmailOutbox)
+            .where(
+                EmailOutbox.recipient == recipient,
+                EmailOutbox.template_name == template_name,
+                EmailOutbox.status != EmailOutbox.DEAD,
+                EmailOutbox.created_at >= self._now() - timedelta(seconds=window),
+            )
+            .order_by(EmailOutbox.created_at.desc())
+            .limit(1)
+        ).scalar_one_or_none()
+
+    def claim_batch(self, db: Session, batch_size: Optional[int] = None) -> List[EmailOutbox]:
+        """Claim up to `batch_size` due messages for this worker.
+
+        Claimed messages are leased for `EMAIL_OUTBOX_LEASE` seconds; if the
+        worker dies before recording the outcome they become due again.
+        """
+        batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+        now = self._now()
+
+        messages = db.execute(
+            select(EmailOutbox)
+            .where(
+                EmailOutbox.status.in_([EmailOutbox.PENDING, EmailOutbox.SENDING]),
+                EmailOutbox.next_attempt_at <= now,
+            )
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        lease_until = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+        for message in messages:
+            message.status = EmailOutbox.SENDING
+            message.attempts += 1
+            message.next_attempt_at = lease_until
+
+        # Detach before committing so the claimed rows stay readable
+        # (without being expired) while they are sent outside the session
+        db.flush()
+        for message in messages:
+            db.expunge(message)
+        db.commit()
+
+        return messages
+
+    @staticmethod
+    def backoff(attempts: int) -> float:
+        """Seconds to wait before retrying after `attempts` failed attempts"""
+        delay = settings.EMAIL_OUTBOX_BACKOFF_BASE * (2 ** (attempts - 1))
+        delay = min(delay, settings.EMAIL_OUTBOX_BACKOFF_MAX)
+        # Jitter so a failing provider is not retried in lockstep
+        return delay * random.uniform(0.8, 1.2)
+
+    def record_results(self, db: Session, results: List[tuple]):
+        """Record delivery outcomes of claimed messages.
+
+        An outcome is only recorded while this worker still holds the claim:
+        if the send outlived the lease and another worker claimed the
+        message again, the other worker's outcome wins.
+
+        Args:
+            results: `(message, error)` pairs, `error` is `None` on success.
+        """
+        now = self._now()
+
+        for message, error in results:
+            if error is None:
+                values = {"status": EmailOutbox.SENT, "sent_at": now, "last_error": None}
+            elif message.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                logger.error(
+                    f"Email {message.id} to {message.recipient} moved to dead letter "
+                    f"after {message.attempts} attempts; {error}"
+                )
+                values = {"status": EmailOutbox.DEAD, "last_error": error}
+            else:
+                values = {
+                    "status": EmailOutbox.PENDING,
+                    "last_error": error,
+                    "next_attempt_at": now + timedelta(seconds=self.backoff(message.attempts)),
+                }
+
+            recorded = db.execute(
+                update(EmailOutbox)
+                .where(
+                    EmailOutbox.id == message.id,
+                    EmailOutbox.status == EmailOutbox.SENDING,
+                    EmailOutbox.attempts == message.attempts,
+                )
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not recorded:
+                logger.warning(
+                    f"Email {message.id} was claimed again before attempt "
+                    f"{message.attempts} finished; its outcome is discarded"
+                )
+
+        db.commit()
+
+    def prune(self, db: Session, retention_days: Optional[int] = None, batch_size: Optional[int] = None) -> int:
+        """Delete sent and dead messages last updated more than
+        `retention_days` ago, in batches. Returns the number deleted."""
+
+        retention_days = retention_days or settings.EMAIL_OUTBOX_RETENTION_DAYS
+        batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+        cutoff = self._now() - timedelta(days=retention_days)
+        total = 0
+
+        while True:
+            ids = db.execute(
+                select(EmailOutbox.id)
+                .where(
+                    EmailOutbox.status.in_([EmailOutbox.SENT, EmailOutbox.DEAD]),
+                    EmailOutbox.updated_at < cutoff,
+                )
+                .limit(batch_size)
+            ).scalars().all()
+
+            if not ids:
+                break
+
+            db.execute(
+                delete(EmailOutbox)
+                .where(EmailOutbox.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+            total += len(ids)
+            if len(ids) < batch_size:
+                break
+
+        return total
+
+    async def _deliver(self, message: EmailOutbox) -> tuple:
+        try:
+            await send_email(
+                recipient=message.recipient,
+                template_name=message.template_name,
+                subject=message.subject,
+                context=message.context,
+            )
+            return message, None
+        except Exception as exc:
+            return message, f"{type(exc).__name__}: {exc}"[:1000]
+
+    @staticmethod
+    def _with_session(func, *args):
+        db = db_session()
+        try:
+            return func(db, *args)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def process_batch(self) -> int:
+        """Claim, send and record one batch. Returns the batch size."""
+
+        messages = await run_in_threadpool(self._with_session, self.claim_batch)
+        if not messages:
+            return 0
+
+        # Concurrency is capped by the SMTP connection pool
+        results = await asyncio.gather(*(self._deliver(message) for message in messages))
+        await run_in_threadpool(self._with_session, self.record_results, results)
+
+        return len(messages)
+
+    async def run_worker(self, poll_interval: Optional[float] = None):
+        """Deliver outbox messages until cancelled, pruning old ones every
+        `EMAIL_OUTBOX_PRUNE_INTERVAL` seconds"""
+
+        poll_interval = poll_interval or settings.EMAIL_OUTBOX_POLL_INTERVAL
+        next_prune = time.monotonic()
+
+        while True:
+            if time.monotonic() >= next_prune:
+                next_prune = time.monotonic() + settings.EMAIL_OUTBOX_PRUNE_INTERVAL
+                try:
+                    pruned = await run_in_threadpool(self._with_session, self.prune)
+                    if pruned:
+                        logger.info(f"Pruned {pruned} old outbox message(s)")
+                except Exception as exc:
+                    logger.exception(f"Email outbox prune failed; {exc}")
+
+            try:
+                processed = await self.process_batch()
+            except Exception as exc:
+                logger.exception(f"Email outbox batch failed; {exc}")
+                processed = 0
+
+            if not processed:
+                await asyncio.sleep(poll_interval)
+
+    def pending_count(self, db: Session) -> int:
+        """Number of messages waiting to be delivered"""
+        return db.query(EmailOutbox).filter(
+            EmailOutbox.status.in_([EmailOutbox.PENDING, EmailOutbox.SENDING])
+        ).count()
+
+
+email_outbox_service = EmailOutboxService()
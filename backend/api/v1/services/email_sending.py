@@ -1,95 +1,114 @@
-from fastapi import BackgroundTasks, Request, requests
+from sqlalchemy.orm import Session
 
 from api.v1.models.contact_us import ContactUs
 from api.v1.models.user import User
-from api.core.dependencies.email.email_sender import send_email
+from api.v1.services.email_outbox import email_outbox_service
 
 
 SUPPORT_LINK = ''
 UNSUBSCRIBE_LINK = ''
 
 
+def _user_context(user: User) -> dict:
+    '''JSON safe subset of the user that the email templates use'''
+
+    return {
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+    }
+
+
 class EmailSendingService:
     """
-    This service just allows for sending different types of email messages
+    This service just allows for sending different types of email messages.
+
+    Emails are written to the transactional outbox and delivered by the
+    email worker (`python -m scripts.email_worker`). Pass `commit=False` to
+    commit the email together with the caller's own changes.
     """
 
-    def send_welcome_email(self, request: Request, background_tasks: BackgroundTasks, user: User):
+    def send_welcome_email(self, db: Session, user: User, commit: bool = True):
         '''This function sends the welcome email to a user'''
 
-        background_tasks.add_task(
-            send_email,
+        email_outbox_service.enqueue(
+            db,
             recipient=user.email,
             template_name="welcome-marketing.html",
             subject="Welcome to TiFi",
             context={
-                "request": request,
-                "user": user,
+                "user": _user_context(user),
                 "cta_link": "https://tifi.tv/about"
-            }
+            },
+            commit=commit,
         )
-     
-    
-    def send_magic_link_email(self, request: Request, background_tasks: BackgroundTasks, user: User, magic_link_url: str):
+
+
+    def send_magic_link_email(self, db: Session, user: User, magic_link_url: str, commit: bool = True):
         '''This function sends the magic link authentication email to a user'''
 
-        background_tasks.add_task(
-            send_email,
+        email_outbox_service.enqueue(
+            db,
             recipient=user.email,
             template_name="magic-link.html",
             subject="Magic Link Authentication",
             context={
-                "request": request,
-                "user": user,
+                "user": _user_context(user),
                 "url": magic_link_url
-            }
+            },
+            commit=commit,
         )
-    
 
-    def send_reset_password_email(self, request: Request, background_tasks: BackgroundTasks, user: User, reset_url: str):
+
+    def send_reset_password_email(self, db: Session, user: User, reset_url: str, commit: bool = True):
         '''This function sends the reset password email to a user'''
 
-        background_tasks.add_task(
-            send_email,
+        email_outbox_service.enqueue(
+            db,
             recipient=user.email,
             template_name="reset-password.html",
             subject="Reset Password",
             context={
-                "request": request,
-                "user": user,
+                "user": _user_context(user),
                 "url": reset_url
-            }
+            },
+            commit=commit,
         )
-    
 
-    def send_reset_password_success_email(self, request: Request, background_tasks: BackgroundTasks, user: User):
+
+    def send_reset_password_success_email(self, db: Session, user: User, commit: bool = True):
         '''This function sends the reset password success email to a user'''
 
-        background_tasks.add_task(
-            send_email,
+        email_outbox_service.enqueue(
+            db,
             recipient=user.email,
             template_name="password-reset-complete.html",
             subject="Password Reset Complete",
             context={
-                "request": request,
-                "user": user,
-            }
+                "user": _user_context(user),
+            },
+            commit=commit,
         )
-    
 
-    def send_contact_us_success_email(self, request: Request, background_tasks: BackgroundTasks, contact_message: ContactUs):
+
+    def send_contact_us_success_email(self, db: Session, contact_message: ContactUs, commit: bool = True):
         '''This function sends a contact us success email to the specified email'''
 
-        background_tasks.add_task(
-            send_email,
+        email_outbox_service.enqueue(
+            db,
             recipient=contact_message.email,
             template_name="contact-us-success.html",
             subject="Contact us message sent successfully",
             context={
-                "request": request,
-                "message": contact_message,
-            }
+                "message": {
+                    "name": contact_message.name,
+                    "email": contact_message.email,
+                    "phone_number": contact_message.phone_number,
+                    "message": contact_message.message,
+                },
+            },
+            commit=commit,
         )
 
 
-email_sending_service = EmailSendingService()
\ No newline at end of file
+email_sending_service = EmailSendingService()
@@ -0,0 +1,334 @@
+import asyncio
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, insert, text, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from uuid_extensions import uuid7
+
+from api.db.database import db_session
+from api.utils.db_upsert import get_dialect_insert
+from api.utils.logger import logger
+from api.utils.settings import settings
+from api.v1.models.tool_activity import (
+    ToolActivityEvent,
+    UserToolUsage,
+    UserActivitySummary,
+)
+from api.v1.schemas.tool import TOOLS
+
+
+JOB_PENDING = "pending"
+JOB_IN_PROGRESS = "in_progress"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_STATUSES = (JOB_PENDING, JOB_IN_PROGRESS, JOB_COMPLETED, JOB_FAILED)
+
+STATUS_COLUMNS = {
+    JOB_PENDING: "jobs_pending",
+    JOB_IN_PROGRESS: "jobs_in_progress",
+    JOB_COMPLETED: "jobs_completed",
+    JOB_FAILED: "jobs_failed",
+}
+ROLLUP_COLUMNS = ("jobs_created", *STATUS_COLUMNS.values())
+
+INSERT_CHUNK_SIZE = 1000
+
+
+class ToolActivityService:
+    """Ingests tool job events and maintains per-user rollups.
+
+    Events are buffered in memory and written with multi-row inserts into
+    the append-only `tool_activity_events` table. The same flush folds the
+    batch into `user_activity_summaries` and `user_tool_usage` with
+    additive upserts, so reads are primary key lookups and never aggregate
+    raw events. Since per-tool counts only grow, the most used tool is kept
+    exact by promoting a tool whenever its new count beats the stored top.
+
+    The buffer holds at most `ACTIVITY_BUFFER_SIZE` events; while it is
+    full, new events are dropped and counted in `dropped_events`. A batch
+    rejected by a constraint is retried one user at a time and the events of
+    users that still fail (eg: a user purged since) are dropped, so one bad
+    event cannot wedge the pipeline.
+    """
+
+    def __init__(self):
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._partitions_checked_on = None
+        self._overflowing = False
+        self.dropped_events = 0
+
+    @property
+    def buffered_events(self) -> int:
+        """Events recorded but not flushed yet"""
+        return len(self._buffer)
+
+    def record_event(
+        self,
+        user_id: str,
+        job_id: str,
+        tool: str,
+        status: str,
+        previous_status: Optional[str] = None,
+    ):
+        """Buffer a job status change. A job is created by its first event,
+        which has no `previous_status`."""
+
+        if tool not in TOOLS:
+            raise HTTPException(status_code=400, detail=f"Unknown tool '{tool}'")
+        if status not in JOB_STATUSES or (
+            previous_status is not None and previous_status not in JOB_STATUSES
+        ):
+            raise HTTPException(status_code=400, detail="Invalid job status")
+
+        event = {
+            "id": str(uuid7()),
+            "created_at": datetime.now(tz=timezone.utc),
+            "user_id": user_id,
+            "job_id": job_id,
+            "tool": tool,
+            "status": status,
+            "previous_status": previous_status,
+        }
+
+        with self._lock:
+            if len(self._buffer) < settings.ACTIVITY_BUFFER_SIZE:
+                self._buffer.append(event)
+                return
+
+            self.dropped_events += 1
+            warn, self._overflowing = not self._overflowing, True
+
+        if warn:
+            logger.warning(
+                f"Tool activity buffer is full ({settings.ACTIVITY_BUFFER_SIZE} events); "
+                f"dropping new events until the next flush"
+            )
+
+    def _requeue(self, events: List[dict]):
+        """Put unwritten events back ahead of newer ones, within the cap"""
+
+        with self._lock:
+            buffer = events + self._buffer
+            overflow = len(buffer) - settings.ACTIVITY_BUFFER_SIZE
+            if overflow > 0:
+                self.dropped_events += overflow
+                del buffer[settings.ACTIVITY_BUFFER_SIZE:]
+            self._buffer = buffer
+
+    @staticmethod
+    def _rollup(events: List[dict]) -> Tuple[Dict[str, Counter], Counter]:
+        """Fold a batch of events into per-user status deltas and
+        per-(user, tool) job counts"""
+
+        user_deltas: Dict[str, Counter] = defaultdict(Counter)
+        tool_deltas: Counter = Counter()
+
+        for event in events:
+            deltas = user_deltas[event["user_id"]]
+            deltas[STATUS_COLUMNS[event["status"]]] += 1
+
+            if event["previous_status"] is None:
+                deltas["jobs_created"] += 1
+                tool_deltas[(event["user_id"], event["tool"])] += 1
+            else:
+                deltas[STATUS_COLUMNS[event["previous_status"]]] -= 1
+
+        return user_deltas, tool_deltas
+
+    def _write(self, db: Session, events: List[dict]):
+        for start in range(0, len(events), INSERT_CHUNK_SIZE):
+            db.execute(
+                insert(ToolActivityEvent).values(events[start:start + INSERT_CHUNK_SIZE])
+            )
+
+        user_deltas, tool_deltas = self._rollup(events)
+        dialect_insert = get_dialect_insert(db)
+
+        summary_stmt = dialect_insert(UserActivitySummary)
+        summary_stmt = summary_stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                column: getattr(UserActivitySummary, column) + getattr(summary_stmt.excluded, column)
+                for column in ROLLUP_COLUMNS
+            },
+        )
+        db.execute(summary_stmt, [
+            {"user_id": user_id, **{column: deltas[column] for column in ROLLUP_COLUMNS}}
+            for user_id, deltas in user_deltas.items()
+        ])
+
+        if not tool_deltas:
+            return
+
+        usage_stmt = dialect_insert(UserToolUsage)
+        usage_stmt = usage_stmt.on_conflict_do_update(
+            index_elements=["user_id", "tool"],
+            set_={"count": UserToolUsage.count + usage_stmt.excluded.count},
+        )
+        db.execute(usage_stmt, [
+            {"user_id": user_id, "tool": tool, "count": count}
+            for (user_id, tool), count in tool_deltas.items()
+        ])
+
+        # Promote any touched tool whose new count beats the stored top
+        touched = db.query(
+            UserToolUsage.user_id, UserToolUsage.tool, UserToolUsage.count
+        ).filter(
+            tuple_(UserToolUsage.user_id, UserToolUsage.tool).in_(list(tool_deltas))
+        ).all()
+
+        leaders: Dict[str, Tuple[str, int]] = {}
+        for user_id, tool, count in touched:
+            if user_id not in leaders or count > leaders[user_id][1]:
+                leaders[user_id] = (tool, count)
+
+        db.connection().execute(
+            update(UserActivitySummary.__table__)
+            .where(
+                UserActivitySummary.__table__.c.user_id == bindparam("b_user_id"),
+                UserActivitySummary.__table__.c.most_used_tool_count < bindparam("b_count"),
+            )
+            .values(
+                most_used_tool=bindparam("b_tool"),
+                most_used_tool_count=bindparam("b_count"),
+            ),
+            [
+                {"b_user_id": user_id, "b_tool": tool, "b_count": count}
+                for user_id, (tool, count) in leaders.items()
+            ],
+        )
+
+    def _write_per_user(self, db: Session, events: List[dict]) -> int:
+        """Write a batch that violated a constraint one user at a time,
+        dropping the events of users that are still rejected"""
+
+        by_user: Dict[str, List[dict]] = defaultdict(list)
+        for event in events:
+            by_user[event["user_id"]].append(event)
+
+        written = 0
+        for user_id, user_events in by_user.items():
+            try:
+                with db.begin_nested():
+                    self._write(db, user_events)
+            except IntegrityError as exc:
+                with self._lock:
+                    self.dropped_events += len(user_events)
+                logger.error(
+                    f"Dropped {len(user_events)} tool activity event(s) of user {user_id}; {exc.orig}"
+                )
+                continue
+            written += len(user_events)
+
+        db.commit()
+        return written
+
+    def flush(self, db: Session) -> int:
+        """Write all buffered events and their rollups in one transaction.
+        Returns the number of events written."""
+
+        with self._flush_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+                self._overflowing = False
+
+            if not events:
+                return 0
+
+            try:
+                try:
+                    self._write(db, events)
+                    db.commit()
+                    return len(events)
+                except IntegrityError:
+                    db.rollback()
+                    return self._write_per_user(db, events)
+            except Exception:
+                db.rollback()
+                self._requeue(events)
+                raise
+
+    def ensure_partitions(self, db: Session, months_ahead: int = 2):
+        """Create monthly partitions of `tool_activity_events` from the
+        current month up to `months_ahead` months ahead. PostgreSQL only."""
+
+        now = datetime.now(tz=timezone.utc)
+        self._partitions_checked_on = now.date()
+
+        if db.get_bind().dialect.name != "postgresql":
+            return
+
+        year, month = now.year, now.month
+
+        for _ in range(months_ahead + 1):
+            next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS tool_activity_events_{year}_{month:02} "
+                f"PARTITION OF tool_activity_events "
+                f"FOR VALUES FROM ('{year}-{month:02}-01') TO ('{next_year}-{next_month:02}-01')"
+            ))
+            year, month = next_year, next_month
+
+        db.commit()
+
+    def get_summary(self, db: Session, user_id: str) -> Optional[UserActivitySummary]:
+        """Fetch a user's activity rollup"""
+        return db.query(UserActivitySummary).filter(
+            UserActivitySummary.user_id == user_id
+        ).first()
+
+    def get_statistics(self, db: Session, user_id: str) -> dict:
+        """Return a user's job counts by status"""
+
+        summary = self.get_summary(db, user_id)
+
+        return {
+            "total_jobs_created": summary.jobs_created if summary else 0,
+            "total_jobs_completed": summary.jobs_completed if summary else 0,
+            "total_jobs_pending": summary.jobs_pending if summary else 0,
+            "total_jobs_in_progress": summary.jobs_in_progress if summary else 0,
+            "total_jobs_retrieved": summary.jobs_created if summary else 0,
+        }
+
+    def most_used_tool(self, db: Session, user_id: str) -> Optional[str]:
+        """Return the tool a user has created the most jobs with"""
+
+        summary = self.get_summary(db, user_id)
+        return summary.most_used_tool if summary else None
+
+    def _run(self, func):
+        db = db_session()
+        try:
+            return func(db)
+        finally:
+            db.close()
+
+    async def run_flusher(self, interval: Optional[float] = None):
+        """Flush buffered events every `interval` seconds until cancelled,
+        then flush one final time"""
+
+        interval = interval or settings.ACTIVITY_FLUSH_INTERVAL
+        await run_in_threadpool(self._run, self.ensure_partitions)
+
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    if self._partitions_checked_on != datetime.now(tz=timezone.utc).date():
+                        await run_in_threadpool(self._run, self.ensure_partitions)
+                    await run_in_threadpool(self._run, self.flush)
+                except Exception as exc:
+                    logger.exception(f"Tool activity flush failed; {exc}")
+        finally:
+            self._run(self.flush)
+
+
+tool_activity_service = ToolActivityService()
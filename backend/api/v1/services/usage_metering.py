@@ -0,0 +1,316 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from cachetools import TTLCache
+from fastapi import HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from api.db.database import db_session
+from api.utils.db_upsert import get_dialect_insert
+from api.utils.logger import logger
+from api.utils.settings import settings
+from api.v1.models.billing_plan import BillingPlan
+from api.v1.models.usage_counter import UsageCounter
+from api.v1.models.user import User
+from api.v1.services.user_subscription import user_subscription_service as user_sub_service
+
+
+UNLIMITED = None
+
+
+class _CounterShard:
+    """A lock-guarded slice of the in-process usage counters"""
+
+    __slots__ = ("lock", "counts", "reserved", "charged")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Unflushed usage on unlimited plans
+        self.counts: Dict[Tuple[str, str], int] = {}
+        # Quota reserved by this worker and not used yet
+        self.reserved: Dict[Tuple[str, str], int] = {}
+        # Stored usage when this worker last reserved quota
+        self.charged: Dict[Tuple[str, str], int] = {}
+
+
+class UsageMeteringService:
+    """Meters tool usage against `BillingPlan.access_limit`.
+
+    Each worker reserves quota for a user in blocks of up to
+    `USAGE_RESERVATION_SIZE` with a conditional upsert on the user's
+    `usage_counters` row for the period, which only increments while
+    `count + block <= limit`. The database locks the row it conflicts on, so
+    no two workers can reserve the same quota, and the count never exceeds
+    the limit. Uses are then taken from the reservation in sharded
+    in-process counters, off the database.
+
+    Usage on unlimited plans is never checked; it lands in the same
+    counters. A background flush adds each worker's deltas to the stored
+    rows, and hands back whatever quota it still holds, with one batched
+    upsert per interval. Until then, quota reserved but unused by other
+    workers counts as used.
+    """
+
+    def __init__(self, num_shards: int = 64, reservation_size: Optional[int] = None):
+        self._shards = [_CounterShard() for _ in range(num_shards)]
+        self.reservation_size = reservation_size or settings.USAGE_RESERVATION_SIZE
+        self._flush_lock = threading.Lock()
+        self._dirty: set = set()
+        self._dirty_lock = threading.Lock()
+        # user_id -> access limit of the user's current plan, shared by the
+        # threadpool threads
+        self._limits = TTLCache(maxsize=100_000, ttl=settings.USAGE_LIMIT_CACHE_TTL)
+        self._limits_lock = threading.Lock()
+        self.limit_cache_hits = 0
+        self.limit_cache_misses = 0
+        self.reservations = 0
+
+    @staticmethod
+    def current_period(now: Optional[datetime] = None) -> str:
+        """Return the usage period key, one per calendar month (UTC)"""
+        now = now or datetime.now(tz=timezone.utc)
+        return now.strftime("%Y-%m")
+
+    def _shard(self, user_id: str) -> _CounterShard:
+        return self._shards[hash(user_id) % len(self._shards)]
+
+    def _mark_dirty(self, key: Tuple[str, str]):
+        with self._dirty_lock:
+            self._dirty.add(key)
+
+    def record(self, user_id: str, amount: int = 1, period: Optional[str] = None) -> int:
+        """Count `amount` uses for `user_id` without checking any limit and
+        return this worker's unflushed total for the period"""
+
+        key = (user_id, period or self.current_period())
+        shard = self._shard(user_id)
+
+        with shard.lock:
+            total = shard.counts.get(key, 0) + amount
+            shard.counts[key] = total
+
+        self._mark_dirty(key)
+        return total
+
+    def local_usage(self, user_id: str, period: Optional[str] = None) -> int:
+        """Usage recorded by this worker and not flushed yet, less the quota
+        it has reserved (and stored) but not used"""
+        key = (user_id, period or self.current_period())
+        shard = self._shard(user_id)
+        with shard.lock:
+            return shard.counts.get(key, 0) - shard.reserved.get(key, 0)
+
+    def get_limit(self, db: Session, user: User) -> Optional[int]:
+        """Return the cached access limit of the user's current plan.
+        `None` means the plan is unlimited."""
+
+        with self._limits_lock:
+            try:
+                limit = self._limits[user.id]
+                self.limit_cache_hits += 1
+                return limit
+            except KeyError:
+                self.limit_cache_misses += 1
+
+        user_sub = user_sub_service.fetch_current(db, user)
+        if user_sub is not None:
+            limit = user_sub.billing_plan.access_limit
+        else:
+            free_plan = db.query(BillingPlan).filter(BillingPlan.plan_name == "Free").first()
+            limit = free_plan.access_limit if free_plan else UNLIMITED
+
+        with self._limits_lock:
+            self._limits[user.id] = limit
+        return limit
+
+    def invalidate_limit(self, user_id: str):
+        """Forget the cached limit, eg: after a plan change"""
+        with self._limits_lock:
+            self._limits.pop(user_id, None)
+
+    def get_usage(self, db: Session, user_id: str, period: Optional[str] = None) -> int:
+        """Total usage for the period across all workers"""
+
+        period = period or self.current_period()
+        stored = db.query(UsageCounter.count).filter(
+            UsageCounter.user_id == user_id,
+            UsageCounter.period == period,
+        ).scalar()
+
+        return (stored or 0) + self.local_usage(user_id, period)
+
+    def remaining(self, db: Session, user: User) -> Optional[int]:
+        """Remaining quota for the current period, `None` if unlimited"""
+
+        limit = self.get_limit(db, user)
+        if limit is UNLIMITED:
+            return UNLIMITED
+
+        return max(limit - self.get_usage(db, user.id), 0)
+
+    @staticmethod
+    def _charge(db: Session, user_id: str, period: str, amount: int, limit: int) -> Optional[int]:
+        """Add `amount` to the user's stored usage unless that would exceed
+        `limit`. Returns the new usage, or `None` if it was refused."""
+
+        stmt = get_dialect_insert(db)(UsageCounter).values(
+            user_id=user_id, period=period, count=amount
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "period"],
+            set_={"count": UsageCounter.count + stmt.excluded.count, "updated_at": func.now()},
+            where=UsageCounter.count + stmt.excluded.count <= limit,
+        ).returning(UsageCounter.count)
+
+        try:
+            used = db.execute(stmt).scalar()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return used
+
+    def _take(self, shard: _CounterShard, key: Tuple[str, str], amount: int, limit: int) -> Optional[int]:
+        """Use `amount` of the quota this worker holds for `key`. Returns the
+        remaining quota as last seen, or `None` if not enough is held."""
+
+        with shard.lock:
+            held = shard.reserved.get(key, 0)
+            if held < amount:
+                return None
+            shard.reserved[key] = held - amount
+            return limit - shard.charged[key] + held - amount
+
+    def _reserve(self, db: Session, user_id: str, key: Tuple[str, str], amount: int, limit: int) -> bool:
+        """Reserve a block of quota covering at least `amount`, falling back
+        to exactly `amount` when the user is too close to the limit for a
+        full block. Commits the session if anything was reserved."""
+
+        for block in dict.fromkeys((max(amount, self.reservation_size), amount)):
+            if block > limit:
+                continue
+            charged = self._charge(db, user_id, key[1], block, limit)
+            if charged is not None:
+                break
+        else:
+            return False
+
+        self.reservations += 1
+        shard = self._shard(user_id)
+        with shard.lock:
+            shard.reserved[key] = shard.reserved.get(key, 0) + block
+            shard.charged[key] = charged
+        self._mark_dirty(key)
+        return True
+
+    def consume(self, db: Session, user: User, amount: int = 1) -> Optional[int]:
+        """Check the user's quota and record `amount` uses. Plans with an
+        access limit only reach the database (and commit the session) when
+        this worker has to reserve more quota.
+
+        Returns:
+            The remaining quota after this use, `None` if unlimited.
+
+        Raises:
+            HTTPException: If the user has used up their plan's access limit.
+        """
+        limit = self.get_limit(db, user)
+
+        if limit is UNLIMITED:
+            self.record(user.id, amount)
+            return UNLIMITED
+
+        key = (user.id, self.current_period())
+        shard = self._shard(user.id)
+
+        remaining = self._take(shard, key, amount, limit)
+        if remaining is None and self._reserve(db, user.id, key, amount, limit):
+            remaining = self._take(shard, key, amount, limit)
+
+        if remaining is None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Access limit for your current plan has been reached",
+            )
+
+        return max(remaining, 0)
+
+    def _drain(self) -> list:
+        """Take every unflushed delta, and every unused reservation as a
+        negative one, out of the counters"""
+
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+
+        rows = []
+        for user_id, period in dirty:
+            key = (user_id, period)
+            shard = self._shard(user_id)
+            with shard.lock:
+                count = shard.counts.pop(key, 0) - shard.reserved.pop(key, 0)
+                shard.charged.pop(key, None)
+            if count:
+                rows.append({"user_id": user_id, "period": period, "count": count})
+        return rows
+
+    @staticmethod
+    def _upsert_statement(db: Session):
+        stmt = get_dialect_insert(db)(UsageCounter)
+        return stmt.on_conflict_do_update(
+            index_elements=["user_id", "period"],
+            set_={"count": UsageCounter.count + stmt.excluded.count, "updated_at": func.now()},
+        )
+
+    def flush(self, db: Session) -> int:
+        """Add this worker's deltas for every key touched since the last
+        flush to the stored counters and hand back its unused quota, in a
+        single batched upsert"""
+
+        with self._flush_lock:
+            rows = self._drain()
+            if not rows:
+                return 0
+
+            try:
+                db.execute(self._upsert_statement(db), rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Nothing was added (or handed back), so put the deltas back
+                # for the next flush
+                for row in rows:
+                    self.record(row["user_id"], row["count"], row["period"])
+                raise
+
+            return len(rows)
+
+    def _run_flush(self):
+        db = db_session()
+        try:
+            return self.flush(db)
+        finally:
+            db.close()
+
+    async def run_flusher(self, interval: Optional[int] = None):
+        """Flush counters every `interval` seconds until cancelled, then
+        flush one final time"""
+
+        interval = interval or settings.USAGE_FLUSH_INTERVAL
+
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await run_in_threadpool(self._run_flush)
+                except Exception as exc:
+                    logger.exception(f"Usage counter flush failed; {exc}")
+        finally:
+            self._run_flush()
+
+
+usage_metering_service = UsageMeteringService()
@@ -1,3 +1,4 @@
+import math
 import random
 import string
 from typing import Any, Optional, Annotated
@@ -15,11 +16,13 @@ from api.core.base.services import Service
 from api.core.dependencies.email.email_sender import send_email
 from api.db.database import get_db
 from api.utils.settings import settings
+from api.utils.timing import timed
 from api.utils.db_validators import check_model_existence
 from api.v1.models import User
 from api.v1.models.token_login import TokenLogin
 from api.v1.schemas import user
 from api.v1.schemas import token
+from api.v1.services.user_stats import user_stats_service
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -86,22 +89,26 @@ class UserService(Service):
                 status_code=200,
                 page=page,
                 per_page=per_page,
+                total_pages=0,
                 total=0,
                 data=[],
             )
-        all_users = [
-            user.UserData.model_validate(usr, from_attributes=True) for usr in users
-        ]
+        # Validate the whole page in a single pydantic-core call
+        all_users = user.user_data_list_adapter.validate_python(
+            users, from_attributes=True
+        )
         return user.AllUsersResponse(
             message="Users successfully retrieved",
             status="success",
             status_code=200,
             page=page,
             per_page=per_page,
+            total_pages=math.ceil(total_users / per_page),
             total=total_users,
             data=all_users,
         )
 
+    @timed("user.fetch")
     def fetch(self, db: Session, id):
         """Fetches a user by their id"""
 
@@ -116,6 +123,16 @@ class UserService(Service):
 
         user = check_model_existence(db, User, id)
         return user
+
+    def get_user_updated_at(self, db: Session, id: str) -> datetime:
+        """Fetches only the `updated_at` of a user, eg: to validate an ETag"""
+
+        row = db.query(User.updated_at).filter(User.id == id).first()
+
+        if row is None:
+            raise HTTPException(status_code=404, detail="User does not exist")
+
+        return row.updated_at
     
     
     def get_user_by_email(self, db: Session, email: str) -> Optional[User]:
@@ -146,8 +163,13 @@ class UserService(Service):
 
         return user
 
-    def create(self, db: Session, schema: user.UserCreate):
-        """Creates a new user"""
+    @timed("user.create")
+    def create(self, db: Session, schema: user.UserCreate, commit: bool = True):
+        """Creates a new user.
+
+        Pass `commit=False` to only flush the user, leaving the commit (and
+        `user_stats_service.on_created`) to the caller.
+        """
 
         if db.query(User).filter(User.email == schema.email).first():
             raise HTTPException(
@@ -161,12 +183,20 @@ class UserService(Service):
         # Create user object with hashed password and other attributes from schema
         user = User(**schema.model_dump())
         db.add(user)
+
+        if not commit:
+            db.flush()
+            return user
+
         db.commit()
         db.refresh(user)
 
+        user_stats_service.on_created(user)
+
         return user
 
 
+    @timed("user.update")
     def update(self, db: Session, current_user: User, schema: user.UserUpdate, id=None):
         """Function to update a User"""
         
@@ -183,8 +213,12 @@ class UserService(Service):
             setattr(user, key, value)
         db.commit()
         db.refresh(user)
+
+        user_stats_service.on_updated(user)
+
         return user
 
+    @timed("user.delete")
     def delete(self, db: Session, id=None, access_token: str = Depends(oauth2_scheme)):
         """Function to soft delete a user"""
 
@@ -195,11 +229,19 @@ class UserService(Service):
             else check_model_existence(db, User, id)
         )
 
+        if user.is_deleted:
+            return super().delete()
+
+        was_active = user.is_active is not False
         user.is_deleted = True
+        user.deleted_at = datetime.now(tz=dt.timezone.utc)
         db.commit()
 
+        user_stats_service.on_deleted(was_active=was_active)
+
         return super().delete()
 
+    @timed("user.authenticate")
     def authenticate_user(self, db: Session, email: str, password: str):
         """Function to authenticate a user"""
 
@@ -219,17 +261,20 @@ class UserService(Service):
         if not user.is_active:
             raise HTTPException(detail="User is not active", status_code=403)
 
+    @timed("bcrypt")
     def hash_password(self, password: str) -> str:
         """Function to hash a password"""
 
         hashed_password = pwd_context.hash(secret=password)
         return hashed_password
 
+    @timed("bcrypt")
     def verify_password(self, password: str, hash: str) -> bool:
         """Function to verify a hashed password"""
 
         return pwd_context.verify(secret=password, hash=hash)
 
+    @timed("jwt")
     def create_access_token(self, user_id: str) -> str:
         """Function to create access token"""
 
@@ -240,6 +285,7 @@ class UserService(Service):
         encoded_jwt = jwt.encode(data, settings.SECRET_KEY, settings.ALGORITHM)
         return encoded_jwt
 
+    @timed("jwt")
     def create_refresh_token(self, user_id: str) -> str:
         """Function to create access token"""
 
@@ -250,6 +296,7 @@ class UserService(Service):
         encoded_jwt = jwt.encode(data, settings.SECRET_KEY, settings.ALGORITHM)
         return encoded_jwt
 
+    @timed("jwt")
     def verify_access_token(self, access_token: str, credentials_exception):
         """Funtcion to decode and verify access token"""
 
@@ -274,6 +321,7 @@ class UserService(Service):
 
         return token_data
 
+    @timed("jwt")
     def verify_refresh_token(self, refresh_token: str, credentials_exception):
         """Funtcion to decode and verify refresh token"""
 
@@ -328,6 +376,21 @@ class UserService(Service):
 
         return user
 
+    def get_current_super_admin(
+        self, access_token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+    ) -> User:
+        """Function to get the current logged in user if they are a super admin"""
+
+        user = self.get_current_user(access_token, db)
+
+        if user is None or not user.is_superadmin:
+            raise HTTPException(
+                status_code=403,
+                detail="You do not have permission to access this resource",
+            )
+
+        return user
+
     def deactivate_user(
         self,
         request: Request,
@@ -358,6 +421,8 @@ class UserService(Service):
 
         db.commit()
 
+        user_stats_service.on_deactivated()
+
         return reactivation_link
 
     def reactivate_user(self, db: Session, token: str):
@@ -385,6 +450,8 @@ class UserService(Service):
 
         db.commit()
 
+        user_stats_service.on_reactivated()
+
     def change_password(
         self,
         new_password: str,
@@ -0,0 +1,285 @@
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from api.utils.logger import logger
+from api.utils.settings import settings
+from api.v1.models.archived_user import ArchivedUser
+from api.v1.models.email_outbox import EmailOutbox
+from api.v1.models.token_login import TokenLogin
+from api.v1.models.tool_activity import ToolActivityEvent, UserActivitySummary, UserToolUsage
+from api.v1.models.usage_counter import UsageCounter
+from api.v1.models.user import User
+from api.v1.models.user_subscription import UserSubscription
+
+
+ARCHIVE = "archive"
+PURGE = "purge"
+
+# Tables holding rows owned by a user, deleted before the user itself.
+# `tool_activity_events.user_id` has no foreign key, so nothing cascades.
+DEPENDENT_MODELS = (
+    TokenLogin,
+    UserSubscription,
+    UsageCounter,
+    UserToolUsage,
+    UserActivitySummary,
+    ToolActivityEvent,
+)
+
+
+@dataclass
+class RetentionReport:
+    """Progress of a retention run"""
+
+    mode: str
+    dry_run: bool
+    cutoff: datetime
+    batches: int = 0
+    users: int = 0
+    # Users given a `deleted_at` before the run
+    backfilled: int = 0
+    rows: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def summary(self) -> str:
+        verb = "would be" if self.dry_run else "were"
+        tables = ", ".join(f"{table}={count}" for table, count in self.rows.items())
+        backfilled = f", {self.backfilled} deleted_at backfilled" if self.backfilled else ""
+        return (
+            f"{self.users} user(s) soft deleted before {self.cutoff.isoformat()} "
+            f"{verb} {self.mode}d in {self.batches} batch(es) "
+            f"[{tables}]{backfilled} ({self.elapsed:.1f}s)"
+        )
+
+
+class UserRetentionService:
+    """Moves long soft-deleted users out of the hot tables.
+
+    Eligible users are processed in bounded batches, each in its own short
+    transaction that locks only the batch (`SKIP LOCKED`), deletes the
+    user's dependent rows, the emails sent to them, and then the user. In
+    `archive` mode a compact copy of the user and their subscriptions is
+    written to `archived_users` first. Batches are separated by a pause so
+    the job never monopolises the database.
+
+    Users soft deleted before `deleted_at` existed have it unset; a run
+    first sets it to their `updated_at`, last set by the soft delete, so
+    eligibility is always a range scan of `ix_users_deleted_at`.
+    """
+
+    def _cutoff(self, retention_days: int) -> datetime:
+        return datetime.now(tz=timezone.utc) - timedelta(days=retention_days)
+
+    @staticmethod
+    def _eligible(cutoff: datetime):
+        return (User.is_deleted.is_(True), User.deleted_at < cutoff)
+
+    def backfill_deleted_at(self, db: Session, batch_size: int) -> int:
+        """Set `deleted_at` of soft-deleted users that lack it to their
+        `updated_at`, in batches. Returns the number of users updated."""
+
+        total = 0
+        while True:
+            user_ids = db.execute(
+                select(User.id)
+                .where(User.is_deleted.is_(True), User.deleted_at.is_(None))
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+
+            if not user_ids:
+                break
+
+            # `updated_at` is read before its own `onupdate` applies
+            db.execute(
+                update(User)
+                .where(User.id.in_(user_ids))
+                .values(deleted_at=User.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+            total += len(user_ids)
+            if len(user_ids) < batch_size:
+                break
+
+        return total
+
+    def _count(self, db: Session, report: RetentionReport):
+        """Fill `report` with what a real run would remove"""
+
+        # Also count the users the run would backfill `deleted_at` for
+        eligible_ids = select(User.id).where(
+            User.is_deleted.is_(True),
+            or_(
+                User.deleted_at < report.cutoff,
+                and_(User.deleted_at.is_(None), User.updated_at < report.cutoff),
+            ),
+        )
+
+        report.users = db.scalar(select(func.count()).select_from(eligible_ids.subquery()))
+        report.rows[User.__tablename__] = report.users
+        for model in DEPENDENT_MODELS:
+            report.rows[model.__tablename__] = db.scalar(
+                select(func.count()).select_from(model).where(model.user_id.in_(eligible_ids))
+            )
+        report.rows[EmailOutbox.__tablename__] = db.scalar(
+            select(func.count()).select_from(EmailOutbox).where(
+                EmailOutbox.recipient.in_(select(User.email).where(User.id.in_(eligible_ids)))
+            )
+        )
+
+    def _archive(self, db: Session, user_ids: List[str]):
+        users = db.execute(
+            select(
+                User.id, User.email, User.first_name, User.last_name,
+                User.created_at, User.deleted_at,
+            ).where(User.id.in_(user_ids))
+        ).all()
+
+        subscriptions = defaultdict(list)
+        for user_id, plan_id, start_date, end_date in db.execute(
+            select(
+                UserSubscription.user_id, UserSubscription.billing_plan_id,
+                UserSubscription.start_date, UserSubscription.end_date,
+            ).where(UserSubscription.user_id.in_(user_ids))
+        ):
+            subscriptions[user_id].append({
+                "billing_plan_id": plan_id,
+                "start_date": start_date.isoformat() if start_date else None,
+                "end_date": end_date.isoformat() if end_date else None,
+            })
+
+        db.execute(insert(ArchivedUser), [
+            {**user._asdict(), "subscriptions": subscriptions.get(user.id, [])}
+            for user in users
+        ])
+
+    def _process_batch(self, db: Session, cutoff: datetime, mode: str, batch_size: int, report: RetentionReport) -> int:
+        user_ids = db.execute(
+            select(User.id)
+            .where(*self._eligible(cutoff))
+            .order_by(User.deleted_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        if not user_ids:
+            return 0
+
+        if mode == ARCHIVE:
+            self._archive(db, user_ids)
+
+        db.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(current_subscription_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        for model in DEPENDENT_MODELS:
+            result = db.execute(
+                delete(model)
+                .where(model.user_id.in_(user_ids))
+                .execution_options(synchronize_session=False)
+            )
+            report.rows[model.__tablename__] += result.rowcount
+
+        # Outgoing emails hold the address and template context (names,
+        # links); they are only keyed by recipient
+        result = db.execute(
+            delete(EmailOutbox)
+            .where(EmailOutbox.recipient.in_(select(User.email).where(User.id.in_(user_ids))))
+            .execution_options(synchronize_session=False)
+        )
+        report.rows[EmailOutbox.__tablename__] += result.rowcount
+
+        result = db.execute(
+            delete(User)
+            .where(User.id.in_(user_ids))
+            .execution_options(synchronize_session=False)
+        )
+        report.rows[User.__tablename__] += result.rowcount
+        db.commit()
+
+        report.batches += 1
+        report.users += len(user_ids)
+        return len(user_ids)
+
+    def run(
+        self,
+        db: Session,
+        mode: str = ARCHIVE,
+        retention_days: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        pause: Optional[float] = None,
+        max_batches: Optional[int] = None,
+        dry_run: bool = False,
+        on_batch: Optional[Callable[[RetentionReport], None]] = None,
+    ) -> RetentionReport:
+        """Archive or purge users soft deleted more than `retention_days` ago.
+
+        Args:
+            db: The database session.
+            mode: `archive` to keep a copy in `archived_users`, or `purge`.
+            retention_days: How long soft-deleted users are kept.
+            batch_size: Maximum number of users handled per transaction.
+            pause: Seconds to sleep between batches.
+            max_batches: Stop after this many batches, `None` for no limit.
+            dry_run: Only count what would be removed.
+            on_batch: Called with the report after every committed batch,
+                eg: to print progress.
+
+        Returns:
+            A `RetentionReport` of the run.
+        """
+        if mode not in (ARCHIVE, PURGE):
+            raise ValueError(f"mode must be '{ARCHIVE}' or '{PURGE}'")
+
+        retention_days = settings.USER_RETENTION_DAYS if retention_days is None else retention_days
+        batch_size = batch_size or settings.USER_RETENTION_BATCH_SIZE
+        pause = settings.USER_RETENTION_BATCH_PAUSE if pause is None else pause
+
+        report = RetentionReport(mode=mode, dry_run=dry_run, cutoff=self._cutoff(retention_days))
+
+        if dry_run:
+            self._count(db, report)
+            logger.info(report.summary())
+            return report
+
+        try:
+            report.backfilled = self.backfill_deleted_at(db, batch_size)
+        except Exception:
+            db.rollback()
+            raise
+
+        while max_batches is None or report.batches < max_batches:
+            try:
+                processed = self._process_batch(db, report.cutoff, mode, batch_size, report)
+            except Exception:
+                db.rollback()
+                raise
+
+            if processed:
+                logger.info(f"Retention batch {report.batches}: {report.summary()}")
+                if on_batch is not None:
+                    on_batch(report)
+            if processed < batch_size:
+                break
+
+            time.sleep(pause)
+
+        logger.info(report.summary())
+        return report
+
+
+user_retention_service = UserRetentionService()
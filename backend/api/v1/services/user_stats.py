@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from api.db.database import db_session
+from api.utils.logger import logger
+from api.utils.settings import settings
+from api.v1.models.user import User
+from api.v1.schemas.user import UserStatResponse
+
+
+WINDOW_MINUTES = 60
+
+CREATED = "created"
+ACTIVE = "active"
+INACTIVE = "inactive"
+DELETED = "deleted"
+EVENTS = (CREATED, ACTIVE, INACTIVE, DELETED)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite hands back naive datetimes; treat them as UTC"""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class _MinuteBuckets:
+    """Fixed ring of per-minute counters covering the last hour"""
+
+    __slots__ = ("minutes", "counts")
+
+    def __init__(self):
+        self.minutes = [-1] * WINDOW_MINUTES
+        self.counts = [0] * WINDOW_MINUTES
+
+    def add(self, minute: int, amount: int = 1):
+        slot = minute % WINDOW_MINUTES
+        if self.minutes[slot] != minute:
+            self.minutes[slot] = minute
+            self.counts[slot] = 0
+        self.counts[slot] += amount
+
+    def total(self, minute: int) -> int:
+        oldest = minute - WINDOW_MINUTES
+        return sum(
+            count for stamp, count in zip(self.minutes, self.counts)
+            if stamp > oldest
+        )
+
+
+class UserStatsService:
+    """Keeps the admin dashboard user statistics in memory.
+
+    Running totals and per-minute buckets are updated from the `UserService`
+    write paths, so serving `UserStatResponse` never touches the database.
+    "Active"/"inactive"/"deleted" in the last hour count users whose record
+    moved into (or was updated while in) that state within the hour.
+    A periodic reconciliation recomputes everything from the `users` table
+    to correct drift, eg: writes made by other workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total_users = 0
+        self.active_users = 0
+        self.inactive_users = 0
+        self.deleted_users = 0
+        self._buckets = {event: _MinuteBuckets() for event in EVENTS}
+        self.last_reconciled_at: Optional[datetime] = None
+
+    @staticmethod
+    def _minute(at: Optional[float] = None) -> int:
+        return int((at or time.time()) // 60)
+
+    def _bump(self, event: str):
+        self._buckets[event].add(self._minute())
+
+    def on_created(self, user: User):
+        """Record a newly created user"""
+        with self._lock:
+            self.total_users += 1
+            self._bump(CREATED)
+            if user.is_active is False:
+                self.inactive_users += 1
+                self._bump(INACTIVE)
+            else:
+                self.active_users += 1
+                self._bump(ACTIVE)
+
+    def on_updated(self, user: User):
+        """Record a profile update of a live user"""
+        if user.is_deleted:
+            return
+        with self._lock:
+            self._bump(ACTIVE if user.is_active else INACTIVE)
+
+    def on_deleted(self, was_active: bool):
+        """Record a soft delete of a previously live user"""
+        with self._lock:
+            self.deleted_users += 1
+            if was_active:
+                self.active_users -= 1
+            else:
+                self.inactive_users -= 1
+            self._bump(DELETED)
+
+    def on_deactivated(self):
+        """Record an active user being deactivated"""
+        with self._lock:
+            self.active_users -= 1
+            self.inactive_users += 1
+            self._bump(INACTIVE)
+
+    def on_reactivated(self):
+        """Record an inactive user being reactivated"""
+        with self._lock:
+            self.inactive_users -= 1
+            self.active_users += 1
+            self._bump(ACTIVE)
+
+    def get_stats(self) -> UserStatResponse:
+        """Return the current statistics in constant time"""
+        minute = self._minute()
+        with self._lock:
+            return UserStatResponse(
+                total_users=self.total_users,
+                active_users=self.active_users,
+                inactive_users=self.inactive_users,
+                deleted=self.deleted_users,
+                created_in_last_hour=self._buckets[CREATED].total(minute),
+                active_in_last_hour=self._buckets[ACTIVE].total(minute),
+                inactive_in_last_hour=self._buckets[INACTIVE].total(minute),
+                deleted_in_last_hour=self._buckets[DELETED].total(minute),
+            )
+
+    def reconcile(self, db: Session):
+        """Recompute totals and last-hour buckets from the database"""
+
+        live = User.is_deleted.isnot(True)
+        active = User.is_active.isnot(False)
+
+        total, active_count, inactive_count, deleted_count = db.query(
+            func.count(User.id),
+            func.sum(case((live & active, 1), else_=0)),
+            func.sum(case((live & ~active, 1), else_=0)),
+            func.sum(case((~live, 1), else_=0)),
+        ).one()
+
+        since = datetime.now(tz=timezone.utc) - timedelta(minutes=WINDOW_MINUTES)
+        recent = db.query(
+            User.created_at, User.updated_at, User.is_active, User.is_deleted
+        ).filter(
+            (User.created_at >= since) | (User.updated_at >= since)
+        ).all()
+
+        buckets = {event: _MinuteBuckets() for event in EVENTS}
+        for created_at, updated_at, is_active, is_deleted in recent:
+            created_at = created_at and _as_utc(created_at)
+            updated_at = updated_at and _as_utc(updated_at)
+            if created_at and created_at >= since:
+                buckets[CREATED].add(self._minute(created_at.timestamp()))
+            if updated_at and updated_at >= since:
+                if is_deleted:
+                    event = DELETED
+                elif is_active is False:
+                    event = INACTIVE
+                else:
+                    event = ACTIVE
+                buckets[event].add(self._minute(updated_at.timestamp()))
+
+        with self._lock:
+            self.total_users = total or 0
+            self.active_users = active_count or 0
+            self.inactive_users = inactive_count or 0
+            self.deleted_users = deleted_count or 0
+            self._buckets = buckets
+            self.last_reconciled_at = datetime.now(tz=timezone.utc)
+
+    def _run_reconcile(self):
+        db = db_session()
+        try:
+            self.reconcile(db)
+        finally:
+            db.close()
+
+    async def run_reconciler(self, interval: Optional[int] = None):
+        """Reconcile on startup and then every `interval` seconds until cancelled"""
+
+        interval = interval or settings.USER_STATS_RECONCILE_INTERVAL
+
+        while True:
+            try:
+                await run_in_threadpool(self._run_reconcile)
+            except Exception as exc:
+                logger.exception(f"User stats reconciliation failed; {exc}")
+
+            await asyncio.sleep(interval)
+
+
+user_stats_service = UserStatsService()
@@ -1,10 +1,17 @@
+import asyncio
 from datetime import datetime, timezone, timedelta
 from typing import Any, Optional, Union
+from sqlalchemy import select, update, func, or_
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from api.db.database import db_session
+from api.utils.logger import logger
+from api.utils.settings import settings
 from api.v1.services.user import user_service
 from api.utils.pagination import get_pagination_details
-from api.v1.models.user_subscription import UserSubscription
+from api.v1.models.user import User
+from api.v1.models.user_subscription import UserSubscription, utcnow
 from api.v1.schemas.user_subscription import CreateUserSubSchema
 from api.utils.db_validators import check_model_existence, get_model_by_params
 
@@ -12,9 +19,13 @@ from api.utils.db_validators import check_model_existence, get_model_by_params
 class UserSubscriptionService:
     """UserSubscription service functionality"""
 
-    def create(self, db: Session, schema: CreateUserSubSchema):
+    def create(self, db: Session, schema: CreateUserSubSchema, commit: bool = True):
         """
-        Create and return a new user subscription
+        Create and return a new user subscription.
+
+        The new subscription becomes the user's current subscription and any
+        previously current one is expired, all in the same transaction. Pass
+        `commit=False` to leave committing to the caller.
         """
         if isinstance(schema, dict):
             user_sub = UserSubscription(**schema)
@@ -22,11 +33,207 @@ class UserSubscriptionService:
             user_sub = UserSubscription(**schema.dict())
 
         db.add(user_sub)
-        db.commit()
-        db.refresh(user_sub)
+        db.flush()
+        self._set_current_subscription(db, user_sub)
+
+        if commit:
+            db.commit()
+            db.refresh(user_sub)
+
+        # The new plan's access limit applies from now on (imported here as
+        # the usage metering service depends on this one)
+        from api.v1.services.usage_metering import usage_metering_service
+        usage_metering_service.invalidate_limit(user_sub.user_id)
+
+        return user_sub
+
+    def fetch_current(self, db: Session, user: User) -> Optional[UserSubscription]:
+        """Fetch the subscription currently in force for `user` by primary key.
+
+        Users subscribed before the pointer existed have none until
+        `backfill_current_subscriptions` runs; their latest active
+        subscription is looked up instead.
+        """
+        if user.current_subscription_id is None:
+            return self.fetch_latest_active(db, user.id)
+
+        user_sub = db.get(UserSubscription, user.current_subscription_id)
+        if user_sub is None or not user_sub.is_active():
+            return None
 
         return user_sub
 
+    @staticmethod
+    def _active_filter(now: datetime):
+        return (
+            UserSubscription.is_expired.is_(False),
+            UserSubscription.start_date <= now,
+            or_(UserSubscription.end_date.is_(None), UserSubscription.end_date > now),
+        )
+
+    def fetch_latest_active(self, db: Session, user_id: str) -> Optional[UserSubscription]:
+        """Fetch the most recently started active subscription of a user"""
+
+        return db.query(UserSubscription).filter(
+            UserSubscription.user_id == user_id,
+            *self._active_filter(utcnow()),
+        ).order_by(UserSubscription.start_date.desc()).first()
+
+    def backfill_current_subscriptions(self, db: Session, batch_size: Optional[int] = None) -> int:
+        """Point users without a current subscription at their latest active
+        one, in batches of `batch_size` users, committing after each.
+
+        Returns:
+            The number of users updated.
+        """
+        batch_size = batch_size or settings.SUBSCRIPTION_SWEEP_BATCH_SIZE
+        now = utcnow()
+        after = ""
+        total = 0
+
+        while True:
+            user_ids = db.execute(
+                select(User.id)
+                .where(User.current_subscription_id.is_(None), User.id > after)
+                .order_by(User.id)
+                .limit(batch_size)
+            ).scalars().all()
+
+            if not user_ids:
+                break
+
+            rows = db.execute(
+                select(UserSubscription.user_id, UserSubscription.id)
+                .where(UserSubscription.user_id.in_(user_ids), *self._active_filter(now))
+                .order_by(UserSubscription.user_id, UserSubscription.start_date.desc())
+            ).all()
+
+            current = {}
+            for user_id, user_sub_id in rows:
+                current.setdefault(user_id, user_sub_id)
+
+            if current:
+                db.execute(
+                    update(User),
+                    [{"id": user_id, "current_subscription_id": user_sub_id}
+                     for user_id, user_sub_id in current.items()],
+                )
+            db.commit()
+
+            total += len(current)
+            after = user_ids[-1]
+            if len(user_ids) < batch_size:
+                break
+
+        return total
+
+    def count_active_subscribers(self, db: Session, billing_plan_id: Optional[str] = None) -> int:
+        """Count users with a live subscription, optionally on a single plan"""
+
+        query = db.query(func.count(User.id)).filter(
+            User.current_subscription_id.isnot(None),
+            User.is_deleted.is_(False),
+        )
+        if billing_plan_id is not None:
+            query = query.join(
+                UserSubscription, UserSubscription.id == User.current_subscription_id
+            ).filter(UserSubscription.billing_plan_id == billing_plan_id)
+
+        return query.scalar()
+
+    @staticmethod
+    def _set_current_subscription(db: Session, user_sub: UserSubscription):
+        """Point the owning user at `user_sub` and expire the one it replaces.
+        Caller is responsible for committing."""
+
+        user = db.get(User, user_sub.user_id, with_for_update=True)
+        if user is None:
+            return
+
+        previous_id = user.current_subscription_id
+        if previous_id is not None and previous_id != user_sub.id:
+            db.execute(
+                update(UserSubscription)
+                .where(UserSubscription.id == previous_id)
+                .values(is_expired=True)
+            )
+
+        user.current_subscription_id = user_sub.id
+
+    def expire_ended_subscriptions(self, db: Session, batch_size: Optional[int] = None) -> int:
+        """Expire subscriptions whose `end_date` has passed.
+
+        Works in batches of `batch_size`, locking rows with `SKIP LOCKED` so
+        several workers can sweep concurrently, and clears the current
+        subscription pointer of affected users in the same transaction.
+
+        Returns:
+            The total number of subscriptions expired.
+        """
+        batch_size = batch_size or settings.SUBSCRIPTION_SWEEP_BATCH_SIZE
+        now = utcnow()
+        total = 0
+
+        while True:
+            ids = db.execute(
+                select(UserSubscription.id)
+                .where(
+                    UserSubscription.is_expired.is_(False),
+                    UserSubscription.end_date <= now,
+                )
+                .order_by(UserSubscription.end_date)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+
+            if not ids:
+                break
+
+            db.execute(
+                update(UserSubscription)
+                .where(UserSubscription.id.in_(ids))
+                .values(is_expired=True)
+                .execution_options(synchronize_session=False)
+            )
+            db.execute(
+                update(User)
+                .where(User.current_subscription_id.in_(ids))
+                .values(current_subscription_id=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+            total += len(ids)
+            if len(ids) < batch_size:
+                break
+
+        return total
+
+    async def run_expiry_sweeper(self, interval: Optional[int] = None):
+        """Periodically expire ended subscriptions until cancelled"""
+
+        interval = interval or settings.SUBSCRIPTION_SWEEP_INTERVAL
+
+        def sweep():
+            db = db_session()
+            try:
+                return self.expire_ended_subscriptions(db)
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+        while True:
+            try:
+                expired = await run_in_threadpool(sweep)
+                if expired:
+                    logger.info(f"Expired {expired} user subscription(s)")
+            except Exception as exc:
+                logger.exception(f"Subscription expiry sweep failed; {exc}")
+
+            await asyncio.sleep(interval)
+
     def fetch(self, db: Session, user_sub_id: str):
         """Fetch a single user subscription by id"""
         return check_model_existence(db, UserSubscription, user_sub_id) 
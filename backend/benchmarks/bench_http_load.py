@@ -0,0 +1,353 @@
+"""Load test the auth and user endpoints end to end.
+
+Drives the real app in process through httpx's `ASGITransport` (the app's
+lifespan, middleware and threadpool included) against a fresh SQLite
+database, or a Postgres database given with `--database-url`. With
+`--base-url` it drives an already running server instead, which then uses
+its own database settings.
+
+Scenarios: register, login, refresh-access-token, magic link request and
+verify, `GET /users/{id}` and `PATCH /users`. Each runs `--requests`
+requests from `--concurrency` concurrent clients after `--warmup`
+sequential ones, and reports throughput and p50/p95/p99 latency. In
+process, client overhead shares the event loop with the app and is part of
+the latency; the numbers are for comparing builds, not for capacity
+planning.
+
+The accounts use `example.com` addresses, whose null MX fails the
+deliverability check: the in-process app allow-lists it, a server given
+with `--base-url` needs `EMAIL_DOMAIN_ALLOWLIST=example.com`.
+
+usage:
+
+    python -m benchmarks.bench_http_load --requests 200 --concurrency 10
+    python -m benchmarks.bench_http_load --database-url postgresql://u:p@localhost/bench --reset-database
+    uvicorn main:app --port 7001 --workers 4 &
+    python -m benchmarks.bench_http_load --base-url http://127.0.0.1:7001
+
+    # Compare with the committed baseline (exit status 1 on a regression,
+    # 2 if the runs' target, database, requests or concurrency differ)
+    python -m benchmarks.bench_http_load --baseline benchmarks/baselines/http_load.json
+    python -m benchmarks.bench_http_load --output run.json
+    python -m benchmarks.bench_http_load --compare run.json --baseline benchmarks/baselines/http_load.json
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from benchmarks import results
+
+
+API = "/api/v1"
+EMAIL_DOMAIN = "example.com"
+PASSWORD = "bench-password"
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "http_load.json")
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms")
+# Run settings that must match for two results to be compared
+COMPARABLE_SETTINGS = ("target", "database", "requests", "concurrency")
+HIGHER_IS_BETTER = ("requests_per_sec",)
+
+
+@dataclass
+class Account:
+    email: str
+    id: str = ""
+    access_token: str = ""
+    refresh_token: str = ""
+    magic_token: str = ""
+
+
+@dataclass
+class State:
+    run_id: str
+    accounts: List[Account] = field(default_factory=list)
+
+    def account(self, i: int) -> Account:
+        return self.accounts[i % len(self.accounts)]
+
+
+def bearer(account: Account) -> dict:
+    return {"Authorization": f"Bearer {account.access_token}"}
+
+
+async def register(client: httpx.AsyncClient, state: State, i: int) -> httpx.Response:
+    return await client.post(f"{API}/auth/register", json={
+        "email": f"bench-{state.run_id}-{i}@{EMAIL_DOMAIN}",
+        "password": PASSWORD,
+        "first_name": "Bench",
+        "last_name": "User",
+    })
+
+
+async def login(client, state, i):
+    return await client.post(f"{API}/auth/login", json={
+        "email": state.account(i).email, "password": PASSWORD,
+    })
+
+
+async def refresh_access_token(client, state, i):
+    # The cookie is `secure`, so it is sent by hand over plain http
+    return await client.post(
+        f"{API}/auth/refresh-access-token",
+        headers={"Cookie": f"refresh_token={state.account(i).refresh_token}"},
+    )
+
+
+async def magic_link_request(client, state, i):
+    return await client.post(f"{API}/auth/magic-link", json={"user_email": state.account(i).email})
+
+
+async def magic_link_verify(client, state, i):
+    return await client.get(f"{API}/auth/magic-link/verify", params={"token": state.account(i).magic_token})
+
+
+async def get_user(client, state, i):
+    account = state.account(i)
+    return await client.get(f"{API}/users/{account.id}", headers=bearer(account))
+
+
+async def update_user(client, state, i):
+    account = state.account(i)
+    return await client.patch(f"{API}/users", json={"first_name": f"Bench{i % 1000}"}, headers=bearer(account))
+
+
+@dataclass
+class Scenario:
+    name: str
+    call: Callable[[httpx.AsyncClient, State, int], Awaitable[httpx.Response]]
+    expected_status: int = 200
+
+
+SCENARIOS = [
+    Scenario("register", register, 201),
+    Scenario("login", login),
+    Scenario("refresh_access_token", refresh_access_token),
+    Scenario("magic_link_request", magic_link_request),
+    Scenario("magic_link_verify", magic_link_verify),
+    Scenario("get_user", get_user),
+    Scenario("update_user", update_user),
+]
+
+
+async def seed_accounts(client: httpx.AsyncClient, state: State, count: int, concurrency: int):
+    """Register the accounts the other scenarios log in as"""
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(i: int) -> Account:
+        async with semaphore:
+            response = await register(client, state, -1 - i)
+            response.raise_for_status()
+            body = response.json()
+            account = Account(
+                email=body["data"]["user"]["email"],
+                id=body["data"]["user"]["id"],
+                access_token=body["access_token"],
+                refresh_token=body["refresh_token"],
+            )
+
+            response = await client.post(f"{API}/auth/magic-link", json={"user_email": account.email})
+            response.raise_for_status()
+            link = response.json()["data"]["magic-link"]
+            account.magic_token = parse_qs(urlparse(link).query)["token"][0]
+            return account
+
+    state.accounts = list(await asyncio.gather(*(create(i) for i in range(count))))
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    state: State,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+) -> dict:
+    for i in range(warmup):
+        await scenario.call(client, state, i)
+
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count(warmup)
+    last = warmup + requests
+
+    async def worker():
+        nonlocal errors
+        while (i := next(counter)) < last:
+            started = time.perf_counter()
+            try:
+                response = await scenario.call(client, state, i)
+                ok = response.status_code == scenario.expected_status
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_sec": round(requests / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(results.percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(results.percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(results.percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+def bind_database(url: str, reset: bool):
+    """Point the app's sessions at the benchmark database and create the
+    schema. Must run before `main` is imported.
+
+    The new engine gets the same SQL timing hooks as the app's own, so the
+    `db` span of Server-Timing still covers the benchmark's queries."""
+
+    from sqlalchemy import JSON, create_engine, event
+
+    import api.db.database as database
+    import api.v1.models  # noqa: F401 - registers every table
+    from api.utils.timing import instrument_engine
+    from api.v1.models.billing_plan import BillingPlan
+
+    if url.startswith("sqlite"):
+        engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+        # billing_plans.features is a Postgres ARRAY; store it as JSON here
+        BillingPlan.__table__.c.features.type = JSON()
+
+        # WAL, so open read transactions do not block writers
+        @event.listens_for(engine, "connect")
+        def _connect(dbapi_connection, _record):
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+    else:
+        engine = create_engine(url, pool_size=20, max_overflow=10)
+
+    instrument_engine(engine)
+    database.engine = engine
+    database.SessionLocal.configure(bind=engine)
+
+    if reset:
+        database.Base.metadata.drop_all(engine)
+    database.Base.metadata.create_all(engine)
+
+
+async def run(args) -> Dict[str, dict]:
+    state = State(run_id=uuid.uuid4().hex[:8])
+    scenarios = [s for s in SCENARIOS if not args.scenarios or s.name in args.scenarios]
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+        lifespan = None
+    else:
+        from main import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+
+    report = {}
+    try:
+        async with client:
+            print(f"seeding {args.users} accounts...", flush=True)
+            await seed_accounts(client, state, args.users, args.concurrency)
+
+            print(f"\n{'scenario':<22} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+            for scenario in scenarios:
+                result = await run_scenario(
+                    client, scenario, state, args.requests, args.concurrency, args.warmup
+                )
+                report[scenario.name] = result
+                print(
+                    f"{scenario.name:<22} {result['requests_per_sec']:>9.1f} {result['p50_ms']:>9.2f} "
+                    f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}",
+                    flush=True,
+                )
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--users", type=int, default=50, help="Accounts to seed for the scenarios")
+    parser.add_argument("--scenarios", nargs="*", choices=[s.name for s in SCENARIOS])
+    parser.add_argument("--database-url", default=None, help="Defaults to a fresh SQLite file")
+    parser.add_argument("--reset-database", action="store_true", help="Drop and recreate all tables first")
+    parser.add_argument("--base-url", default=None, help="Benchmark a running server instead")
+    parser.add_argument("--output", default=None, help="Write the results as JSON")
+    parser.add_argument("--baseline", default=None, help="Compare with this results file")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write the results to {BASELINE}")
+    parser.add_argument("--compare", metavar="RESULTS", default=None, help="Compare a saved run; do not run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative change (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.compare:
+        current = results.load(args.compare)
+    else:
+        if not args.base_url:
+            # Read with the settings on first import
+            allowlist = os.environ.get("EMAIL_DOMAIN_ALLOWLIST", "")
+            os.environ["EMAIL_DOMAIN_ALLOWLIST"] = f"{allowlist},{EMAIL_DOMAIN}".lstrip(",")
+            url = args.database_url
+            if url is None:
+                url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-http-'), 'bench.db')}"
+            bind_database(url, reset=args.reset_database)
+
+        report = asyncio.run(run(args))
+        meta = {
+            "target": args.base_url or "in-process",
+            "database": "server" if args.base_url else (args.database_url or "sqlite").split(":")[0],
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        }
+        for path in filter(None, (args.output, BASELINE if args.save_baseline else None)):
+            results.save(path, "http_load", report, **meta)
+            print(f"\nresults written to {path}")
+        current = {**meta, "results": report}
+
+        failed = {name: result["errors"] for name, result in report.items() if result["errors"]}
+        if failed:
+            print(f"\nrequests failed: {failed}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.baseline:
+        baseline = results.load(args.baseline)
+        mismatched = results.mismatched_settings(current, baseline, COMPARABLE_SETTINGS)
+        if mismatched:
+            print("\nresults were measured differently, not comparing:", file=sys.stderr)
+            for line in mismatched:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(2)
+
+        rows = results.compare(
+            current, baseline, args.threshold,
+            lower_is_better=LOWER_IS_BETTER, higher_is_better=HIGHER_IS_BETTER,
+        )
+        if results.print_comparison(rows, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare JSON rendering throughput of list responses.
+
+Renders a paginated list of user-like records with the stock
+`JSONResponse(content=jsonable_encoder(...))` path and with
+`FastJSONResponse`, and reports bytes/sec for each.
+
+usage:
+
+    python -m benchmarks.bench_json_response --items 100 --repeat 200
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api.utils.json_response import FastJSONResponse
+
+
+def build_payload(num_items: int) -> dict:
+    now = datetime.now(tz=timezone.utc)
+    items = [
+        {
+            "id": str(uuid.uuid4()),
+            "email": f"user{i}@example.com",
+            "first_name": "Ada",
+            "last_name": "Lovelace",
+            "avatar_url": None,
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+            "subscription": {
+                "billing_plan_id": "premium_monthly",
+                "price": Decimal("4.99"),
+                "start_date": now,
+                "end_date": None,
+            },
+        }
+        for i in range(num_items)
+    ]
+    return {
+        "status_code": 200,
+        "success": True,
+        "message": "Successfully fetched items",
+        "data": {"pages": 1, "total": num_items, "skip": 0, "limit": num_items, "items": items},
+    }
+
+
+def render_stock(payload: dict) -> bytes:
+    return JSONResponse(content=jsonable_encoder(payload)).body
+
+
+def render_fast(payload: dict) -> bytes:
+    return FastJSONResponse(content=payload).body
+
+
+def measure(render, payload: dict, repeat: int):
+    render(payload)  # warm up
+    total_bytes = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        total_bytes += len(render(payload))
+    elapsed = time.perf_counter() - started
+    return total_bytes / elapsed, elapsed / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'items':>6} {'renderer':>10} {'MB/s':>10} {'ms/resp':>10}")
+    for num_items in args.items:
+        payload = build_payload(num_items)
+        for name, render in (("stock", render_stock), ("orjson", render_fast)):
+            bytes_per_sec, per_response = measure(render, payload, args.repeat)
+            print(
+                f"{num_items:>6} {name:>10} {bytes_per_sec / 1e6:>10.2f} "
+                f"{per_response * 1e3:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Micro-benchmark the helpers every request goes through.
+
+Covers JWT creation and verification, bcrypt hashing and verification,
+the itsdangerous reset/magic link tokens, `jsonable_encoder` on a `User`,
+`BaseTableModel.to_dict`, `paginated_response` (on an in-memory SQLite
+table) and `get_sub_start_and_end_datetime`.
+
+Each benchmark is calibrated so one timed run lasts at least `--min-time`
+seconds, warmed up, then timed `--repeat` times with the garbage collector
+off. Runs outside 1.5 IQR of the quartiles are dropped as outliers (a
+scheduler hiccup, a GC from setup) before the statistics are computed.
+
+usage:
+
+    python -m benchmarks.bench_micro run --output before.json
+    python -m benchmarks.bench_micro run --filter jwt bcrypt --repeat 30
+    # ... change something ...
+    python -m benchmarks.bench_micro run --output after.json
+    python -m benchmarks.bench_micro compare before.json after.json --threshold 0.05
+"""
+import argparse
+import gc
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import results
+
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[[], object]
+
+
+def _user(i: int = 0):
+    from api.v1.models.user import User
+
+    now = datetime.now(tz=timezone.utc)
+    return User(
+        id=f"{i:032x}",
+        email=f"user{i}@example.com",
+        password="$2b$12$" + "x" * 53,
+        first_name="Ada",
+        last_name="Lovelace",
+        is_active=True,
+        is_deleted=False,
+        is_verified=True,
+        is_superadmin=False,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def _paginated_session(rows: int):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from api.v1.models.user import User
+
+    engine = create_engine("sqlite://")
+    User.__table__.create(engine)
+    session = Session(engine)
+    session.add_all(_user(i) for i in range(rows))
+    session.commit()
+    session.expunge_all()
+    return session
+
+
+def build_benchmarks(page_size: int) -> List[Benchmark]:
+    from fastapi import HTTPException
+    from fastapi.encoders import jsonable_encoder
+
+    from api.utils.pagination import paginated_response
+    from api.v1.models.user import User
+    from api.v1.services import request_pwd
+    from api.v1.services.user import user_service
+    from api.v1.services.user_subscription import user_subscription_service
+
+    credentials_exception = HTTPException(status_code=401)
+    access_token = user_service.create_access_token(user_id="0" * 32)
+    password_hash = user_service.hash_password("correct horse")
+    reset_token = request_pwd.create_token("user@example.com")
+    user = _user()
+    session = _paginated_session(rows=page_size * 4)
+
+    def paginate():
+        response = paginated_response(db=session, model=User, skip=page_size, limit=page_size)
+        session.expunge_all()
+        return response
+
+    return [
+        Benchmark("jwt.create_access_token", lambda: user_service.create_access_token(user_id="0" * 32)),
+        Benchmark(
+            "jwt.verify_access_token",
+            lambda: user_service.verify_access_token(access_token, credentials_exception),
+        ),
+        Benchmark("bcrypt.hash_password", lambda: user_service.hash_password("correct horse")),
+        Benchmark("bcrypt.verify_password", lambda: user_service.verify_password("correct horse", password_hash)),
+        Benchmark("reset_token.create_token", lambda: request_pwd.create_token("user@example.com")),
+        Benchmark("reset_token.verify_token", lambda: request_pwd.verify_token(reset_token)),
+        Benchmark("encode.jsonable_encoder_user", lambda: jsonable_encoder(user)),
+        Benchmark("encode.to_dict_user", user.to_dict),
+        Benchmark("db.paginated_response", paginate),
+        Benchmark(
+            "subscription.get_sub_start_and_end_datetime",
+            lambda: user_subscription_service.get_sub_start_and_end_datetime("monthly"),
+        ),
+    ]
+
+
+def _time_loop(func: Callable[[], object], number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - started
+
+
+def calibrate(func: Callable[[], object], min_time: float) -> int:
+    """Calls per timed run so a run lasts at least `min_time` seconds"""
+
+    number = 1
+    while True:
+        elapsed = _time_loop(func, number)
+        if elapsed >= min_time:
+            return number
+        # Aim a little past min_time instead of doubling blindly
+        number = max(number * 2, int(number * min_time * 1.2 / max(elapsed, 1e-9)))
+
+
+def reject_outliers(samples: List[float]) -> List[float]:
+    """Drop samples outside 1.5 IQR of the quartiles"""
+
+    if len(samples) < 4:
+        return samples
+    q1, _median, q3 = statistics.quantiles(samples, n=4)
+    spread = 1.5 * (q3 - q1)
+    return [sample for sample in samples if q1 - spread <= sample <= q3 + spread]
+
+
+def measure(benchmark: Benchmark, repeat: int, warmup: int, min_time: float) -> dict:
+    number = calibrate(benchmark.func, min_time)
+    for _ in range(warmup):
+        _time_loop(benchmark.func, number)
+
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        samples = [_time_loop(benchmark.func, number) / number for _ in range(repeat)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    kept = reject_outliers(samples)
+    median = statistics.median(kept)
+    return {
+        "calls_per_run": number,
+        "runs": repeat,
+        "outliers": repeat - len(kept),
+        "median_us": round(median * 1e6, 4),
+        "mean_us": round(statistics.fmean(kept) * 1e6, 4),
+        "stdev_us": round(statistics.stdev(kept) * 1e6, 4) if len(kept) > 1 else 0.0,
+        "min_us": round(min(kept) * 1e6, 4),
+        "max_us": round(max(kept) * 1e6, 4),
+        "ops_per_sec": round(1 / median, 2) if median else 0.0,
+    }
+
+
+def run(args) -> Dict[str, dict]:
+    benchmarks = [
+        benchmark for benchmark in build_benchmarks(args.page_size)
+        if not args.filter or any(pattern in benchmark.name for pattern in args.filter)
+    ]
+
+    print(f"{'benchmark':<46} {'median':>12} {'stdev':>10} {'ops/s':>12} {'outliers':>9}")
+    report = {}
+    for benchmark in benchmarks:
+        result = measure(benchmark, args.repeat, args.warmup, args.min_time)
+        report[benchmark.name] = result
+        print(
+            f"{benchmark.name:<46} {_format_us(result['median_us']):>12} "
+            f"{_format_us(result['stdev_us']):>10} {result['ops_per_sec']:>12.1f} "
+            f"{result['outliers']:>5}/{result['runs']}",
+            flush=True,
+        )
+    return report
+
+
+def _format_us(value: float) -> str:
+    if value >= 1000:
+        return f"{value / 1000:.2f} ms"
+    return f"{value:.2f} us"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--filter", nargs="*", help="Only benchmarks whose name contains one of these")
+    run_parser.add_argument("--repeat", type=int, default=20, help="Timed runs per benchmark")
+    run_parser.add_argument("--warmup", type=int, default=3, help="Untimed runs per benchmark")
+    run_parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per timed run")
+    run_parser.add_argument("--page-size", type=int, default=50, help="Rows per page for paginated_response")
+    run_parser.add_argument("--output", default=None, help="Write the results as JSON")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Allowed slowdown (0.1 = 10%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run(args)
+        if args.output:
+            results.save(args.output, "micro", report, repeat=args.repeat, min_time=args.min_time)
+            print(f"\nresults written to {args.output}")
+        return
+
+    rows = results.compare(
+        results.load(args.after), results.load(args.before), args.threshold,
+        lower_is_better=("median_us",),
+    )
+    if results.print_comparison(rows, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
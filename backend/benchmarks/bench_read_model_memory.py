@@ -0,0 +1,83 @@
+"""Measure memory held per cached user: ORM instance vs `UserRecord`.
+
+Loads the same rows from an in-memory SQLite database once as `User` ORM
+instances (kept alive by the session identity map, as a naive cache would)
+and once as `UserRecord` read models, and reports bytes per user from
+`tracemalloc`.
+
+usage:
+
+    python -m benchmarks.bench_read_model_memory --users 20000
+"""
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from api.v1.models.read_models import UserRecord
+from api.v1.models.user import User
+
+
+def seed(engine, num_users: int):
+    User.__table__.create(engine)
+    now = datetime.now(tz=timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "id": f"{i:032x}",
+                "email": f"user{i}@example.com",
+                "password": "$2b$12$" + "x" * 53,
+                "first_name": "Ada",
+                "last_name": "Lovelace",
+                "is_active": True,
+                "is_deleted": False,
+                "is_verified": True,
+                "is_superadmin": False,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(num_users)
+        ])
+
+
+def measure(load) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = load()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    seed(engine, args.users)
+
+    def load_orm():
+        session = Session(engine)
+        return session, session.query(User).all()
+
+    def load_records():
+        with Session(engine) as session:
+            return UserRecord.fetch_all(session)
+
+    orm_bytes = measure(load_orm) / args.users
+    record_bytes = measure(load_records) / args.users
+
+    print(f"ORM User:   {orm_bytes:>8.0f} bytes/user")
+    print(f"UserRecord: {record_bytes:>8.0f} bytes/user")
+    print(f"ratio:      {orm_bytes / record_bytes:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Measure email throughput with and without the SMTP connection pool.
+
+Starts a local `aiosmtpd` sink (a benchmark-only dependency, see
+`benchmarks/requirements.txt`) and sends the same messages once by opening a
+new SMTP session per message, as `send_email` used to, and once through
+`SMTPConnectionPool`. Reports messages/sec for each.
+
+usage:
+
+    python -m benchmarks.bench_smtp_pool --messages 500 --concurrency 4
+"""
+import argparse
+import asyncio
+import time
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+from aiosmtpd.handlers import Sink
+
+from api.core.dependencies.email.email_sender import build_message
+from api.core.dependencies.email.smtp_pool import SMTPConnectionPool
+
+
+HOST = "127.0.0.1"
+HTML = "<html><body><h1>Welcome</h1><p>" + "Hello there. " * 50 + "</p></body></html>"
+
+
+async def send_unpooled(port: int, messages: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i):
+        async with semaphore:
+            await aiosmtplib.send(
+                build_message(f"user{i}@example.com", "Welcome", HTML),
+                hostname=HOST, port=port, use_tls=False, start_tls=False,
+            )
+
+    await asyncio.gather(*(send(i) for i in range(messages)))
+
+
+async def send_pooled(port: int, messages: int, concurrency: int):
+    pool = SMTPConnectionPool(
+        hostname=HOST, port=port, use_tls=False, start_tls=False,
+        max_size=concurrency, max_messages_per_connection=messages,
+    )
+    await asyncio.gather(*(
+        pool.send_message(build_message(f"user{i}@example.com", "Welcome", HTML))
+        for i in range(messages)
+    ))
+    await pool.close()
+    return pool.connections_opened
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    controller = Controller(Sink(), hostname=HOST, port=args.port)
+    controller.start()
+    try:
+        started = time.perf_counter()
+        await send_unpooled(args.port, args.messages, args.concurrency)
+        unpooled = args.messages / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        opened = await send_pooled(args.port, args.messages, args.concurrency)
+        pooled = args.messages / (time.perf_counter() - started)
+    finally:
+        controller.stop()
+
+    print(f"per-message sessions: {unpooled:>8.1f} msg/s ({args.messages} sessions)")
+    print(f"pooled sessions:      {pooled:>8.1f} msg/s ({opened} sessions)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
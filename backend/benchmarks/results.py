@@ -0,0 +1,130 @@
+"""Shared helpers for benchmark results: summary statistics, JSON files and
+baseline comparison.
+
+Result files look like:
+
+    {
+        "benchmark": "http_load",
+        "environment": {"python": "3.11.7", "git_commit": "...", ...},
+        "results": {"<case>": {"p50_ms": 1.2, "ops_per_sec": 830.0, ...}}
+    }
+
+`compare()` checks every case present in both files; metrics listed in
+`lower_is_better` regress when they grow by more than the threshold, the
+ones in `higher_is_better` when they shrink by more than it. Results are
+only comparable when measured the same way: `mismatched_settings()` lists
+the run settings (eg: concurrency) that differ between two files.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Sequence
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def environment() -> dict:
+    """Where a result was measured, so comparisons can be judged"""
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+        "measured_at": datetime.now(tz=timezone.utc).isoformat(),
+    }
+
+
+def save(path: str, benchmark: str, results: Dict[str, dict], **meta):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(
+            {"benchmark": benchmark, "environment": environment(), **meta, "results": results},
+            file, indent=2, sort_keys=True,
+        )
+        file.write("\n")
+
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def mismatched_settings(current: dict, baseline: dict, keys: Iterable[str]) -> List[str]:
+    """The run settings among `keys` that differ between two result files"""
+
+    return [
+        f"{key}: baseline {baseline.get(key)!r}, current {current.get(key)!r}"
+        for key in keys
+        if current.get(key) != baseline.get(key)
+    ]
+
+
+def compare(
+    current: dict,
+    baseline: dict,
+    threshold: float,
+    lower_is_better: Iterable[str] = (),
+    higher_is_better: Iterable[str] = (),
+) -> List[dict]:
+    """Per case and metric changes from `baseline` to `current`"""
+
+    rows = []
+    for case, base in baseline["results"].items():
+        now = current["results"].get(case)
+        if now is None:
+            continue
+        for metric, worse_when_higher in (
+            *((metric, True) for metric in lower_is_better),
+            *((metric, False) for metric in higher_is_better),
+        ):
+            if metric not in base or metric not in now or not base[metric]:
+                continue
+            change = (now[metric] - base[metric]) / base[metric]
+            rows.append({
+                "case": case,
+                "metric": metric,
+                "baseline": base[metric],
+                "current": now[metric],
+                "change": change,
+                "regression": change > threshold if worse_when_higher else change < -threshold,
+            })
+    return rows
+
+
+def print_comparison(rows: List[dict], threshold: float) -> bool:
+    """Print a comparison table; returns True when something regressed"""
+
+    print(f"\n{'case':<28} {'metric':<14} {'baseline':>12} {'current':>12} {'change':>9}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['case']:<28} {row['metric']:<14} {row['baseline']:>12.3f} "
+            f"{row['current']:>12.3f} {row['change']:>+8.1%}{flag}"
+        )
+
+    regressed = [row for row in rows if row["regression"]]
+    if regressed:
+        print(f"\n{len(regressed)} metric(s) regressed by more than {threshold:.0%}", file=sys.stderr)
+    else:
+        print(f"\nno regressions beyond {threshold:.0%}")
+    return bool(regressed)
@@ -1,27 +1,65 @@
+import asyncio
 import uvicorn, os
-from api.utils.json_response import JsonResponseDict
+from api.utils.json_response import JsonResponseDict, FastJSONResponse, error_response
 from api.utils.logger import logger
 from api.v1.routes import api_version_one
 from api.utils.settings import settings
 from sqlalchemy.exc import IntegrityError
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, status, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, status, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from starlette.requests import Request
 from starlette.middleware.sessions import SessionMiddleware
 from scripts.presets import  load_billing_plans_in_db
+from api.core.dependencies.admin import require_metrics_token
+from api.core.middleware.compression import CompressionMiddleware
+from api.core.middleware.server_timing import ServerTimingMiddleware
+from api.core.middleware.metrics import MetricsMiddleware
+from api.core.middleware.request_id import RequestIdMiddleware
+from api.core.middleware.profiling import ProfilingMiddleware
+from api.core.middleware.memory import MemoryMiddleware
+from api.utils.profiler import profile_store
+from api.utils.memory import memory_tracer
+from api.utils.loop_watchdog import loop_watchdog
+from api.utils.metrics import metrics_sampler, render_metrics, mark_process_dead
+from api.core.dependencies.email.smtp_pool import smtp_pool
+from api.core.dependencies.email.template_registry import email_template_registry
+from starlette.concurrency import run_in_threadpool
+from api.v1.services.user_subscription import user_subscription_service
+from api.v1.services.usage_metering import usage_metering_service
+from api.v1.services.user_stats import user_stats_service
+from api.v1.services.tool_activity import tool_activity_service
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     load_billing_plans_in_db()
+    await run_in_threadpool(email_template_registry.load)
+    background_jobs = [
+        asyncio.create_task(user_subscription_service.run_expiry_sweeper()),
+        asyncio.create_task(usage_metering_service.run_flusher()),
+        asyncio.create_task(user_stats_service.run_reconciler()),
+        asyncio.create_task(tool_activity_service.run_flusher()),
+        asyncio.create_task(smtp_pool.run_reaper()),
+    ]
+    if settings.LOOP_WATCHDOG_ENABLED:
+        background_jobs.append(asyncio.create_task(loop_watchdog.run()))
+    if settings.METRICS_ENABLED and settings.METRICS_TOKEN:
+        background_jobs.append(
+            asyncio.create_task(metrics_sampler.run(settings.METRICS_SAMPLE_INTERVAL))
+        )
     yield
+    for job in background_jobs:
+        job.cancel()
+    await asyncio.gather(*background_jobs, return_exceptions=True)
+    await smtp_pool.close()
+    mark_process_dead()
 
 
 app = FastAPI(
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     title="PulsePoint API",
     description="PulsePoint API",
     version="1.0.0",)
@@ -32,6 +70,13 @@ origins = [
 ]
 
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    threadpool_min_size=settings.COMPRESSION_THREADPOOL_MIN_SIZE,
+)
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
 app.add_middleware(
     CORSMiddleware,
@@ -40,6 +85,25 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.METRICS_ENABLED and settings.METRICS_TOKEN:
+    app.add_middleware(MetricsMiddleware)
+if settings.SERVER_TIMING_ENABLED and (settings.ADMIN_TOKEN or settings.SERVER_TIMING_LOG):
+    app.add_middleware(
+        ServerTimingMiddleware,
+        admin_token=settings.ADMIN_TOKEN,
+        sample_rate=settings.SERVER_TIMING_SAMPLE_RATE,
+        log=settings.SERVER_TIMING_LOG,
+    )
+if settings.PROFILER_ENABLED and settings.ADMIN_TOKEN:
+    app.add_middleware(
+        ProfilingMiddleware,
+        admin_token=settings.ADMIN_TOKEN,
+        store=profile_store,
+        interval=settings.PROFILER_INTERVAL,
+    )
+if settings.MEMORY_DIAGNOSTICS_ENABLED and settings.ADMIN_TOKEN:
+    app.add_middleware(MemoryMiddleware, tracer=memory_tracer)
+app.add_middleware(RequestIdMiddleware)
 
 app.include_router(api_version_one)
 
@@ -50,18 +114,24 @@ async def get_root(request: Request) -> dict:
     )
 
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    """Prometheus metrics"""
+
+    metrics_sampler.sample()
+    body, content_type = await run_in_threadpool(render_metrics)
+    return Response(content=body, media_type=content_type)
+
+
 # REGISTER EXCEPTION HANDLERS
 @app.exception_handler(HTTPException)
 async def http_exception(request: Request, exc: HTTPException):
     """HTTP exception handler"""
 
-    return JSONResponse(
+    return error_response(
         status_code=exc.status_code,
-        content={
-            "status": False,
-            "status_code": exc.status_code,
-            "message": exc.detail,
-        },
+        message=exc.detail,
+        headers=getattr(exc, "headers", None),
     )
 
 
@@ -74,7 +144,7 @@ async def validation_exception(request: Request, exc: RequestValidationError):
         for error in exc.errors()
     ]
 
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=422,
         content={
             "status": False,
@@ -89,15 +159,14 @@ async def validation_exception(request: Request, exc: RequestValidationError):
 async def exception(request: Request, exc: IntegrityError):
     """Integrity error exception handlers"""
 
-    logger.exception(f"Exception occured; {exc}")
+    logger.error(
+        "Integrity error on %s %s", request.method, request.url.path, exc_info=exc
+    )
 
-    return JSONResponse(
+    return error_response(
         status_code=400,
-        content={
-            "status": False,
-            "status_code": 400,
-            "message": f"An unexpected error occurred: {exc}",
-        },
+        message=f"An unexpected error occurred: {exc}",
+        cache=False,
     )
 
 
@@ -105,15 +174,14 @@ async def exception(request: Request, exc: IntegrityError):
 async def exception(request: Request, exc: Exception):
     """Other exception handlers"""
 
-    logger.exception(f"Exception occured; {exc}")
+    logger.error(
+        "Unhandled exception on %s %s", request.method, request.url.path, exc_info=exc
+    )
 
-    return JSONResponse(
+    return error_response(
         status_code=500,
-        content={
-            "status": False,
-            "status_code": 500,
-            "message": f"An unexpected error occurred: {exc}",
-        },
+        message=f"An unexpected error occurred: {exc}",
+        cache=False,
     )
 
 
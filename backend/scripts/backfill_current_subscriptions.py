@@ -0,0 +1,30 @@
+"""Point users subscribed before `users.current_subscription_id` existed at
+their latest active subscription.
+
+usage:
+
+    python -m scripts.backfill_current_subscriptions --batch-size 1000
+"""
+import argparse
+
+from api.db.database import db_session
+from api.utils.settings import settings
+from api.v1.services.user_subscription import user_subscription_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=settings.SUBSCRIPTION_SWEEP_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = db_session()
+    try:
+        updated = user_subscription_service.backfill_current_subscriptions(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+    print(f"pointed {updated} user(s) at their current subscription")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Deliver queued emails from the transactional outbox.
+
+Run one or more of these next to the API; workers claim batches with
+`SKIP LOCKED`, so several can run at once.
+
+usage:
+
+    python -m scripts.email_worker
+"""
+import argparse
+import asyncio
+
+from api.core.dependencies.email.smtp_pool import smtp_pool
+from api.core.dependencies.email.template_registry import email_template_registry
+from api.utils.settings import settings
+from api.v1.services.email_outbox import email_outbox_service
+
+
+async def run(poll_interval: float):
+    email_template_registry.load()
+    reaper = asyncio.create_task(smtp_pool.run_reaper())
+    try:
+        await email_outbox_service.run_worker(poll_interval=poll_interval)
+    finally:
+        reaper.cancel()
+        await asyncio.gather(reaper, return_exceptions=True)
+        await smtp_pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--poll-interval", type=float, default=settings.EMAIL_OUTBOX_POLL_INTERVAL)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args.poll_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""Generate a large synthetic dataset for performance work.
+
+Writes users (with a soft deleted and an inactive fraction, created_at
+spread over `--days` with more recent signups), their subscription history
+following a plan mix, token logins and contact us messages. Nothing is
+derived from real data.
+
+bcrypt is far too slow to run per user, so a small pool of hashes is
+computed once and shared: user `n` has the password
+`synthetic-password-<n % --hash-pool>`. Rows are streamed in batches with
+`COPY` on Postgres and `executemany` in large transactions on SQLite.
+
+The tables must exist (`alembic upgrade head`); on SQLite `--create-tables`
+creates the ones written here. Subscriptions reference the billing plans,
+load those first (the API does so on startup).
+
+usage:
+
+    python -m scripts.generate_data --users 1000000
+    python -m scripts.generate_data --users 100000 --plan-mix free:0.7,premium_monthly:0.2,premium_yearly:0.1
+    python -m scripts.generate_data --users 50000 --database-url sqlite:///synthetic.db --create-tables
+"""
+import argparse
+import csv
+import io
+import math
+import random
+import secrets
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Sequence, Tuple
+
+from passlib.context import CryptContext
+from sqlalchemy import create_engine
+
+from api.v1.models.contact_us import ContactUs
+from api.v1.models.token_login import TokenLogin
+from api.v1.models.user import User
+from api.v1.models.user_subscription import UserSubscription
+
+
+FIRST_NAMES = (
+    "Ada", "Grace", "Alan", "Linus", "Margaret", "Dennis", "Barbara", "Ken", "Radia", "Guido",
+    "Frances", "Edsger", "Katherine", "Donald", "Hedy", "Tim", "Annie", "Bjarne", "Sophie", "Niklaus",
+    "Chinedu", "Amaka", "Tunde", "Ngozi", "Kwame", "Aisha", "Mei", "Hiroshi", "Priya", "Mateo",
+)
+LAST_NAMES = (
+    "Lovelace", "Hopper", "Turing", "Torvalds", "Hamilton", "Ritchie", "Liskov", "Thompson", "Perlman",
+    "Rossum", "Allen", "Dijkstra", "Johnson", "Knuth", "Lamarr", "Berners-Lee", "Easley", "Stroustrup",
+    "Wilson", "Wirth", "Okafor", "Adeyemi", "Mensah", "Bello", "Chen", "Tanaka", "Sharma", "Garcia",
+)
+# Mailbox providers weighted roughly like a consumer signup list
+EMAIL_DOMAINS = (
+    ("gmail.com", 45), ("yahoo.com", 15), ("outlook.com", 12), ("hotmail.com", 8),
+    ("icloud.com", 6), ("proton.me", 2), ("example.com", 12),
+)
+CONTACT_SENTENCES = (
+    "I cannot find the export button.",
+    "How do I upgrade to the yearly plan?",
+    "The video generation took longer than expected.",
+    "Please delete my account and all of my data.",
+    "Is there a discount for students?",
+    "My payment went through but the plan did not change.",
+    "Great product, keep it up!",
+    "The magic link in my email has expired.",
+)
+# Days a subscription runs, as `get_sub_start_and_end_datetime` computes it
+PLAN_DAYS = {"premium_monthly": 30}
+DEFAULT_PLAN_DAYS = 360
+
+USER_COLUMNS = (
+    "id", "email", "password", "first_name", "last_name", "avatar_url", "is_active",
+    "is_deleted", "is_verified", "is_superadmin", "deleted_at", "created_at", "updated_at",
+)
+SUBSCRIPTION_COLUMNS = (
+    "id", "billing_plan_id", "user_id", "start_date", "end_date", "is_expired", "created_at", "updated_at",
+)
+TOKEN_LOGIN_COLUMNS = ("id", "user_id", "token", "expiry_time", "created_at", "updated_at")
+CONTACT_COLUMNS = ("id", "name", "email", "phone_number", "message", "created_at", "updated_at")
+
+
+def parse_plan_mix(value: str) -> Dict[str, float]:
+    """Parse `plan:weight,plan:weight` into normalised weights"""
+
+    mix = {}
+    for item in value.split(","):
+        plan, _, weight = item.partition(":")
+        mix[plan.strip()] = float(weight)
+    total = sum(mix.values())
+    if not mix or total <= 0:
+        raise argparse.ArgumentTypeError("plan mix needs at least one positive weight")
+    return {plan: weight / total for plan, weight in mix.items()}
+
+
+def hash_pool(size: int) -> List[str]:
+    """bcrypt hashes of `synthetic-password-<n>`, computed once"""
+
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return [pwd_context.hash(f"synthetic-password-{n}") for n in range(size)]
+
+
+@dataclass
+class Options:
+    days: int
+    deleted_fraction: float
+    inactive_fraction: float
+    verified_fraction: float
+    avatar_fraction: float
+    token_login_fraction: float
+    plan_mix: Dict[str, float]
+    email_prefix: str
+
+
+class Generator:
+    """Builds row tuples in batches"""
+
+    def __init__(self, options: Options, hashes: Sequence[str], seed: int):
+        self.options = options
+        self.hashes = hashes
+        self.random = random.Random(seed)
+        self.now = datetime.now(tz=timezone.utc)
+        self.start = self.now - timedelta(days=options.days)
+        self.span = options.days * 86400
+        self.plans = list(options.plan_mix)
+        self.plan_weights = list(options.plan_mix.values())
+        self.domains = [domain for domain, _ in EMAIL_DOMAINS]
+        self.domain_weights = [weight for _, weight in EMAIL_DOMAINS]
+
+    def _id(self, at: datetime) -> str:
+        """A UUIDv7 for `at`, so keys sort by creation time like the app's"""
+
+        rand = self.random.getrandbits(74)
+        value = (
+            int(at.timestamp() * 1000) << 80
+            | 0x7 << 76
+            | (rand >> 62) << 64
+            | 0b10 << 62
+            | rand & ((1 << 62) - 1)
+        )
+        return str(uuid.UUID(int=value))
+
+    def _created_at(self) -> datetime:
+        # sqrt skews signups towards the present, like a growing product
+        return self.start + timedelta(seconds=self.span * math.sqrt(self.random.random()))
+
+    def _between(self, start: datetime, end: datetime) -> datetime:
+        if end <= start:
+            return start
+        return start + (end - start) * self.random.random()
+
+    def users(self, first: int, count: int) -> Tuple[list, list, list, list]:
+        """Users `first`..`first + count - 1` with their subscriptions and
+        token logins, plus (user id, current subscription id) pairs"""
+
+        options, rand = self.options, self.random
+        users, subscriptions, token_logins, current = [], [], [], []
+
+        domains = rand.choices(self.domains, self.domain_weights, k=count)
+        plans = rand.choices(self.plans, self.plan_weights, k=count)
+
+        for offset in range(count):
+            n = first + offset
+            created_at = self._created_at()
+            user_id = self._id(created_at)
+            first_name = rand.choice(FIRST_NAMES)
+            last_name = rand.choice(LAST_NAMES)
+            updated_at = self._between(created_at, self.now)
+
+            is_deleted = rand.random() < options.deleted_fraction
+            deleted_at = self._between(created_at, self.now) if is_deleted else None
+            if deleted_at is not None:
+                updated_at = deleted_at
+
+            users.append((
+                user_id,
+                f"{options.email_prefix}{n}.{first_name}.{last_name}@{domains[offset]}".lower(),
+                self.hashes[n % len(self.hashes)],
+                first_name,
+                last_name,
+                f"https://avatars.example.com/{user_id}.png" if rand.random() < options.avatar_fraction else None,
+                rand.random() >= options.inactive_fraction,
+                is_deleted,
+                rand.random() < options.verified_fraction,
+                False,
+                deleted_at,
+                created_at,
+                updated_at,
+            ))
+
+            # Everyone starts on the free plan at signup; paid users upgrade later
+            free_end = created_at + timedelta(days=DEFAULT_PLAN_DAYS)
+            plan = plans[offset]
+            upgraded_at = self._between(created_at, deleted_at or self.now) if plan != "free" else None
+
+            free_id = self._id(created_at)
+            subscriptions.append((
+                free_id, "free", user_id, created_at, free_end,
+                upgraded_at is not None or free_end <= self.now, created_at, upgraded_at or created_at,
+            ))
+            current_id = free_id
+
+            if upgraded_at is not None:
+                end = upgraded_at + timedelta(days=PLAN_DAYS.get(plan, DEFAULT_PLAN_DAYS))
+                current_id = self._id(upgraded_at)
+                subscriptions.append((
+                    current_id, plan, user_id, upgraded_at, end, end <= self.now, upgraded_at, upgraded_at,
+                ))
+            current.append((user_id, current_id))
+
+            if rand.random() < options.token_login_fraction:
+                issued_at = self._between(created_at, self.now)
+                token_logins.append((
+                    self._id(issued_at), user_id, f"{rand.randrange(10 ** 6):06d}",
+                    issued_at + timedelta(minutes=10), issued_at, issued_at,
+                ))
+
+        return users, subscriptions, token_logins, current
+
+    def contact_messages(self, count: int) -> list:
+        rand = self.random
+        rows = []
+        for _ in range(count):
+            created_at = self._created_at()
+            first_name, last_name = rand.choice(FIRST_NAMES), rand.choice(LAST_NAMES)
+            rows.append((
+                self._id(created_at),
+                f"{first_name} {last_name}",
+                f"{first_name}.{last_name}{rand.randrange(10 ** 4)}@{rand.choice(self.domains)}".lower(),
+                f"+234{rand.randrange(10 ** 10):010d}",
+                " ".join(rand.choices(CONTACT_SENTENCES, k=rand.randint(1, 6))),
+                created_at,
+                created_at,
+            ))
+        return rows
+
+
+class PostgresLoader:
+    """Streams rows with COPY over one connection"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        # Subscriptions are written after their users, so the users'
+        # pointer to their current subscription is set at the end
+        self.cursor.execute(
+            "CREATE TEMP TABLE synthetic_current_subscriptions (user_id varchar, subscription_id varchar)"
+        )
+
+    @staticmethod
+    def _csv(rows: list) -> io.StringIO:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+        buffer.seek(0)
+        return buffer
+
+    def copy(self, table: str, columns: Sequence[str], rows: list):
+        if rows:
+            self.cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", self._csv(rows)
+            )
+
+    def current_subscriptions(self, pairs: list):
+        self.copy("synthetic_current_subscriptions", ("user_id", "subscription_id"), pairs)
+
+    def commit(self):
+        self.connection.commit()
+
+    def finish(self, tables: Sequence[str]):
+        self.cursor.execute(
+            "UPDATE users SET current_subscription_id = c.subscription_id "
+            "FROM synthetic_current_subscriptions c WHERE users.id = c.user_id"
+        )
+        self.cursor.execute("DROP TABLE synthetic_current_subscriptions")
+        self.connection.commit()
+        for table in tables:
+            self.cursor.execute(f"ANALYZE {table}")
+        self.connection.commit()
+
+
+class SQLiteLoader:
+    """Inserts rows with executemany, one transaction per batch"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=OFF")
+        # Random key order makes index inserts jump around; keep them cached
+        self.cursor.execute("PRAGMA cache_size=-262144")
+
+    @staticmethod
+    def _value(value):
+        # The format SQLAlchemy's SQLite DateTime type stores
+        if isinstance(value, datetime):
+            return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+        return value
+
+    def copy(self, table: str, columns: Sequence[str], rows: list):
+        if rows:
+            placeholders = ", ".join("?" for _ in columns)
+            self.cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                ([self._value(value) for value in row] for row in rows),
+            )
+
+    def current_subscriptions(self, pairs: list):
+        self.cursor.executemany(
+            "UPDATE users SET current_subscription_id = ? WHERE id = ?",
+            ((subscription_id, user_id) for user_id, subscription_id in pairs),
+        )
+
+    def commit(self):
+        self.connection.commit()
+
+    def finish(self, tables: Sequence[str]):
+        self.cursor.execute("ANALYZE")
+        self.connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--contact-messages", type=int, default=None, help="Defaults to 5%% of --users")
+    parser.add_argument("--days", type=int, default=730, help="Spread created_at over this many days")
+    parser.add_argument("--deleted-fraction", type=float, default=0.08)
+    parser.add_argument("--inactive-fraction", type=float, default=0.04)
+    parser.add_argument("--verified-fraction", type=float, default=0.65)
+    parser.add_argument("--avatar-fraction", type=float, default=0.3)
+    parser.add_argument("--token-login-fraction", type=float, default=0.1)
+    parser.add_argument(
+        "--plan-mix", type=parse_plan_mix, default="free:0.82,premium_monthly:0.13,premium_yearly:0.05",
+    )
+    parser.add_argument("--email-prefix", default="synthetic", help="Change it to load a second batch")
+    parser.add_argument("--hash-pool", type=int, default=8, help="Distinct bcrypt hashes to reuse")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--database-url", default=None, help="Defaults to the app's database")
+    parser.add_argument("--create-tables", action="store_true", help="Create missing tables first")
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from api.db.database import engine
+
+    tables = [User.__table__, UserSubscription.__table__, TokenLogin.__table__, ContactUs.__table__]
+    if args.create_tables:
+        for table in tables:
+            table.create(engine, checkfirst=True)
+
+    started = time.perf_counter()
+    hashes = hash_pool(args.hash_pool)
+    print(f"hashed {len(hashes)} passwords in {time.perf_counter() - started:.1f}s", flush=True)
+
+    generator = Generator(
+        Options(
+            days=args.days,
+            deleted_fraction=args.deleted_fraction,
+            inactive_fraction=args.inactive_fraction,
+            verified_fraction=args.verified_fraction,
+            avatar_fraction=args.avatar_fraction,
+            token_login_fraction=args.token_login_fraction,
+            plan_mix=args.plan_mix,
+            email_prefix=args.email_prefix,
+        ),
+        hashes,
+        seed=args.seed if args.seed is not None else secrets.randbits(32),
+    )
+
+    connection = engine.raw_connection()
+    try:
+        loader = (PostgresLoader if engine.dialect.name == "postgresql" else SQLiteLoader)(connection.dbapi_connection)
+        counts = {table.name: 0 for table in tables}
+
+        for first in range(0, args.users, args.batch_size):
+            users, subscriptions, token_logins, current = generator.users(
+                first, min(args.batch_size, args.users - first)
+            )
+            loader.copy("users", USER_COLUMNS, users)
+            loader.copy("user_subscriptions", SUBSCRIPTION_COLUMNS, subscriptions)
+            loader.copy("token_logins", TOKEN_LOGIN_COLUMNS, token_logins)
+            loader.current_subscriptions(current)
+            loader.commit()
+
+            counts["users"] += len(users)
+            counts["user_subscriptions"] += len(subscriptions)
+            counts["token_logins"] += len(token_logins)
+            rows = sum(counts.values())
+            elapsed = time.perf_counter() - started
+            print(f"{counts['users']}/{args.users} users, {rows} rows, {rows / elapsed:,.0f} rows/s", flush=True)
+
+        contact_messages = args.contact_messages if args.contact_messages is not None else args.users // 20
+        for first in range(0, contact_messages, args.batch_size):
+            rows = generator.contact_messages(min(args.batch_size, contact_messages - first))
+            loader.copy("contact_us", CONTACT_COLUMNS, rows)
+            loader.commit()
+            counts["contact_us"] += len(rows)
+
+        loader.finish([table.name for table in tables])
+    finally:
+        connection.close()
+
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"done: {counts} ({total:,} rows in {elapsed:.1f}s, {total / elapsed:,.0f} rows/s)")
+    print(f"user n logs in with the password synthetic-password-<n % {args.hash_pool}>")
+
+
+if __name__ == "__main__":
+    main()
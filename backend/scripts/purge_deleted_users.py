@@ -0,0 +1,43 @@
+"""Archive or purge users soft deleted longer than the retention period.
+
+usage:
+
+    python -m scripts.purge_deleted_users --mode archive --days 30 --dry-run
+"""
+import argparse
+
+from api.db.database import db_session
+from api.utils.settings import settings
+from api.v1.services.user_retention import user_retention_service, ARCHIVE, PURGE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=[ARCHIVE, PURGE], default=ARCHIVE)
+    parser.add_argument("--days", type=int, default=settings.USER_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=settings.USER_RETENTION_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=settings.USER_RETENTION_BATCH_PAUSE)
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    db = db_session()
+    try:
+        report = user_retention_service.run(
+            db,
+            mode=args.mode,
+            retention_days=args.days,
+            batch_size=args.batch_size,
+            pause=args.pause,
+            max_batches=args.max_batches,
+            dry_run=args.dry_run,
+            on_batch=lambda progress: print(f"batch {progress.batches}: {progress.summary()}", flush=True),
+        )
+    finally:
+        db.close()
+
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Send a template to every active user, or to the users on one plan.
+
+Start a campaign, or resume one that was interrupted, by its id:
+
+    python -m scripts.send_campaign --name launch --template welcome-marketing.html \
+        --subject "Something new" --plan-id <billing plan id> --rate 20
+    python -m scripts.send_campaign --resume <campaign id>
+"""
+import argparse
+import asyncio
+import json
+
+from api.core.dependencies.email.smtp_pool import smtp_pool
+from api.db.database import db_session
+from api.utils.settings import settings
+from api.v1.services.email_campaign import email_campaign_service
+
+
+def create_campaign(args) -> str:
+    db = db_session()
+    try:
+        campaign = email_campaign_service.create(
+            db,
+            name=args.name,
+            template_name=args.template,
+            subject=args.subject,
+            billing_plan_id=args.plan_id,
+            context=json.loads(args.context) if args.context else None,
+        )
+        return campaign.id
+    finally:
+        db.close()
+
+
+async def run(campaign_id: str, args):
+    try:
+        progress = await email_campaign_service.run(
+            campaign_id,
+            rate=args.rate,
+            concurrency=args.concurrency,
+            chunk_size=args.chunk_size,
+            on_progress=lambda progress: print(progress.summary(), flush=True),
+        )
+    finally:
+        await smtp_pool.close()
+
+    print(f"done: {progress.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resume", metavar="CAMPAIGN_ID")
+    parser.add_argument("--name")
+    parser.add_argument("--template")
+    parser.add_argument("--subject")
+    parser.add_argument("--plan-id", default=None)
+    parser.add_argument("--context", default=None, help="JSON context passed to the template")
+    parser.add_argument("--rate", type=float, default=settings.CAMPAIGN_RATE_PER_SECOND)
+    parser.add_argument("--concurrency", type=int, default=settings.CAMPAIGN_CONCURRENCY)
+    parser.add_argument("--chunk-size", type=int, default=settings.CAMPAIGN_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.resume:
+        campaign_id = args.resume
+    else:
+        if not (args.name and args.template and args.subject):
+            parser.error("--name, --template and --subject are required for a new campaign")
+        campaign_id = create_campaign(args)
+        print(f"created campaign {campaign_id}")
+
+    asyncio.run(run(campaign_id, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api.db.database import get_db
+from api.v1.models.billing_plan import BillingPlan
+from api.v1.models.email_outbox import EmailOutbox
+from api.v1.models.user import User
+from main import app
+
+
+@pytest.fixture
+def client(session_factory):
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+def register(client):
+    return client.post("/api/v1/auth/register", json={
+        "email": "ada@gmail.com",
+        "password": "password",
+        "first_name": "Ada",
+        "last_name": "Lovelace",
+    })
+
+
+def test_register_commits_user_welcome_email_and_free_plan_together(client, db):
+    db.add(BillingPlan(plan_name="Free", price=0, currency="USD", features=[], access_limit=15))
+    db.commit()
+
+    assert register(client).status_code == 201
+
+    user = db.query(User).one()
+    assert user.current_subscription.billing_plan.plan_name == "Free"
+    assert db.query(EmailOutbox).filter_by(recipient=user.email, template_name="welcome-marketing.html").count() == 1
+
+
+def test_failed_registration_leaves_no_user_or_email(client, db):
+    # No Free plan to subscribe the user to
+    assert register(client).status_code == 404
+
+    assert db.query(User).count() == 0
+    assert db.query(EmailOutbox).count() == 0
@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import api.db.database as database
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    return engine
+
+
+def test_concurrent_requests_on_one_thread_get_their_own_session(engine):
+    first, second = database.get_db(), database.get_db()
+
+    first_db, second_db = next(first), next(second)
+
+    # Both dependencies run on this thread; a thread-local session would be shared
+    assert first_db is not second_db
+    assert first_db is not database.db_session()
+
+    first_db.execute(text("select 1"))
+    second_db.execute(text("select 1"))
+    assert engine.pool.checkedout() == 2
+
+    first.close()
+    second.close()
+
+
+def test_session_is_closed_when_the_request_ends(engine):
+    dependency = database.get_db()
+    db = next(dependency)
+    db.execute(text("select 1"))
+    assert engine.pool.checkedout() == 1
+
+    dependency.close()
+
+    assert not db.in_transaction()
+    assert engine.pool.checkedout() == 0
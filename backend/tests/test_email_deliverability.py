@@ -0,0 +1,48 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api.core.dependencies.email.deliverability import deliverability_checker
+from main import app
+
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def mx_lookups(monkeypatch):
+    """Answer every MX lookup with "no mail accepted" and record the domains"""
+
+    domains = []
+
+    async def lookup(domain):
+        domains.append(domain)
+        return False
+
+    monkeypatch.setattr(deliverability_checker, "_lookup", lookup)
+    yield domains
+    for domain in domains:
+        deliverability_checker._undeliverable.pop(domain, None)
+
+
+def test_register_rejects_undeliverable_domain_on_first_sight(mx_lookups):
+    response = client.post("/api/v1/auth/register", json={
+        "email": "someone@no-mail-register.com",
+        "password": "password",
+        "first_name": "Ada",
+        "last_name": "Lovelace",
+    })
+
+    assert response.status_code == 400
+    assert mx_lookups == ["no-mail-register.com"]
+
+
+def test_magic_link_rejects_undeliverable_domain_on_first_sight(mx_lookups):
+    response = client.post("/api/v1/auth/magic-link", json={"user_email": "someone@no-mail-magic.com"})
+
+    assert response.status_code == 400
+    assert mx_lookups == ["no-mail-magic.com"]
+
+
+def test_allow_listed_domain_skips_dns(mx_lookups):
+    assert deliverability_checker.cached("gmail.com") is True
+    assert mx_lookups == []
@@ -0,0 +1,173 @@
+import asyncio
+import socket
+from datetime import timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+
+import api.core.dependencies.email.email_sender as email_sender
+import api.v1.services.email_outbox as email_outbox
+from api.core.dependencies.email.smtp_pool import SMTPConnectionPool
+from api.core.dependencies.email.template_registry import EmailTemplateRegistry
+from api.utils.settings import settings
+from api.v1.models.email_outbox import EmailOutbox
+from api.v1.services.email_outbox import EmailOutboxService
+
+
+class SMTPSink:
+    """Accepts mail, or refuses it with a temporary failure while `failing`"""
+
+    def __init__(self):
+        self.received = []
+        self.failing = False
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.failing:
+            return "451 Try again later"
+        self.received.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def sink(monkeypatch, tmp_path):
+    handler = SMTPSink()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    (templates / "welcome.html").write_text("<p>Hello {{ user.first_name }}</p>")
+
+    monkeypatch.setattr(email_sender, "email_template_registry", EmailTemplateRegistry(templates))
+    monkeypatch.setattr(email_sender, "smtp_pool", SMTPConnectionPool(
+        hostname="127.0.0.1", port=controller.port, use_tls=False, start_tls=False,
+    ))
+    try:
+        yield handler
+    finally:
+        controller.stop()
+
+
+@pytest.fixture
+def outbox(monkeypatch, session_factory):
+    monkeypatch.setattr(email_outbox, "db_session", session_factory)
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_BACKOFF_BASE", 30)
+    return EmailOutboxService(dedupe_windows="")
+
+
+def enqueue(outbox, db, recipient="ada@example.com") -> str:
+    message = outbox.enqueue(
+        db, recipient, "welcome.html", "Welcome", {"user": {"first_name": "Ada"}}
+    )
+    return message.id
+
+
+def make_due(db, message_id):
+    db.get(EmailOutbox, message_id).next_attempt_at = EmailOutboxService._now()
+    db.commit()
+
+
+def test_claimed_messages_are_leased_to_one_worker(outbox, db):
+    for i in range(3):
+        enqueue(outbox, db, f"user{i}@example.com")
+
+    first = outbox.claim_batch(db, batch_size=2)
+    second = outbox.claim_batch(db, batch_size=2)
+
+    assert len(first) == 2 and len(second) == 1
+    assert {m.id for m in first}.isdisjoint(m.id for m in second)
+    assert all(m.status == EmailOutbox.SENDING and m.attempts == 1 for m in first + second)
+    assert outbox.claim_batch(db) == []
+
+
+def test_delivers_to_the_smtp_server(outbox, db, sink):
+    message_id = enqueue(outbox, db)
+
+    assert asyncio.run(outbox.process_batch()) == 1
+
+    db.expire_all()
+    message = db.get(EmailOutbox, message_id)
+    assert message.status == EmailOutbox.SENT
+    assert sink.received == ["ada@example.com"]
+
+
+def test_failed_send_is_retried_with_backoff(outbox, db, sink):
+    message_id = enqueue(outbox, db)
+    sink.failing = True
+
+    asyncio.run(outbox.process_batch())
+
+    db.expire_all()
+    message = db.get(EmailOutbox, message_id)
+    assert message.status == EmailOutbox.PENDING
+    assert message.attempts == 1
+    assert "451" in message.last_error
+    delay = message.next_attempt_at.replace(tzinfo=None) - EmailOutboxService._now().replace(tzinfo=None)
+    assert timedelta(seconds=20) < delay <= timedelta(seconds=36)
+    # Not due yet
+    assert asyncio.run(outbox.process_batch()) == 0
+
+    sink.failing = False
+    make_due(db, message_id)
+    asyncio.run(outbox.process_batch())
+
+    db.expire_all()
+    assert db.get(EmailOutbox, message_id).status == EmailOutbox.SENT
+    assert sink.received == ["ada@example.com"]
+
+
+def test_message_that_keeps_failing_is_dead_lettered(outbox, db, sink):
+    message_id = enqueue(outbox, db)
+    sink.failing = True
+
+    asyncio.run(outbox.process_batch())
+    make_due(db, message_id)
+    asyncio.run(outbox.process_batch())
+
+    db.expire_all()
+    message = db.get(EmailOutbox, message_id)
+    assert message.status == EmailOutbox.DEAD
+    assert message.attempts == 2
+    make_due(db, message_id)
+    assert asyncio.run(outbox.process_batch()) == 0
+
+
+def test_outcome_of_an_expired_claim_is_discarded(outbox, db):
+    message_id = enqueue(outbox, db)
+    [slow] = outbox.claim_batch(db)
+    # The lease runs out and another worker claims the message again
+    make_due(db, message_id)
+    [retry] = outbox.claim_batch(db)
+
+    outbox.record_results(db, [(retry, None)])
+    outbox.record_results(db, [(slow, "SMTPServerDisconnected: timed out")])
+
+    db.expire_all()
+    message = db.get(EmailOutbox, message_id)
+    assert message.status == EmailOutbox.SENT
+    assert message.last_error is None
+
+
+def test_prunes_old_sent_and_dead_messages(outbox, db):
+    old = EmailOutboxService._now() - timedelta(days=31)
+    ids = [enqueue(outbox, db, f"user{i}@example.com") for i in range(4)]
+    for message_id, status, updated_at in zip(ids, [
+        EmailOutbox.SENT, EmailOutbox.DEAD, EmailOutbox.SENT, EmailOutbox.PENDING,
+    ], [old, old, EmailOutboxService._now(), old]):
+        message = db.get(EmailOutbox, message_id)
+        message.status = status
+        db.flush()
+        message.updated_at = updated_at
+    db.commit()
+
+    assert outbox.prune(db, retention_days=30, batch_size=1) == 2
+
+    db.expire_all()
+    assert {m.id for m in db.query(EmailOutbox)} == set(ids[2:])
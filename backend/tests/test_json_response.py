@@ -0,0 +1,22 @@
+from api.utils import json_response
+from api.utils.json_response import error_body, error_response
+
+
+def test_only_fixed_error_messages_are_cached(monkeypatch):
+    monkeypatch.setattr(json_response, "_error_bodies", {})
+
+    error_body(404, "Not Found")
+    error_body(401, "Could not validate credentials")
+    for i in range(100):
+        error_body(400, f"Invalid value {i}")
+
+    assert set(json_response._error_bodies) == {
+        (404, "Not Found"), (401, "Could not validate credentials"),
+    }
+
+
+def test_error_response_body():
+    response = error_response(404, "Not Found")
+
+    assert response.status_code == 404
+    assert response.body == b'{"status":false,"status_code":404,"message":"Not Found"}'
@@ -0,0 +1,35 @@
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+
+from api.utils.logger import JsonFormatter, NonBlockingQueueHandler, _process_log_file
+
+
+def test_queued_records_keep_the_traceback_text_not_the_frames():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    try:
+        session = object()  # noqa: F841 - a local the traceback would keep alive
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("app", logging.ERROR, __file__, 1, "failed %s", ("job",), None)
+        record.exc_info = sys.exc_info()
+    handler.handle(record)
+
+    queued = handler.queue.get_nowait()
+    assert queued.exc_info is None
+    entry = json.loads(JsonFormatter().format(queued))
+    assert entry["message"] == "failed job"
+    assert entry["exc_type"] == "ValueError"
+    assert "ValueError: boom" in entry["traceback"]
+
+
+def test_worker_processes_get_a_log_file_of_their_own(monkeypatch):
+    pid = os.getpid()
+    assert _process_log_file("error.log") == "error.log"
+    assert _process_log_file("logs/app-{pid}.log") == f"logs/app-{pid}.log"
+
+    monkeypatch.setattr(multiprocessing, "parent_process", lambda: object())
+    assert _process_log_file("error.log") == f"error.{pid}.log"
@@ -0,0 +1,32 @@
+from api.utils.loop_watchdog import BlockingSite, LoopWatchdog
+
+
+def capture(site: str) -> BlockingSite:
+    return BlockingSite(site, leaf=f"sleep ({site})", stack=[site])
+
+
+def test_discarded_captures_leave_no_site():
+    watchdog = LoopWatchdog(threshold=0.1, max_sites=1)
+
+    # The loop came back under the threshold: the capture is dropped
+    watchdog._pending = capture("handler (routes.py:10)")
+    watchdog._record(0.01)
+
+    assert watchdog.sites == {}
+
+    watchdog._pending = capture("other (routes.py:20)")
+    watchdog._record(0.2)
+
+    assert [site["site"] for site in watchdog.report()["sites"]] == ["other (routes.py:20)"]
+    assert watchdog.report()["sites"][0]["count"] == 1
+
+
+def test_full_report_counts_the_stall_without_a_site():
+    watchdog = LoopWatchdog(threshold=0.1, max_sites=1)
+    for site in ("first (a.py:1)", "second (b.py:2)", "first (a.py:1)"):
+        watchdog._pending = capture(site)
+        watchdog._record(0.2)
+
+    report = watchdog.report()
+    assert report["stalls"] == 3
+    assert [(site["site"], site["count"]) for site in report["sites"]] == [("first (a.py:1)", 2)]
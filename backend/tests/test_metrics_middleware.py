@@ -0,0 +1,52 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.core.middleware.metrics import MetricsMiddleware
+
+
+app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/ping")
+def ping():
+    return {}
+
+
+client = TestClient(app)
+
+
+def metrics_middleware() -> MetricsMiddleware:
+    stack = app.middleware_stack or app.build_middleware_stack()
+    while not isinstance(stack, MetricsMiddleware):
+        stack = stack.app
+    return stack
+
+
+def test_non_standard_methods_share_one_label():
+    client.get("/ping")
+    for method in ("FOO", "BAR", "X" * 50):
+        client.request(method, "/ping")
+
+    methods = {method for method, _route in metrics_middleware()._routes}
+
+    assert "GET" in methods
+    assert "other" in methods
+    assert not methods - {"GET", "other"}
+
+
+def test_metrics_endpoint_needs_the_scrape_token(monkeypatch):
+    from api.utils.settings import settings
+    from main import app as main_app
+
+    main_client = TestClient(main_app)
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert main_client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    assert main_client.get("/metrics").status_code == 403
+    assert main_client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert main_client.get(
+        "/metrics", headers={"Authorization": "Bearer scrape-secret"}
+    ).status_code == 200
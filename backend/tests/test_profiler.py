@@ -0,0 +1,52 @@
+from collections import Counter
+
+from api.utils.profiler import Profile, ProfileStore
+
+
+def make_profile() -> Profile:
+    return Profile(
+        method="GET", path="/api/v1/users/me", interval=0.005,
+        samples=Counter({(("handler", "/app/api/v1/routes/user.py", 10),): 3}),
+    )
+
+
+def test_workers_sharing_a_directory_see_each_others_profiles(tmp_path):
+    worker_a = ProfileStore(max_profiles=2, directory=tmp_path)
+    worker_b = ProfileStore(max_profiles=2, directory=tmp_path)
+    profiles = [make_profile() for _ in range(3)]
+
+    for profile in profiles:
+        worker_a.add(profile)
+
+    shared = worker_b.get(profiles[-1].id)
+    assert shared.samples == profiles[-1].samples
+    assert shared.summary() == profiles[-1].summary()
+    # Only the newest max_profiles are kept
+    assert len(worker_b.list()) == 2
+    assert worker_b.get("../../etc/passwd") is None
+
+
+def test_arming_a_route_arms_every_worker(tmp_path):
+    worker_a = ProfileStore(directory=tmp_path)
+    worker_b = ProfileStore(directory=tmp_path)
+
+    worker_a.arm("get", "/api/v1/users/{user_id}", 2)
+
+    assert worker_b.armed == {("GET", "/api/v1/users/{user_id}"): 2}
+    assert worker_b.take("GET", "/api/v1/users/{user_id}")
+    assert worker_a.take("GET", "/api/v1/users/{user_id}")
+    assert not worker_b.take("GET", "/api/v1/users/{user_id}")
+    assert worker_a.armed == {}
+
+
+def test_in_memory_store(tmp_path):
+    store = ProfileStore(max_profiles=1)
+    first, second = make_profile(), make_profile()
+    store.add(first)
+    store.add(second)
+
+    assert store.get(first.id) is None
+    assert store.list() == [second]
+    store.arm("post", "/api/v1/tools/jobs", 1)
+    assert store.take("POST", "/api/v1/tools/jobs")
+    assert not store.armed
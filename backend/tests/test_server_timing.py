@@ -0,0 +1,49 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from api.core.middleware.server_timing import ServerTimingMiddleware
+from api.utils.timing import span
+
+
+app = FastAPI()
+app.add_middleware(ServerTimingMiddleware, admin_token="admin-secret", sample_rate=1.0)
+
+
+@app.get("/api/v1/users/me")
+def me():
+    with span("service"):
+        return {}
+
+
+@app.post("/api/v1/auth/login")
+def login():
+    with span("bcrypt"):
+        return {}
+
+
+@app.get("/api/v1/users/missing")
+def missing():
+    raise HTTPException(status_code=404)
+
+
+client = TestClient(app)
+ADMIN = {"X-Admin-Token": "admin-secret"}
+
+
+def test_header_only_for_admin_requests():
+    assert "server-timing" not in client.get("/api/v1/users/me").headers
+    assert "server-timing" not in client.get(
+        "/api/v1/users/me", headers={"X-Admin-Token": "wrong"}
+    ).headers
+    assert "service;dur=" in client.get("/api/v1/users/me", headers=ADMIN).headers["server-timing"]
+
+
+def test_header_never_on_auth_routes():
+    assert "server-timing" not in client.post("/api/v1/auth/login", headers=ADMIN).headers
+
+
+def test_header_never_on_error_responses():
+    response = client.get("/api/v1/users/missing", headers=ADMIN)
+
+    assert response.status_code == 404
+    assert "server-timing" not in response.headers
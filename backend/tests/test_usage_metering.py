@@ -0,0 +1,139 @@
+import threading
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from api.db.database import get_db
+
+from api.v1.models.billing_plan import BillingPlan
+from api.v1.models.usage_counter import UsageCounter
+from api.v1.models.user import User
+from api.v1.services.billing_plan import billing_plan_service
+from api.v1.schemas.tool import TOOLS
+from api.v1.services.usage_metering import UsageMeteringService, usage_metering_service
+from api.v1.services.user import user_service
+from api.v1.services.user_subscription import user_subscription_service
+from main import app
+
+
+@pytest.fixture
+def free_user(db):
+    """A user on a Free plan limited to 15 uses"""
+
+    db.add(BillingPlan(plan_name="Free", price=0, currency="USD", features=[], access_limit=15))
+    user = User(email="ada@example.com")
+    db.add(user)
+    db.commit()
+    billing_plan_service.subscribe_user_to_free_plan(db, user)
+    return user
+
+
+def stored_usage(db, user) -> int:
+    db.expire_all()
+    return db.query(UsageCounter.count).filter(UsageCounter.user_id == user.id).scalar() or 0
+
+
+def test_quota_is_reserved_in_blocks(db, free_user):
+    metering = UsageMeteringService(reservation_size=5)
+
+    remaining = [metering.consume(db, free_user) for _ in range(6)]
+
+    assert remaining == list(range(14, 8, -1))
+    # Two blocks of five, not six round trips
+    assert metering.reservations == 2
+    assert stored_usage(db, free_user) == 10
+    assert metering.get_usage(db, free_user.id) == 6
+
+
+def test_consume_past_the_limit_is_refused_with_429(db, free_user):
+    metering = UsageMeteringService(reservation_size=4)
+
+    for _ in range(15):
+        metering.consume(db, free_user)
+
+    with pytest.raises(HTTPException) as exc:
+        metering.consume(db, free_user)
+
+    assert exc.value.status_code == 429
+    assert stored_usage(db, free_user) == 15
+
+
+def test_workers_never_reserve_past_the_limit(session_factory, db, free_user):
+    workers = [UsageMeteringService(reservation_size=4) for _ in range(3)]
+    granted = []
+
+    def use(metering):
+        session = session_factory()
+        try:
+            for _ in range(10):
+                try:
+                    metering.consume(session, free_user)
+                    granted.append(1)
+                except HTTPException:
+                    pass
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=use, args=(metering,)) for metering in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(granted) <= 15
+    assert stored_usage(db, free_user) <= 15
+
+
+def test_flush_hands_back_unused_quota(db, free_user):
+    metering = UsageMeteringService(reservation_size=5)
+    metering.consume(db, free_user)
+    assert stored_usage(db, free_user) == 5
+
+    metering.flush(db)
+
+    assert stored_usage(db, free_user) == 1
+    assert metering.get_usage(db, free_user.id) == 1
+
+
+def test_tool_job_route_returns_429_once_the_limit_is_used(session_factory, free_user):
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    token = user_service.create_access_token(user_id=free_user.id)
+    client = TestClient(app)
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        statuses = [
+            client.post(
+                "/api/v1/tools/jobs",
+                json={"tool": TOOLS[0]},
+                headers={"Authorization": f"Bearer {token}"},
+            ).status_code
+            for _ in range(16)
+        ]
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+    assert statuses == [201] * 15 + [429]
+
+
+def test_new_subscription_replaces_the_cached_limit(db, free_user):
+    premium = BillingPlan(plan_name="Premium", price=20, currency="USD", features=[], access_limit=75)
+    db.add(premium)
+    db.commit()
+    assert usage_metering_service.get_limit(db, free_user) == 15
+
+    start_date, end_date = user_subscription_service.get_sub_start_and_end_datetime("monthly")
+    user_subscription_service.create(db, {
+        "user_id": free_user.id,
+        "billing_plan_id": premium.id,
+        "start_date": start_date,
+        "end_date": end_date,
+    })
+
+    assert usage_metering_service.get_limit(db, free_user) == 75
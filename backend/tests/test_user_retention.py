@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.v1.models.email_outbox import EmailOutbox
+from api.v1.models.tool_activity import ToolActivityEvent
+from api.v1.models.user import User
+from api.v1.services.user_retention import PURGE, user_retention_service
+
+
+LONG_AGO = datetime.now(tz=timezone.utc) - timedelta(days=400)
+
+
+def add_user(db, email, **values):
+    user = User(email=email, **values)
+    db.add(user)
+    db.flush()
+    db.add_all([
+        ToolActivityEvent(user_id=user.id, job_id="job", tool="Text to Video", status="pending"),
+        EmailOutbox(recipient=email, template_name="welcome.html", subject="Hi", context={"name": "Ada"}),
+    ])
+    return user
+
+
+@pytest.fixture
+def users(db):
+    live = add_user(db, "live@example.com")
+    deleted = add_user(db, "deleted@example.com", is_deleted=True, deleted_at=LONG_AGO)
+    # Soft deleted before `deleted_at` existed
+    legacy = add_user(db, "legacy@example.com", is_deleted=True)
+    db.flush()
+    legacy.updated_at = LONG_AGO
+    db.commit()
+    return live, deleted, legacy
+
+
+def test_purge_removes_activity_events_and_emails(db, users):
+    live, _deleted, _legacy = users
+
+    report = user_retention_service.run(db, mode=PURGE, retention_days=30, pause=0)
+
+    assert report.users == 2
+    assert report.backfilled == 1
+    db.expire_all()
+    assert [u.email for u in db.query(User)] == [live.email]
+    assert {e.user_id for e in db.query(ToolActivityEvent)} == {live.id}
+    assert {m.recipient for m in db.query(EmailOutbox)} == {live.email}
+
+
+def test_dry_run_counts_users_without_deleted_at_and_changes_nothing(db, users):
+    report = user_retention_service.run(db, mode=PURGE, retention_days=30, dry_run=True)
+
+    assert report.users == 2
+    assert report.rows["email_outbox"] == 2
+    assert report.rows["tool_activity_events"] == 2
+    db.expire_all()
+    assert db.query(User).filter(User.deleted_at.is_(None)).count() == 2
+
+
+def test_backfill_uses_the_soft_delete_time(db, users):
+    _live, _deleted, legacy = users
+
+    assert user_retention_service.backfill_deleted_at(db, batch_size=1) == 1
+
+    db.expire_all()
+    assert legacy.deleted_at.replace(tzinfo=None) == LONG_AGO.replace(tzinfo=None)
@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+import pytest
+
+from api.v1.models.billing_plan import BillingPlan
+from api.v1.models.user import User
+from api.v1.models.user_subscription import UserSubscription, utcnow
+from api.v1.services.usage_metering import usage_metering_service
+from api.v1.services.user_subscription import user_subscription_service
+
+
+@pytest.fixture
+def premium_user(db):
+    """A Premium subscriber from before `current_subscription_id` existed"""
+
+    free = BillingPlan(plan_name="Free", price=0, currency="USD", features=[], access_limit=15)
+    premium = BillingPlan(plan_name="Premium", price=20, currency="USD", features=[], access_limit=75)
+    user = User(email="premium@example.com")
+    db.add_all([free, premium, user])
+    db.flush()
+    now = utcnow()
+    db.add_all([
+        UserSubscription(
+            user_id=user.id, billing_plan_id=free.id,
+            start_date=now - timedelta(days=60), end_date=now + timedelta(days=300),
+        ),
+        UserSubscription(
+            user_id=user.id, billing_plan_id=premium.id,
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=29),
+        ),
+    ])
+    db.commit()
+    usage_metering_service.invalidate_limit(user.id)
+    return user
+
+
+def test_existing_premium_user_keeps_their_plan_limit(db, premium_user):
+    assert premium_user.current_subscription_id is None
+
+    assert usage_metering_service.get_limit(db, premium_user) == 75
+
+
+def test_backfill_points_users_at_their_latest_active_subscription(db, premium_user):
+    assert user_subscription_service.backfill_current_subscriptions(db, batch_size=1) == 1
+
+    db.refresh(premium_user)
+    assert premium_user.current_subscription.billing_plan.plan_name == "Premium"
+    assert user_subscription_service.count_active_subscribers(db) == 1
+    assert user_subscription_service.backfill_current_subscriptions(db) == 0